@@ -1,5 +1,7 @@
 # Version: 2025-07-06-17:00 - Flexible database configuration
-from flask import Flask, render_template, request, send_file, jsonify, flash, redirect, url_for, Blueprint
+from flask import Flask, render_template, request, send_file, jsonify, flash, redirect, url_for, Blueprint, Response, stream_with_context
+import click
+import csv
 from werkzeug.utils import secure_filename
 import os
 import tempfile
@@ -9,19 +11,29 @@ import qrcode
 import io
 import base64
 import json
+from sqlalchemy.orm import selectinload
 
 # Import existing label printer functionality
 from src.csv_parser import CSVParser
+from src.column_mapping import ColumnMappingPlan
 from src.pdf_generator_barcode import PDFGeneratorBarcode
 from src.pdf_generator_candle import PDFGeneratorCandle
 from src.label_formats import LABEL_FORMATS
-from src.models import db, CandleTest, CandleTrial, CandleEvaluation, Product
+from src.label_cache import LabelCache, DEFAULT_MAX_BYTES
+from src.label_jobs import LabelJobQueue
+from src.label_datasets import LabelDatasetStore
+from src.models import db, CandleTest, CandleTrial, CandleEvaluation, Product, upgrade_schema
+from src.db_tuning import configure_sqlite_engine, schema_lock
+from src.outbox_shipper import OutboxShipper
+from src.evaluations import save_evaluations, backfill_summaries, parse_pass_criteria, UnknownTrialsError
+from src.candle_analytics import CandleAnalytics, GROUP_DIMENSIONS
+from src.candle_export import EXPORT_FILTERS, iter_export_chunks, iter_csv, parse_date_range, write_parquet
 from src.netsuite_client import NetSuiteClient
+from src.wick_heuristics import recommend as recommend_wicks, recommend_batch as recommend_wick_batch, oz_fill_value
 
 # Import wick-onomics functionality
 try:
-    from src.wick_api import wick_api
-    from src.wick_predictor import WickPredictor
+    from src.wick_api import wick_api, init_wick_api
     wick_api_available = True
 except ImportError:
     wick_api_available = False
@@ -41,9 +53,18 @@ else:
     app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL', 'sqlite:///candle_testing.db')
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 
+# Limits that decide pass/fail on lab results shipped to Supabase, as JSON, e.g.
+# {"max_external_temp": 140, "max_flame_height": 2.0}. Unset, they ship without a verdict.
+if os.environ.get('CANDLE_PASS_CRITERIA'):
+    app.config['CANDLE_PASS_CRITERIA'] = parse_pass_criteria(os.environ['CANDLE_PASS_CRITERIA'])
+
 # Initialize database
 db.init_app(app)
 
+# Several gunicorn workers write to the SQLite file; use WAL and wait on locks instead of failing
+with app.app_context():
+    configure_sqlite_engine(db.engine)
+
 # Database configuration - can be Supabase or any other database
 DATABASE_URL = os.environ.get('DATABASE_URL')
 SUPABASE_URL = os.environ.get('SUPABASE_URL', "https://ounsopanyjrjqmhbmxej.supabase.co")
@@ -66,16 +87,36 @@ except Exception as e:
     supabase_client = None
 
 # Register wick API blueprint if available
+wick_predictor = name_resolver = None
 if wick_api_available and supabase_client:
-    # Initialize predictor with supabase client
+    # The blueprint and the routes here share one predictor and resolver built from
+    # this client, so each process loads the model and runs the baseline sync once
+    wick_predictor, name_resolver = init_wick_api(supabase_client)
     app.register_blueprint(wick_api)
     print("✅ Wick-onomics API registered at /api/wick")
 else:
     print("⚠️  Wick-onomics API not available - Supabase required")
+
 # Ensure upload and output directories exist
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 os.makedirs(app.config['OUTPUT_FOLDER'], exist_ok=True)
 
+# Rendered label PDFs are cached next to the regular output so the download route serves both
+label_cache = LabelCache(
+    app.config['OUTPUT_FOLDER'],
+    max_bytes=int(os.environ.get('LABEL_CACHE_MAX_BYTES', DEFAULT_MAX_BYTES))
+)
+
+# Parsed CSV uploads stay server-side; the browser only holds a handle and a preview page
+label_datasets = LabelDatasetStore(app.config['UPLOAD_FOLDER'])
+PREVIEW_PAGE_SIZE = 50
+
+# Background label renders. LABEL_JOB_WORKERS caps jobs per web worker; their shard
+# processes share one pool (LABEL_RENDER_WORKERS, default cpu_count - 1) so big jobs
+# can't starve the web workers. Job state is kept on disk for every worker to read.
+label_jobs = LabelJobQueue(os.path.join(app.config['OUTPUT_FOLDER'], 'jobs'),
+                           max_parallel=int(os.environ.get('LABEL_JOB_WORKERS', 2)))
+
 ALLOWED_EXTENSIONS = {'csv'}
 
 # Sample products as fallback (expanded set)
@@ -276,63 +317,21 @@ def labels_upload():
             file.save(filepath)
             
             parser = CSVParser(filepath)
-            data = parser.parse()
             
-            # Smart column mapping
-            mapped_data = []
-            for row in data:
-                mapped_row = {}
-                columns = list(row.keys())
-                
-                # Find SKU column
-                for col in columns:
-                    if any(keyword in col.lower() for keyword in ['sku', 'name', 'product', 'item']):
-                        mapped_row['sku'] = row.get(col, '')
-                        break
-                
-                # Find price column
-                for col in columns:
-                    if any(keyword in col.lower() for keyword in ['price', 'cost', 'amount']):
-                        mapped_row['price'] = float(row.get(col, 0))
-                        break
-                
-                # Find quantity column
-                for col in columns:
-                    if any(keyword in col.lower() for keyword in ['qty', 'quantity', 'qnty']):
-                        mapped_row['quantity'] = int(row.get(col, 1))
-                        break
-                
-                # Find description column
-                for col in columns:
-                    if 'description' in col.lower():
-                        mapped_row['description'] = row.get(col, '')
-                        break
-                
-                # Find case quantity column
-                for col in columns:
-                    if any(keyword in col.lower() for keyword in ['case qty', 'case_qty', 'case quantity']):
-                        mapped_row['case_qty'] = int(row.get(col, 1))
-                        break
-                
-                # Set defaults for missing fields
-                if 'sku' not in mapped_row:
-                    mapped_row['sku'] = row.get('sku', '')
-                if 'price' not in mapped_row:
-                    mapped_row['price'] = row.get('price', 0)
-                if 'quantity' not in mapped_row:
-                    mapped_row['quantity'] = row.get('quantity', 1)
-                if 'description' not in mapped_row:
-                    mapped_row['description'] = row.get('description', '')
-                if 'case_qty' not in mapped_row:
-                    mapped_row['case_qty'] = row.get('case_qty', 1)
-                
-                mapped_data.append(mapped_row)
+            # Smart column mapping - resolved once from the header, then applied to every row
+            plan = ColumnMappingPlan(parser.get_columns(), by_index=True)
+            dataset = label_datasets.create(
+                plan.project_all(parser.iter_rows(as_dict=False)),
+                plan.mapping
+            )
             
             return jsonify({
                 'success': True,
                 'filename': unique_filename,
-                'data': mapped_data,
-                'row_count': len(mapped_data)
+                'dataset': dataset.handle,
+                'preview': dataset.rows(0, PREVIEW_PAGE_SIZE),
+                'row_count': len(dataset),
+                'column_mapping': plan.mapping
             })
         except Exception as e:
             if os.path.exists(filepath):
@@ -341,19 +340,69 @@ def labels_upload():
     
     return jsonify({'error': 'Invalid file type. Please upload a CSV file.'}), 400
 
+@app.route('/labels/datasets/<handle>')
+def labels_dataset_page(handle):
+    """Paginated view of an uploaded dataset"""
+    dataset = label_datasets.get(handle)
+    if not dataset:
+        return jsonify({'error': 'Dataset not found'}), 404
+    
+    offset = max(0, request.args.get('offset', 0, type=int))
+    limit = min(500, max(1, request.args.get('limit', PREVIEW_PAGE_SIZE, type=int)))
+    
+    return jsonify({
+        'success': True,
+        'dataset': dataset.handle,
+        'offset': offset,
+        'rows': dataset.rows(offset, limit),
+        'row_count': len(dataset),
+        'column_mapping': dataset.column_mapping
+    })
+
+@app.route('/labels/datasets/<handle>', methods=['PATCH'])
+def labels_dataset_edit(handle):
+    """Apply row updates, deletes and appends to an uploaded dataset"""
+    try:
+        dataset = label_datasets.edit(handle, request.json or {})
+    except (ValueError, KeyError, TypeError) as e:
+        return jsonify({'error': f'Invalid edit: {str(e)}'}), 400
+    if not dataset:
+        return jsonify({'error': 'Dataset not found'}), 404
+    
+    return jsonify({
+        'success': True,
+        'dataset': dataset.handle,
+        'row_count': len(dataset),
+        'label_count': dataset.label_count
+    })
+
+def _resolve_label_items(data):
+    """Items for a render request: a stored dataset handle plus any inline items"""
+    items = list(data.get('items', []))
+    handle = data.get('dataset')
+    if handle:
+        dataset = label_datasets.get(handle)
+        if not dataset:
+            return None, ('Dataset not found', 404)
+        items = list(dataset.items()) + items
+    
+    if not items:
+        return None, ('No items provided', 400)
+    return items, None
+
 @app.route('/labels/generate', methods=['POST'])
 def labels_generate():
     """Generate labels PDF"""
     try:
         data = request.json
         label_format = data.get('format', 'avery_5160')
-        items = data.get('items', [])
+        items, error = _resolve_label_items(data)
         
-        if not items:
-            return jsonify({'error': 'No items provided'}), 400
+        if error:
+            return jsonify({'error': error[0]}), error[1]
         
         output_filename = f"labels_{uuid.uuid4().hex[:8]}.pdf"
-        generator = PDFGeneratorBarcode(app.config['OUTPUT_FOLDER'])
+        generator = PDFGeneratorBarcode(app.config['OUTPUT_FOLDER'], cache=label_cache)
         
         output_path = generator.generate_labels(
             items,
@@ -365,12 +414,57 @@ def labels_generate():
         
         return jsonify({
             'success': True,
-            'download_url': f'/labels/download/{output_filename}',
+            'download_url': f'/labels/download/{os.path.basename(output_path)}',
             'label_count': total_labels
         })
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/labels/jobs', methods=['POST'])
+def labels_jobs_create():
+    """Queue a label PDF render and return a job id immediately"""
+    try:
+        data = request.json
+        label_format = data.get('format', 'avery_5160')
+        items, error = _resolve_label_items(data)
+        
+        if error:
+            return jsonify({'error': error[0]}), error[1]
+        if label_format not in LABEL_FORMATS:
+            return jsonify({'error': f'Unknown label format: {label_format}'}), 400
+        
+        output_filename = f"labels_{uuid.uuid4().hex[:8]}.pdf"
+        generator = PDFGeneratorBarcode(app.config['OUTPUT_FOLDER'], cache=label_cache)
+        total_labels = sum(int(item.get('quantity', 1)) for item in items)
+        
+        job = label_jobs.submit(
+            lambda progress: generator.generate_labels(
+                items, LABEL_FORMATS[label_format], output_filename, progress=progress
+            ),
+            total_labels
+        )
+        
+        return jsonify({
+            'success': True,
+            'job_id': job.id,
+            'status_url': f'/labels/jobs/{job.id}',
+            'label_count': total_labels
+        }), 202
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/labels/jobs/<job_id>')
+def labels_jobs_status(job_id):
+    """Progress, ETA and (once finished) download link for a label job"""
+    job = label_jobs.get(job_id)
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+    
+    result = job.to_dict()
+    if job.status == 'done':
+        result['download_url'] = f'/labels/download/{os.path.basename(job.output_path)}'
+    return jsonify(result)
+
 @app.route('/labels/download/<filename>')
 def labels_download(filename):
     """Download generated labels"""
@@ -380,6 +474,11 @@ def labels_download(filename):
     except Exception as e:
         return jsonify({'error': 'File not found'}), 404
 
+@app.route('/labels/cache-stats')
+def labels_cache_stats():
+    """Hit rate and disk usage of the rendered label PDF cache"""
+    return jsonify(label_cache.stats())
+
 @app.route('/labels/debug-formats')
 def debug_formats():
     """Debug endpoint to check available label formats"""
@@ -393,9 +492,16 @@ def debug_formats():
 # Database initialization
 def init_db():
     """Initialize database tables"""
-    with app.app_context():
+    # Every gunicorn worker runs this at import; one at a time, later ones find nothing to do
+    with app.app_context(), schema_lock(db.engine):
         db.create_all()
         
+        # create_all() skips tables that already exist, so add columns/indexes introduced since
+        added_columns = upgrade_schema()
+        if any(column.startswith(('candle_tests.', 'candle_trials.')) for column in added_columns):
+            print(f"Backfilling candle test summaries for new columns: {', '.join(added_columns)}")
+            backfill_summaries()
+        
         # Add default products if none exist
         if Product.query.count() == 0:
             default_products = [
@@ -434,6 +540,64 @@ def init_db():
 # Initialize database on startup
 init_db()
 
+# Finished lab trials are copied into Supabase test_results off the request path
+outbox_shipper = None
+if supabase_client:
+    outbox_shipper = OutboxShipper(
+        app, supabase_client, resolver=name_resolver,
+        batch_size=int(os.environ.get('OUTBOX_BATCH_SIZE', 100)),
+        interval=float(os.environ.get('OUTBOX_SHIP_INTERVAL', 10))
+    )
+    outbox_shipper.start()
+
+@app.cli.command('backfill-summaries')
+def backfill_summaries_command():
+    """Rebuild the candle test/trial summary columns from the evaluations"""
+    updated = backfill_summaries()
+    print(f"Rebuilt summaries for {updated} trials")
+
+@app.cli.command('ship-outbox')
+def ship_outbox_command():
+    """Ship every due evaluation outbox row to Supabase now"""
+    if outbox_shipper is None:
+        print("Supabase is not configured")
+        return
+    shipped = 0
+    while True:
+        count = outbox_shipper.ship_once()
+        shipped += count
+        if count < outbox_shipper.batch_size:
+            break
+    print(f"Processed {shipped} outbox rows")
+
+@app.cli.command('export-results')
+@click.option('--format', 'export_format', type=click.Choice(['csv', 'parquet']), default='csv')
+@click.option('--output', '-o', required=True, help='File to write')
+@click.option('--start', help='Earliest test creation date (ISO)')
+@click.option('--end', help='Latest test creation date (ISO, inclusive for dates)')
+@click.option('--vessel')
+@click.option('--wax')
+@click.option('--fragrance')
+@click.option('--wick')
+@click.option('--created-by', 'created_by')
+def export_results_command(export_format, output, start, end, **filters):
+    """Export candle test results with one row per trial"""
+    start, end = parse_date_range(start, end)
+    chunks = iter_export_chunks({k: v for k, v in filters.items() if v}, start, end)
+    
+    if export_format == 'parquet':
+        count = write_parquet(chunks, output)
+    else:
+        count = 0
+        def counted(chunks):
+            nonlocal count
+            for rows in chunks:
+                count += len(rows)
+                yield rows
+        with open(output, 'w', newline='', encoding='utf-8') as f:
+            f.writelines(iter_csv(counted(chunks)))
+    print(f"Exported {count} trials to {output}")
+
 # Initialize NetSuite client
 netsuite_client = NetSuiteClient()
 if netsuite_client.is_configured:
@@ -460,30 +624,65 @@ def version():
         'pdf_page_size': '1x4 inches per page'
     })
 
-@app.route('/candle-testing')
-def candle_testing_dashboard():
-    """Main dashboard for candle testing tool"""
-    # Get all tests from database
-    tests = CandleTest.query.order_by(CandleTest.created_at.desc()).all()
+CANDLE_TESTS_PAGE_SIZE = 50
+CANDLE_TESTS_MAX_PAGE_SIZE = 200
+
+def _encode_test_cursor(after):
+    created_at, test_id = after
+    raw = json.dumps([created_at.isoformat(), test_id]).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii')
+
+def _decode_test_cursor(cursor):
+    created_at, test_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+    return datetime.fromisoformat(created_at), test_id
+
+def _candle_test_listing(args):
+    """One page of the test listing for the request's filter/cursor arguments"""
+    filters = {name: args.get(name) for name in CandleTest.LIST_FILTERS if args.get(name)}
+    status = (args.get('status') or '').lower() or None
+    limit = min(max(args.get('limit', CANDLE_TESTS_PAGE_SIZE, type=int), 1), CANDLE_TESTS_MAX_PAGE_SIZE)
+    
+    after = None
+    if args.get('cursor'):
+        try:
+            after = _decode_test_cursor(args['cursor'])
+        except (ValueError, TypeError):
+            raise ValueError('Invalid cursor')
     
+    tests, next_after = CandleTest.list_page(filters, status, after, limit)
+    
+    # Progress comes from the summary columns kept up to date by save_evaluations()
     tests_list = []
     for test in tests:
-        test_dict = test.to_dict()
-        
-        # Calculate progress
-        completed_evaluations = 0
-        total_trials = len(test.trials)
-        
-        for trial in test.trials:
-            evaluations = trial.get_evaluations_dict()
-            if all(hour in evaluations for hour in ['1hr', '2hr', '4hr']):
-                completed_evaluations += 1
-        
-        test_dict['progress'] = f"{completed_evaluations}/{total_trials}"
-        test_dict['status'] = 'Completed' if completed_evaluations == total_trials else 'Active'
+        test_dict = test.to_dict(include_trials=False)
+        test_dict['progress'] = f"{test.completed_trials}/{test.total_trials}"
+        test_dict['status'] = test.status.title()
         tests_list.append(test_dict)
     
-    return render_template('tools/candle_testing_dashboard.html', tests=tests_list)
+    return {
+        'tests': tests_list,
+        'next_cursor': _encode_test_cursor(next_after) if next_after else None,
+        'filters': dict(filters, status=status) if status else filters,
+        'limit': limit
+    }
+
+@app.route('/candle-testing')
+def candle_testing_dashboard():
+    """Main dashboard for candle testing tool"""
+    try:
+        listing = _candle_test_listing(request.args)
+    except ValueError as e:
+        return str(e), 400
+    
+    return render_template('tools/candle_testing_dashboard.html', **listing)
+
+@app.route('/candle-testing/api/tests')
+def candle_testing_list_tests():
+    """JSON version of the dashboard listing"""
+    try:
+        return jsonify(_candle_test_listing(request.args))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
 
 @app.route('/candle-testing/create')
 def candle_testing_create():
@@ -506,7 +705,9 @@ def candle_testing_create_post():
             wax=data['wax'],
             fragrance=data['fragrance'],
             blend_percentage=data['blend_percentage'],
-            created_by=data.get('created_by', 'Unknown')
+            created_by=data.get('created_by', 'Unknown'),
+            total_trials=len(data['wicks']),
+            status='active' if data['wicks'] else 'completed'
         )
         db.session.add(test)
         
@@ -719,7 +920,7 @@ def candle_testing_generate_labels(test_id):
         base_url = request.url_root.rstrip('/')
         
         # Use specialized candle test PDF generator
-        generator = PDFGeneratorCandle(app.config['OUTPUT_FOLDER'])
+        generator = PDFGeneratorCandle(app.config['OUTPUT_FOLDER'], cache=label_cache)
         
         # Convert trials to dict format expected by PDF generator
         trials_dict = [trial.to_dict() for trial in test.trials]
@@ -735,7 +936,7 @@ def candle_testing_generate_labels(test_id):
         
         return jsonify({
             'success': True,
-            'download_url': f'/labels/download/{output_filename}',
+            'download_url': f'/labels/download/{os.path.basename(output_path)}',
             'label_count': len(test.trials)
         })
         
@@ -754,7 +955,7 @@ def candle_testing_evaluate(test_id, trial_id):
         return "Trial not found", 404
     
     # Get existing evaluation data
-    evaluation_data = trial.get_evaluations_dict()
+    evaluation_data = trial.evaluation_summary()
     
     return render_template('tools/candle_testing_evaluate.html', 
                          test=test.to_dict(), 
@@ -765,53 +966,33 @@ def candle_testing_evaluate(test_id, trial_id):
 def candle_testing_save_evaluation():
     """Save evaluation data"""
     try:
-        data = request.json
-        trial_id = data['trial_id']
-        hour = data['hour']
-        
-        # Verify trial exists
-        trial = CandleTrial.query.get(trial_id)
-        if not trial:
-            return jsonify({'error': 'Trial not found'}), 404
-        
-        # Check if evaluation already exists
-        existing_eval = CandleEvaluation.query.filter_by(
-            trial_id=trial_id,
-            evaluation_type=hour
-        ).first()
-        
-        if existing_eval:
-            # Update existing evaluation
-            if hour == 'post_extinguish':
-                existing_eval.after_glow = data.get('after_glow')
-                existing_eval.after_smoke = data.get('after_smoke')
-            else:
-                existing_eval.full_melt_pool = data.get('full_melt_pool')
-                existing_eval.melt_pool_depth = data.get('melt_pool_depth')
-                existing_eval.external_temp = data.get('external_temp')
-                existing_eval.flame_height = data.get('flame_height')
-        else:
-            # Create new evaluation
-            eval = CandleEvaluation(
-                trial_id=trial_id,
-                evaluation_type=hour
-            )
-            
-            if hour == 'post_extinguish':
-                eval.after_glow = data.get('after_glow')
-                eval.after_smoke = data.get('after_smoke')
-            else:
-                eval.full_melt_pool = data.get('full_melt_pool')
-                eval.melt_pool_depth = data.get('melt_pool_depth')
-                eval.external_temp = data.get('external_temp')
-                eval.flame_height = data.get('flame_height')
-            
-            db.session.add(eval)
+        save_evaluations([request.json])
+        return jsonify({'success': True, 'message': 'Evaluation saved'})
         
-        db.session.commit()
+    except UnknownTrialsError:
+        return jsonify({'error': 'Trial not found'}), 404
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/candle-testing/api/save-evaluations', methods=['POST'])
+def candle_testing_save_evaluations():
+    """Save many trial/hour evaluations in one transaction"""
+    try:
+        data = request.json
+        records = data.get('evaluations') if isinstance(data, dict) else data
+        if not isinstance(records, list):
+            return jsonify({'error': 'Expected a list of evaluations'}), 400
         
-        return jsonify({'success': True, 'message': 'Evaluation saved'})
+        saved = save_evaluations(records)
+        return jsonify({'success': True, 'saved': saved, 'message': f'{saved} evaluations saved'})
         
+    except UnknownTrialsError as e:
+        return jsonify({'error': 'Trial not found', 'missing_trial_ids': e.trial_ids}), 404
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
@@ -819,7 +1000,7 @@ def candle_testing_save_evaluation():
 @app.route('/candle-testing/test/<test_id>')
 def candle_testing_view_test(test_id):
     """View test details and results"""
-    test = CandleTest.query.get(test_id)
+    test = CandleTest.query.options(selectinload(CandleTest.trials)).get(test_id)
     if not test:
         return "Test not found", 404
     
@@ -828,7 +1009,7 @@ def candle_testing_view_test(test_id):
     for trial in test.trials:
         trial_data = {
             'trial': trial.to_dict(),
-            'evaluations': trial.get_evaluations_dict()
+            'evaluations': trial.evaluation_summary()
         }
         results.append(trial_data)
     
@@ -836,6 +1017,62 @@ def candle_testing_view_test(test_id):
                          test=test.to_dict(), 
                          results=results)
 
+@app.route('/candle-testing/export')
+def candle_testing_export():
+    """Download every matching trial as one flat row (CSV or Parquet)"""
+    export_format = request.args.get('format', 'csv').lower()
+    if export_format not in ('csv', 'parquet'):
+        return jsonify({'error': 'format must be csv or parquet'}), 400
+    
+    try:
+        start, end = parse_date_range(request.args.get('start'), request.args.get('end'))
+    except ValueError:
+        return jsonify({'error': 'start/end must be ISO dates'}), 400
+    
+    filters = {name: request.args.get(name) for name in EXPORT_FILTERS if request.args.get(name)}
+    download_name = f"candle_results_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{export_format}"
+    
+    if export_format == 'csv':
+        chunks = iter_export_chunks(filters, start, end)
+        return Response(
+            stream_with_context(iter_csv(chunks)),
+            mimetype='text/csv',
+            headers={'Content-Disposition': f'attachment; filename={download_name}'}
+        )
+    
+    # Parquet needs its footer written last, so build it in a temp file and stream that
+    try:
+        with tempfile.NamedTemporaryFile(suffix='.parquet', delete=False) as tmp:
+            path = tmp.name
+        write_parquet(iter_export_chunks(filters, start, end), path)
+        handle = open(path, 'rb')
+        os.remove(path)
+        return send_file(handle, as_attachment=True, download_name=download_name,
+                         mimetype='application/vnd.apache.parquet')
+    except RuntimeError as e:
+        os.remove(path)
+        return jsonify({'error': str(e)}), 501
+
+# Burn statistics across all tests, recomputed only when evaluations change
+candle_analytics = CandleAnalytics()
+
+@app.route('/candle-testing/api/analytics')
+def candle_testing_analytics():
+    """Pass rates, melt-pool curves and temperature/flame distributions by wick, vessel and wax"""
+    group = request.args.get('group')
+    if group and group not in GROUP_DIMENSIONS:
+        return jsonify({'error': f"group must be one of: {', '.join(GROUP_DIMENSIONS)}"}), 400
+    
+    try:
+        report = candle_analytics.report()
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+    
+    if group:
+        report = {key: value for key, value in report.items()
+                  if not key.startswith('by_') or key == f"by_{group}"}
+    return jsonify({'success': True, **report})
+
 @app.route('/candle-testing/analyze-assemblies', methods=['POST'])
 def analyze_assemblies():
     """Analyze NetSuite assembly items for wick recommendations"""
@@ -897,24 +1134,24 @@ def get_wick_recommendations(vessel):
     """Get smart wick recommendations based on vessel and other factors"""
     try:
         # Check if we can use the advanced wick-onomics system
-        if wick_api_available and supabase_client:
+        if wick_predictor and name_resolver:
             # Try to get vessel, wax, and fragrance IDs from request
             wax = request.args.get('wax', '')
             fragrance = request.args.get('fragrance', '')
             
-            # Look up IDs in database
+            # Look up IDs in memory; like the old ilike '%name%' lookup, a partial name
+            # finds the one catalog name containing it, but never picks among several
             try:
-                vessel_result = supabase_client.table('vessels').select('id').ilike('name', f'%{vessel}%').limit(1).execute()
-                wax_result = supabase_client.table('wax_types').select('id').ilike('name', f'%{wax}%').limit(1).execute() if wax else None
-                fragrance_result = supabase_client.table('fragrance_oils').select('id').ilike('name', f'%{fragrance}%').limit(1).execute() if fragrance else None
+                vessel_id = name_resolver.resolve_id('vessels', vessel, allow_contains=True)
+                wax_id = name_resolver.resolve_id('wax_types', wax, allow_contains=True)
+                fragrance_id = name_resolver.resolve_id('fragrance_oils', fragrance, allow_contains=True)
                 
-                if vessel_result.data and wax_result and wax_result.data and fragrance_result and fragrance_result.data:
+                if vessel_id and wax_id and fragrance_id:
                     # Use the ML-powered predictor with NetSuite assembly data
-                    predictor = WickPredictor(supabase_client)
-                    recommendations = predictor.get_comprehensive_recommendations(
-                        vessel_id=vessel_result.data[0]['id'],
-                        wax_type_id=wax_result.data[0]['id'],
-                        fragrance_id=fragrance_result.data[0]['id'],
+                    recommendations = wick_predictor.get_comprehensive_recommendations(
+                        vessel_id=vessel_id,
+                        wax_type_id=wax_id,
+                        fragrance_id=fragrance_id,
                         fragrance_load=8.5,  # Default assumption
                         netsuite_client=netsuite_client  # Pass NetSuite client for assembly analysis
                     )
@@ -970,210 +1207,97 @@ def get_wick_recommendations(vessel):
                 print(f"Error in assembly analysis fallback: {e}")
                 # Continue to heuristic method
         
-        # Original heuristic-based implementation
-        # Look up vessel ounce_fill from NetSuite data
-        oz_fill = None
-        
-        # Try to get ounce_fill from cached vessel data
-        try:
-            # Get cached products
-            cached_products = netsuite_client.get_candle_products() if netsuite_client.is_configured else {}
-            vessels = cached_products.get('vessels', [])
-            
-            # Find matching vessel by name
-            for v in vessels:
-                if v['name'] == vessel:
-                    oz_fill = v.get('ounce_fill')
-                    if oz_fill:
-                        oz_fill = float(oz_fill)
-                        print(f"Found ounce_fill for {vessel}: {oz_fill}oz")
-                        break
-        except Exception as e:
-            print(f"Error looking up ounce_fill: {e}")
-        
-        # If no ounce_fill found, try parsing vessel name as fallback
-        if not oz_fill:
-            vessel_lower = vessel.lower()
-            
-            # Try to extract oz from vessel name (multiple patterns)
-            import re
-            
-            # Try different patterns for size extraction
-            oz_match = re.search(r'(\d+(?:\.\d+)?)\s*oz', vessel_lower)
-            if not oz_match:
-                # Try pattern like "8oz" or "8 oz"
-                oz_match = re.search(r'(\d+(?:\.\d+)?)\s*oz', vessel_lower)
-            if not oz_match:
-                # Try pattern with numbers followed by ounce indicators
-                oz_match = re.search(r'(\d+(?:\.\d+)?)\s*(?:ounce|ounces)', vessel_lower)
-            if not oz_match:
-                # Try pattern with just numbers (assume common sizes)
-                number_match = re.search(r'(\d+(?:\.\d+)?)', vessel_lower)
-                if number_match:
-                    num = float(number_match.group(1))
-                    # Common candle sizes
-                    if 4 <= num <= 20:
-                        oz_match = number_match
-            
-            if not oz_match:
-                # Default to medium size if we can't determine
-                print(f"Could not parse vessel size from: {vessel}, defaulting to 8oz")
-                oz_fill = 8.0
-            else:
-                oz_fill = float(oz_match.group(1))
-                print(f"Parsed ounce size from vessel name: {oz_fill}oz")
-        
-        # Categorize vessel size and estimate diameter
-        # Updated based on actual product data - many small candles (2.5oz)
-        if oz_fill <= 2.5:
-            size_category = 'xs'
-            diameter_estimate = (1.5, 2.0)
-            base_wicks = ['CD-2', 'CD-3', 'CD-4', 'ECO-1', 'ECO-2']
-        elif oz_fill <= 4:
-            size_category = 'small'
-            diameter_estimate = (2.0, 2.5)
-            base_wicks = ['CD-4', 'CD-5', 'CD-6', 'ECO-2', 'ECO-4']
-        elif oz_fill <= 8:
-            size_category = 'medium'
-            diameter_estimate = (2.5, 3.0)
-            base_wicks = ['CD-6', 'CD-8', 'CD-10', 'ECO-4', 'ECO-6', 'LX-10']
-        elif oz_fill <= 12:
-            size_category = 'large'
-            diameter_estimate = (3.0, 3.5)
-            base_wicks = ['CD-10', 'CD-12', 'CD-14', 'ECO-8', 'ECO-10', 'LX-12', 'HTP-73']
-        else:
-            size_category = 'xl'
-            diameter_estimate = (3.5, 4.0)
-            base_wicks = ['CD-14', 'CD-16', 'CD-18', 'ECO-12', 'ECO-14', 'LX-14', 'HTP-93']
-        
-        # Get wax and fragrance from request args
-        wax = request.args.get('wax', '').lower()
-        fragrance = request.args.get('fragrance', '').lower()
-        
-        # Adjust recommendations based on wax type
-        wick_adjustment = 0
-        if 'soy' in wax:
-            wick_adjustment = 0  # Soy tends to be baseline
-        elif 'paraffin' in wax:
-            wick_adjustment = -1  # Paraffin burns hotter, may need smaller wick
-        elif 'coconut' in wax:
-            wick_adjustment = 1  # Coconut wax may need larger wick
-        elif 'beeswax' in wax:
-            wick_adjustment = 1  # Beeswax is dense, needs larger wick
-        
-        # Adjust for fragrance density (simplified)
-        if any(word in fragrance for word in ['vanilla', 'bakery', 'cinnamon', 'spice']):
-            wick_adjustment += 1  # Heavy fragrances need larger wicks
-        elif any(word in fragrance for word in ['citrus', 'fresh', 'clean', 'light']):
-            wick_adjustment -= 0  # Light fragrances burn easier
-        
-        # Generate recommendations with probability scores
-        recommendations = []
-        
-        # Calculate probabilities for each wick
-        for i, base_wick in enumerate(base_wicks):
-            # Base probability starts at 85% for primary recommendations
-            base_probability = 85 - (i * 5)  # Decrease by 5% for each position
-            
-            # Extract wick series and size
-            parts = base_wick.split('-')
-            if len(parts) == 2:
-                series = parts[0]
-                try:
-                    size = int(parts[1])
-                    
-                    # Primary recommendation
-                    prob = base_probability
-                    
-                    # Adjust probability based on wax type match
-                    if series == 'CD' and 'soy' in wax:
-                        prob += 5  # CD wicks work well with soy
-                    elif series == 'ECO' and ('soy' in wax or 'coconut' in wax):
-                        prob += 7  # ECO great for natural waxes
-                    elif series == 'LX' and 'paraffin' in wax:
-                        prob += 5  # LX good for paraffin
-                    elif series == 'HTP' and 'blend' in wax:
-                        prob += 5  # HTP good for blends
-                    
-                    recommendations.append({
-                        'wick': f"{series}-{size}",
-                        'probability': min(95, prob),  # Cap at 95%
-                        'reason': 'Primary size match'
-                    })
-                    
-                    # Size variations based on adjustments
-                    if wick_adjustment < 0 and size > 2:
-                        # Smaller wick variation
-                        var_prob = base_probability - 15
-                        recommendations.append({
-                            'wick': f"{series}-{size - 2}",
-                            'probability': max(40, var_prob),
-                            'reason': 'Smaller variant for hot-burning wax'
-                        })
-                    elif wick_adjustment > 0:
-                        # Larger wick variation
-                        var_prob = base_probability - 10
-                        recommendations.append({
-                            'wick': f"{series}-{size + 2}",
-                            'probability': max(50, var_prob),
-                            'reason': 'Larger variant for dense wax/fragrance'
-                        })
-                    else:
-                        # Both variations for neutral
-                        if size > 2:
-                            recommendations.append({
-                                'wick': f"{series}-{size - 2}",
-                                'probability': max(40, base_probability - 20),
-                                'reason': 'Alternative smaller size'
-                            })
-                        recommendations.append({
-                            'wick': f"{series}-{size + 2}",
-                            'probability': max(40, base_probability - 20),
-                            'reason': 'Alternative larger size'
-                        })
-                    
-                except ValueError:
-                    recommendations.append({
-                        'wick': base_wick,
-                        'probability': base_probability,
-                        'reason': 'Standard recommendation'
-                    })
-            else:
-                recommendations.append({
-                    'wick': base_wick,
-                    'probability': base_probability,
-                    'reason': 'Standard recommendation'
-                })
+        # Rule-based fallback, with the vessel's ounce fill from cached NetSuite data when known
+        result = recommend_wicks(
+            vessel,
+            wax=request.args.get('wax', ''),
+            fragrance=request.args.get('fragrance', ''),
+            oz_fill=_vessel_oz_fills().get(vessel)
+        )
+        return jsonify({'success': True, **result})
         
-        # Sort by probability and remove duplicates
-        seen_wicks = set()
-        unique_recommendations = []
-        for rec in sorted(recommendations, key=lambda x: x['probability'], reverse=True):
-            if rec['wick'] not in seen_wicks:
-                seen_wicks.add(rec['wick'])
-                unique_recommendations.append(rec)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/candle-testing/wick-recommendations', methods=['POST'])
+def get_wick_recommendations_batch():
+    """
+    Rule-based wick recommendations for many vessels in one call
+    
+    Request body:
+    {
+        "items": [{"vessel": "8oz Tumbler", "wax": "Soy C3", "fragrance": "Vanilla", "oz_fill": 8}, ...]
+    }
+    """
+    try:
+        data = request.get_json()
+        items = data.get('items') if isinstance(data, dict) else data
+        if not isinstance(items, list) or not all(isinstance(item, dict) and item.get('vessel') for item in items):
+            return jsonify({'error': 'Expected a list of items, each with a vessel'}), 400
         
-        # Limit to top 8 for better selection
-        recommendations = unique_recommendations[:8]
+        items = _with_vessel_oz_fills(items)
+        results = recommend_wick_batch(items)
         
         return jsonify({
             'success': True,
-            'vessel_size': {
-                'oz_fill': oz_fill,
-                'category': size_category,
-                'diameter_estimate': f"{diameter_estimate[0]}-{diameter_estimate[1]} inches"
-            },
-            'recommendations': recommendations,
-            'factors': {
-                'wax_type': wax or 'unknown',
-                'fragrance_type': fragrance or 'unknown',
-                'adjustment': wick_adjustment
-            }
+            'count': len(results),
+            'results': [dict(result, vessel=item['vessel']) for item, result in zip(items, results)]
         })
         
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def _vessel_oz_fills():
+    """Vessel name -> ounce fill from the cached NetSuite products"""
+    oz_fills = {}
+    try:
+        cached_products = netsuite_client.get_candle_products() if netsuite_client.is_configured else {}
+        for v in cached_products.get('vessels', []):
+            if v['name'] in oz_fills:
+                continue
+            try:
+                oz_fill = oz_fill_value(v.get('ounce_fill'))
+            except ValueError:
+                # Unusable NetSuite value; the vessel name is parsed instead
+                continue
+            if oz_fill is not None:
+                oz_fills[v['name']] = oz_fill
+    except Exception as e:
+        print(f"Error looking up ounce_fill: {e}")
+    return oz_fills
+
+def _with_vessel_oz_fills(items):
+    """Items without an oz_fill get the vessel's NetSuite ounce fill; given values, even 0, are kept for validation"""
+    missing = [item.get('oz_fill') is None or (isinstance(item.get('oz_fill'), str) and not item['oz_fill'].strip())
+               for item in items]
+    if not any(missing):
+        return items
+    oz_fills = _vessel_oz_fills()
+    return [dict(item, oz_fill=oz_fills.get(item['vessel'])) if item_missing else item
+            for item, item_missing in zip(items, missing)]
+
+@app.cli.command('recommend-wicks')
+@click.argument('vessels', nargs=-1)
+@click.option('--wax', default='')
+@click.option('--fragrance', default='')
+@click.option('--input', 'input_path', type=click.Path(exists=True),
+              help='CSV with vessel, wax, fragrance and optional oz_fill columns')
+def recommend_wicks_command(vessels, wax, fragrance, input_path):
+    """Print rule-based wick recommendations as JSON"""
+    items = [{'vessel': vessel, 'wax': wax, 'fragrance': fragrance} for vessel in vessels]
+    if input_path:
+        with open(input_path, newline='', encoding='utf-8') as f:
+            items.extend(csv.DictReader(f))
+    items = _with_vessel_oz_fills(items)
+    try:
+        results = recommend_wick_batch(items)
+    except ValueError as e:
+        # Items are numbered from the VESSELS arguments through the --input rows
+        raise click.ClickException(str(e))
+    print(json.dumps([dict(result, vessel=item['vessel']) for item, result in zip(items, results)], indent=2))
+
 @app.route('/candle-testing/admin')
 def candle_testing_admin():
     """Admin page for candle testing"""
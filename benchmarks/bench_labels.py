@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+"""
+Label generation benchmarks
+
+Generates synthetic CSV datasets and times PDFGeneratorBarcode, PDFGeneratorCandle
+and PDFGenerator on them. Each case runs in a fresh process so peak RSS is per
+case; the processes that render sharded barcode jobs are reported separately
+as peak_children_rss_mb. Results are written as JSON and can be compared
+against a saved baseline:
+
+    python benchmarks/bench_labels.py --output bench.json
+    python benchmarks/bench_labels.py --baseline bench.json --sizes 10,1000
+"""
+
+import csv
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import click
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+if multiprocessing.parent_process() is not None:
+    # The parent already printed the label format warnings once
+    warnings.filterwarnings('ignore', message='Label format')
+
+from src.csv_parser import CSVParser
+from src.label_formats import LABEL_FORMATS
+from src.pdf_generator import PDFGenerator
+from src.pdf_generator_barcode import PDFGeneratorBarcode, shutdown_render_pool
+from src.pdf_generator_candle import PDFGeneratorCandle
+
+
+GENERATORS = ('barcode', 'plain', 'candle')
+SKU_MODES = ('unique', 'repeated')
+REPEATED_SKU_POOL = 10
+
+# The candle generator prints one thermal label per page and only uses the
+# label size, so by default it is benchmarked on its own format only
+CANDLE_FORMATS = ('candle_test_1x4',)
+
+
+def write_dataset(directory, labels, sku_mode):
+    """Write a synthetic inventory CSV with one label per row."""
+    path = os.path.join(directory, f"labels_{labels}_{sku_mode}.csv")
+    if os.path.exists(path):
+        return path
+
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(['product', 'sku', 'price', 'quantity', 'case_qty', 'description'])
+        for i in range(labels):
+            n = i % REPEATED_SKU_POOL if sku_mode == 'repeated' else i
+            writer.writerow([f"Candle No. {n}", f"CF{n:08d}", f"{(n % 90) + 9.99:.2f}",
+                             1, 12, f"Candle No. {n} 8 oz Tumbler-CASE(12)"])
+    return path
+
+
+def _maxrss_mb(who):
+    # ru_maxrss is KB on Linux, bytes on macOS
+    peak_rss = resource.getrusage(who).ru_maxrss
+    return peak_rss / (1024 * 1024) if sys.platform == 'darwin' else peak_rss / 1024
+
+
+def run_case(case):
+    """Worker entry point: parse the CSV, render it and report timings."""
+    output_dir = tempfile.mkdtemp(prefix='bench_')
+    output_filename = 'bench.pdf'
+    label_format = LABEL_FORMATS[case['format']]
+
+    started = time.perf_counter()
+    rows = CSVParser(case['csv']).parse()
+
+    if case['generator'] == 'barcode':
+        items = [{'sku': r['sku'], 'price': float(r['price']), 'quantity': int(r['quantity']),
+                  'case_qty': int(r['case_qty'])} for r in rows]
+        if case['workers']:
+            # Sizes the shared shard pool, which starts on the first sharded render
+            os.environ['LABEL_RENDER_WORKERS'] = str(case['workers'])
+        generator = PDFGeneratorBarcode(output_dir)
+        output_path = generator.generate_labels(items, label_format, output_filename)
+    elif case['generator'] == 'plain':
+        output_path = PDFGenerator(output_dir).generate_labels(
+            rows, label_format, output_filename,
+            {'product': 'product', 'price': 'price', 'sku': 'sku'}
+        )
+    else:
+        test_data = {'id': 'CT-BENCH', 'vessel': 'VES-001 - 8oz Clear Glass Jar',
+                     'wax': 'WAX-001 - Soy Wax 464', 'fragrance': 'OIL-002 - Vanilla Bean',
+                     'blend_percentage': 8.5}
+        trials = [{'id': f"CT-BENCH-T{i + 1}", 'trial_number': i + 1, 'wick': r['sku']}
+                  for i, r in enumerate(rows)]
+        output_path = PDFGeneratorCandle(output_dir).generate_test_labels(
+            test_data, trials, label_format, output_filename, 'https://bench.local'
+        )
+
+    elapsed = time.perf_counter() - started
+    output_bytes = os.path.getsize(output_path)
+    os.remove(output_path)
+    os.rmdir(output_dir)
+
+    # Sharded barcode jobs render in child processes; their memory only shows
+    # up under RUSAGE_CHILDREN (the largest single child, once it has exited)
+    shutdown_render_pool()
+    peak_rss_mb = _maxrss_mb(resource.RUSAGE_SELF)
+    peak_children_rss_mb = _maxrss_mb(resource.RUSAGE_CHILDREN)
+
+    return {
+        'generator': case['generator'],
+        'format': case['format'],
+        'labels': case['labels'],
+        'sku_mode': case['sku_mode'],
+        'seconds': round(elapsed, 4),
+        'labels_per_sec': round(case['labels'] / elapsed, 1) if elapsed else None,
+        'peak_rss_mb': round(peak_rss_mb, 1),
+        'peak_children_rss_mb': round(peak_children_rss_mb, 1),
+        'output_bytes': output_bytes
+    }
+
+
+def case_key(result):
+    return (result['generator'], result['format'], result['labels'], result['sku_mode'])
+
+
+def _relative_delta(result, base, field):
+    return result[field] / base[field] - 1 if base.get(field) else 0
+
+
+def compare(results, baseline, tolerance):
+    """Print deltas against a baseline run; return the regressed cases."""
+    previous = {case_key(r): r for r in baseline['results']}
+    regressions = []
+
+    click.echo(f"\n{'Case':58} {'Time':>9} {'Δ time':>8} {'RSS MB':>8} {'Δ RSS':>8} "
+               f"{'Child MB':>9} {'Δ child':>8}")
+    click.echo("-" * 114)
+    for result in results:
+        base = previous.get(case_key(result))
+        name = '/'.join(str(part) for part in case_key(result))
+        if not base:
+            click.echo(f"{name:58} {result['seconds']:>8.3f}s {'new':>8}")
+            continue
+
+        time_delta = _relative_delta(result, base, 'seconds')
+        rss_delta = _relative_delta(result, base, 'peak_rss_mb')
+        # Baselines written before children were measured have no child RSS to compare
+        child_delta = _relative_delta(result, base, 'peak_children_rss_mb')
+        flag = ''
+        if max(time_delta, rss_delta, child_delta) > tolerance:
+            regressions.append(name)
+            flag = '  REGRESSION'
+        click.echo(f"{name:58} {result['seconds']:>8.3f}s {time_delta:>+8.1%} "
+                   f"{result['peak_rss_mb']:>8.1f} {rss_delta:>+8.1%} "
+                   f"{result['peak_children_rss_mb']:>9.1f} {child_delta:>+8.1%}{flag}")
+
+    return regressions
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'],
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except Exception:
+        return None
+
+
+@click.command()
+@click.option('--sizes', default='10,1000,50000', show_default=True,
+              help='Comma-separated label counts')
+@click.option('--formats', default=','.join(LABEL_FORMATS), show_default=True,
+              help='Comma-separated LABEL_FORMATS keys (barcode and plain generators)')
+@click.option('--generators', default=','.join(GENERATORS), show_default=True,
+              help='Comma-separated generators to run')
+@click.option('--render-workers', type=int, default=None,
+              help='Workers for sharded barcode rendering (default: generator default)')
+@click.option('--output', '-o', 'output_file', default='bench_results.json', show_default=True,
+              help='Where to write the JSON results')
+@click.option('--baseline', type=click.Path(exists=True),
+              help='Previous results JSON to compare against')
+@click.option('--tolerance', default=0.15, show_default=True,
+              help='Allowed slowdown / RSS growth before a case counts as a regression')
+def main(sizes, formats, generators, render_workers, output_file, baseline, tolerance):
+    """Benchmark label PDF generation across formats and volumes"""
+    sizes = [int(s) for s in sizes.split(',') if s]
+    formats = [f for f in formats.split(',') if f]
+    generators = [g for g in generators.split(',') if g]
+
+    unknown = [f for f in formats if f not in LABEL_FORMATS] + [g for g in generators if g not in GENERATORS]
+    if unknown:
+        raise click.BadParameter(f"Unknown format/generator: {', '.join(unknown)}")
+
+    data_dir = tempfile.mkdtemp(prefix='bench_data_')
+    cases = []
+    for labels in sizes:
+        for sku_mode in SKU_MODES:
+            csv_path = write_dataset(data_dir, labels, sku_mode)
+            for generator in generators:
+                case_formats = [f for f in formats if f in CANDLE_FORMATS] if generator == 'candle' else formats
+                for label_format in case_formats:
+                    cases.append({'generator': generator, 'format': label_format, 'labels': labels,
+                                  'sku_mode': sku_mode, 'csv': csv_path, 'workers': render_workers})
+
+    click.echo(f"Running {len(cases)} benchmark case(s)...")
+
+    # A fresh spawned process per case keeps peak RSS measurements independent.
+    # Not a multiprocessing.Pool: its daemonic workers cannot start the shard pool.
+    results = []
+    context = multiprocessing.get_context('spawn')
+    for case in cases:
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+            result = pool.submit(run_case, case).result()
+        results.append(result)
+        click.echo(f"  {result['generator']:8} {result['format']:16} {result['labels']:>7} "
+                   f"{result['sku_mode']:9} {result['seconds']:>8.3f}s "
+                   f"{result['labels_per_sec'] or 0:>10.1f} labels/s {result['peak_rss_mb']:>7.1f} MB "
+                   f"{result['peak_children_rss_mb']:>7.1f} MB child {result['output_bytes']:>10} bytes")
+
+    for name in os.listdir(data_dir):
+        os.remove(os.path.join(data_dir, name))
+    os.rmdir(data_dir)
+
+    report = {
+        'meta': {
+            'timestamp': datetime.now().isoformat(),
+            'git_revision': git_revision(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count()
+        },
+        'results': results
+    }
+    with open(output_file, 'w') as f:
+        json.dump(report, f, indent=2)
+    click.echo(f"\nResults written to: {output_file}")
+
+    if baseline:
+        with open(baseline) as f:
+            regressions = compare(results, json.load(f), tolerance)
+        if regressions:
+            click.echo(f"\n{len(regressions)} regression(s) beyond {tolerance:.0%}")
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Concurrent writer stress test for the candle testing SQLite database
+
+Starts several writer processes that save evaluations through
+src.evaluations.save_evaluations, the path the save-evaluation routes use
+(upsert, trial summaries and outbox rows in one transaction), while reader
+processes run the dashboard listing query. Runs the workload against the
+stock SQLite settings without lock retries and against the db_tuning layer,
+then compares throughput and lock errors:
+
+    python benchmarks/stress_sqlite_writers.py --writers 8 --saves 200
+"""
+
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+
+import click
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+
+from src.db_tuning import configure_sqlite_engine, is_lock_error
+from src.evaluations import EVALUATION_TYPES, POST_EXTINGUISH, save_evaluations
+from src.models import db, CandleTest, CandleTrial
+
+
+def make_app(db_path, tuned):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{db_path}"
+    db.init_app(app)
+    if tuned:
+        with app.app_context():
+            configure_sqlite_engine(db.engine)
+    return app
+
+
+def seed(db_path, tests, trials_per_test):
+    app = make_app(db_path, tuned=False)
+    with app.app_context():
+        db.create_all()
+        for t in range(tests):
+            test_id = f"CT-STRESS-{t:04d}"
+            db.session.add(CandleTest(id=test_id, vessel='VES-001', wax='WAX-001', fragrance='OIL-001',
+                                      blend_percentage=8.0, created_by='stress'))
+            for n in range(trials_per_test):
+                db.session.add(CandleTrial(id=f"{test_id}-T{n + 1}", test_id=test_id,
+                                           trial_number=n + 1, wick='Wick.CD6'))
+        db.session.commit()
+        return [trial.id for trial in CandleTrial.query.all()]
+
+
+def evaluation(trial_id, hour, value):
+    if hour == POST_EXTINGUISH:
+        return {'trial_id': trial_id, 'hour': hour, 'after_glow': int(value * 60)}
+    return {'trial_id': trial_id, 'hour': hour, 'melt_pool_depth': value, 'full_melt_pool': value > 0.5}
+
+
+def writer(args):
+    db_path, tuned, trial_ids, saves, seed_value = args
+    app = make_app(db_path, tuned)
+    # save_evaluations retries on lock errors; that retry belongs to the tuning under test
+    save = save_evaluations if tuned else save_evaluations.__wrapped__
+
+    rng = random.Random(seed_value)
+    ok = errors = 0
+    latencies = []
+    with app.app_context():
+        for i in range(saves):
+            started = time.perf_counter()
+            try:
+                save([evaluation(rng.choice(trial_ids), rng.choice(EVALUATION_TYPES), rng.random())])
+                ok += 1
+            except Exception as e:
+                db.session.rollback()
+                if not is_lock_error(e):
+                    raise
+                errors += 1
+            latencies.append(time.perf_counter() - started)
+    return ok, errors, latencies
+
+
+def reader(args):
+    db_path, tuned, done = args
+    app = make_app(db_path, tuned)
+    reads = errors = 0
+    with app.app_context():
+        while not done.is_set():
+            try:
+                CandleTest.list_page()
+                reads += 1
+            except Exception as e:
+                db.session.rollback()
+                if not is_lock_error(e):
+                    raise
+                errors += 1
+    return reads, errors
+
+
+def run(mode, writers, readers, saves, tests, trials_per_test):
+    tuned = mode == 'tuned'
+    directory = tempfile.mkdtemp(prefix='stress_')
+    db_path = os.path.join(directory, 'candle_testing.db')
+    trial_ids = seed(db_path, tests, trials_per_test)
+
+    context = multiprocessing.get_context('spawn')
+    with context.Manager() as manager, context.Pool(processes=writers + readers) as pool:
+        # Readers keep querying until the last writer finishes
+        done = manager.Event()
+        reader_results = pool.map_async(reader, [(db_path, tuned, done)] * readers)
+        started = time.perf_counter()
+        writer_out = pool.map(writer, [(db_path, tuned, trial_ids, saves, n) for n in range(writers)])
+        elapsed = time.perf_counter() - started
+        done.set()
+        reader_out = reader_results.get()
+
+    for name in os.listdir(directory):
+        os.remove(os.path.join(directory, name))
+    os.rmdir(directory)
+
+    ok = sum(r[0] for r in writer_out)
+    errors = sum(r[1] for r in writer_out)
+    latencies = sorted(l for r in writer_out for l in r[2])
+    p95 = latencies[int(len(latencies) * 0.95) - 1] if latencies else 0
+    return {
+        'mode': mode,
+        'saves': ok,
+        'lock_errors': errors,
+        'seconds': elapsed,
+        'saves_per_sec': ok / elapsed if elapsed else 0,
+        'p95_ms': p95 * 1000,
+        'reads': sum(r[0] for r in reader_out),
+        'read_errors': sum(r[1] for r in reader_out)
+    }
+
+
+@click.command()
+@click.option('--writers', default=8, show_default=True, help='Concurrent writer processes')
+@click.option('--readers', default=2, show_default=True, help='Concurrent dashboard reader processes')
+@click.option('--saves', default=200, show_default=True, help='Evaluation saves per writer')
+@click.option('--tests', default=20, show_default=True, help='Seeded candle tests')
+@click.option('--trials', 'trials_per_test', default=4, show_default=True, help='Trials per test')
+def main(writers, readers, saves, tests, trials_per_test):
+    """Compare concurrent evaluation saves with and without SQLite tuning"""
+    click.echo(f"{'Mode':8} {'Saves':>7} {'Locked':>7} {'Saves/s':>9} {'p95 ms':>8} {'Reads':>7} {'Read err':>9}")
+    for mode in ('default', 'tuned'):
+        r = run(mode, writers, readers, saves, tests, trials_per_test)
+        click.echo(f"{r['mode']:8} {r['saves']:>7} {r['lock_errors']:>7} {r['saves_per_sec']:>9.1f} "
+                   f"{r['p95_ms']:>8.1f} {r['reads']:>7} {r['read_errors']:>9}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,13 +1,149 @@
 import click
+import csv
+import glob
+import json
 import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from src.csv_parser import CSVParser
 from src.pdf_generator import PDFGenerator
 from src.label_formats import LABEL_FORMATS
 
 
+def load_manifest(manifest_path, defaults):
+    """Read batch jobs from a JSON list or a CSV with an 'input' column.
+    
+    Each entry may override output, format, product_field, price_field and sku_field.
+    Raises ValueError naming every entry that is not an object or has no input.
+    """
+    with open(manifest_path, 'r', encoding='utf-8-sig', newline='') as f:
+        if manifest_path.lower().endswith('.json'):
+            entries = json.load(f)
+            if not isinstance(entries, list):
+                raise ValueError("a JSON manifest must be a list of objects")
+        else:
+            entries = list(csv.DictReader(f))
+    
+    base_dir = os.path.dirname(os.path.abspath(manifest_path))
+    jobs = []
+    errors = []
+    for number, entry in enumerate(entries, start=1):
+        if not isinstance(entry, dict):
+            errors.append(f"entry {number}: expected an object, got {type(entry).__name__}")
+            continue
+        if not entry.get('input'):
+            errors.append(f"entry {number}: missing 'input'")
+            continue
+        job = dict(defaults)
+        job.update({key: value for key, value in entry.items() if key and value})
+        # Relative inputs are resolved against the manifest's directory
+        job['input'] = os.path.join(base_dir, job['input'])
+        jobs.append(job)
+    
+    if errors:
+        raise ValueError('; '.join(errors))
+    return jobs
+
+
+def output_name(job):
+    """PDF filename for a batch job: its 'output', or the input's basename."""
+    return job.get('output') or os.path.splitext(os.path.basename(job['input']))[0] + '.pdf'
+
+
+def find_output_collisions(jobs):
+    """Map each output path written by more than one job to those jobs' inputs."""
+    by_path = {}
+    for job in jobs:
+        path = os.path.normcase(os.path.abspath(os.path.join(job['output_dir'], output_name(job))))
+        by_path.setdefault(path, []).append(job['input'])
+    return {path: inputs for path, inputs in by_path.items() if len(inputs) > 1}
+
+
+def render_job(job):
+    """Render one CSV to PDF; runs in a worker process and never raises."""
+    started = time.perf_counter()
+    result = {
+        'input': job['input'],
+        'format': job['format'],
+        'output': None,
+        'labels': 0,
+        'pages': 0,
+        'bytes': 0,
+        'seconds': 0.0,
+        'error': None
+    }
+    
+    try:
+        label_format = LABEL_FORMATS.get(job['format'])
+        if not label_format:
+            raise ValueError(f"unknown label format '{job['format']}'")
+        
+        parser = CSVParser(job['input'])
+        columns = parser.get_columns()
+        missing = [job[field] for field in ('product_field', 'price_field') if job[field] not in columns]
+        if missing:
+            raise ValueError(f"missing column(s) {', '.join(missing)}")
+        
+        fields_config = {
+            'product': job['product_field'],
+            'price': job['price_field'],
+            'sku': job['sku_field']
+        }
+        output_file = output_name(job)
+        
+        def counted_rows():
+            for row in parser.iter_rows():
+                result['labels'] += 1
+                yield row
+        
+        output_path = PDFGenerator(job['output_dir']).generate_labels(
+            counted_rows(), label_format, output_file, fields_config
+        )
+        
+        result.update({
+            'output': output_path,
+            'pages': -(-result['labels'] // label_format.labels_per_page),
+            'bytes': os.path.getsize(output_path)
+        })
+    except Exception as e:
+        result['error'] = str(e)
+    
+    result['seconds'] = round(time.perf_counter() - started, 3)
+    return result
+
+
+def run_batch(jobs, workers):
+    """Render jobs across a process pool and return results in submission order."""
+    # Largest files first so the longest render starts immediately and bounds total runtime
+    order = sorted(range(len(jobs)), key=lambda i: os.path.getsize(jobs[i]['input'])
+                   if os.path.exists(jobs[i]['input']) else 0, reverse=True)
+    results = [None] * len(jobs)
+    
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(render_job, jobs[i]): i for i in order}
+        for future in as_completed(futures):
+            result = future.result()
+            results[futures[future]] = result
+            status = 'FAILED: ' + result['error'] if result['error'] else f"{result['labels']} labels"
+            click.echo(f"  {os.path.basename(result['input'])}: {status} ({result['seconds']}s)")
+    
+    return results
+
+
 @click.command()
-@click.option('--input', '-i', 'input_file', required=True, type=click.Path(exists=True),
+@click.option('--input', '-i', 'input_file', type=click.Path(exists=True),
               help='Path to the input CSV file')
+@click.option('--batch', '-b', 'batch_patterns', multiple=True,
+              help='Glob (or directory) of CSV files to render in batch mode; repeatable')
+@click.option('--manifest', '-m', type=click.Path(exists=True),
+              help='Batch manifest (.json list or .csv) with per-file input/output/format/fields')
+@click.option('--output-dir', default='output', show_default=True,
+              help='Directory for PDFs written in batch mode')
+@click.option('--workers', '-w', type=int, default=None,
+              help='Worker processes for batch mode (default: CPU count)')
+@click.option('--summary', 'summary_file', type=click.Path(),
+              help='Write the batch summary (labels, pages, bytes, time per file) as JSON')
 @click.option('--output', '-o', 'output_file', default='labels.pdf',
               help='Output PDF filename (default: labels.pdf)')
 @click.option('--format', '-f', 'label_format', type=click.Choice(list(LABEL_FORMATS.keys())),
@@ -21,7 +157,8 @@ from src.label_formats import LABEL_FORMATS
               help='CSV column name for SKU')
 @click.option('--list-formats', is_flag=True,
               help='List all available label formats')
-def main(input_file, output_file, label_format, product_field, price_field, sku_field, list_formats):
+def main(input_file, batch_patterns, manifest, output_dir, workers, summary_file,
+         output_file, label_format, product_field, price_field, sku_field, list_formats):
     """
     Price Sticker Printer - Generate formatted PDF labels from CSV data
     """
@@ -33,16 +170,75 @@ def main(input_file, output_file, label_format, product_field, price_field, sku_
             click.echo(f"{key:15} - {format_obj.name}")
         return
     
+    if batch_patterns or manifest:
+        defaults = {
+            'format': label_format,
+            'product_field': product_field,
+            'price_field': price_field,
+            'sku_field': sku_field,
+            'output_dir': output_dir
+        }
+        
+        try:
+            jobs = load_manifest(manifest, defaults) if manifest else []
+        except ValueError as e:
+            click.echo(f"Error: invalid manifest {manifest}: {e}")
+            sys.exit(1)
+        for pattern in batch_patterns:
+            if os.path.isdir(pattern):
+                pattern = os.path.join(pattern, '*.csv')
+            for path in sorted(glob.glob(pattern)):
+                jobs.append(dict(defaults, input=path))
+        
+        if not jobs:
+            click.echo("Error: no CSV files matched the batch input")
+            sys.exit(1)
+        
+        # Two jobs writing the same PDF would silently overwrite each other
+        collisions = find_output_collisions(jobs)
+        if collisions:
+            click.echo("Error: several inputs would write the same output file:")
+            for path, inputs in collisions.items():
+                click.echo(f"  {path} <- {', '.join(inputs)}")
+            click.echo("Give these entries distinct 'output' names in a manifest")
+            sys.exit(1)
+        
+        click.echo(f"\nRendering {len(jobs)} file(s) with {workers or os.cpu_count()} worker(s)...")
+        started = time.perf_counter()
+        results = run_batch(jobs, workers)
+        elapsed = time.perf_counter() - started
+        
+        click.echo(f"\n{'File':30} {'Format':16} {'Labels':>8} {'Pages':>6} {'Bytes':>10} {'Time':>8}")
+        click.echo("-" * 83)
+        for r in results:
+            click.echo(f"{os.path.basename(r['input'])[:30]:30} {r['format'][:16]:16} {r['labels']:>8} "
+                       f"{r['pages']:>6} {r['bytes']:>10} {r['seconds']:>7.2f}s")
+        
+        failures = [r for r in results if r['error']]
+        click.echo(f"\n{len(results) - len(failures)} succeeded, {len(failures)} failed in {elapsed:.2f}s")
+        
+        if summary_file:
+            with open(summary_file, 'w') as f:
+                json.dump({'elapsed_seconds': round(elapsed, 3), 'files': results}, f, indent=2)
+            click.echo(f"Summary written to: {summary_file}")
+        
+        if failures:
+            sys.exit(1)
+        return
+    
+    if not input_file:
+        click.echo("Error: provide --input, or --batch/--manifest for batch mode")
+        sys.exit(1)
+    
     click.echo(f"\nProcessing CSV file: {input_file}")
     
-    # Parse CSV
+    # Parse CSV header - rows are streamed later, straight into the PDF
     parser = CSVParser(input_file)
     try:
-        data = parser.parse()
-        click.echo(f"Found {len(data)} items in CSV")
+        columns = parser.get_columns()
+        click.echo(f"Detected encoding: {parser.encoding}, delimiter: {parser.dialect.delimiter!r}")
         
         # Show available columns
-        columns = parser.get_columns()
         click.echo(f"Available columns: {', '.join(columns)}")
         
         # Validate required columns
@@ -71,10 +267,17 @@ def main(input_file, output_file, label_format, product_field, price_field, sku_
     # Generate PDF
     click.echo(f"\nGenerating PDF with format: {LABEL_FORMATS[label_format].name}")
     generator = PDFGenerator()
+    label_count = 0
+    
+    def counted_rows():
+        nonlocal label_count
+        for row in parser.iter_rows():
+            label_count += 1
+            yield row
     
     try:
         output_path = generator.generate_labels(
-            data, 
+            counted_rows(), 
             LABEL_FORMATS[label_format], 
             output_file,
             fields_config
@@ -84,12 +287,11 @@ def main(input_file, output_file, label_format, product_field, price_field, sku_
         # Show summary
         format_obj = LABEL_FORMATS[label_format]
         labels_per_page = format_obj.columns * format_obj.rows
-        total_pages = (len(data) + labels_per_page - 1) // labels_per_page
-        click.echo(f"Generated {len(data)} labels on {total_pages} page(s)")
+        total_pages = (label_count + labels_per_page - 1) // labels_per_page
+        click.echo(f"Generated {label_count} labels on {total_pages} page(s)")
         
     except Exception as e:
         click.echo(f"Error generating PDF: {str(e)}")
 
-
 if __name__ == '__main__':
     main()
\ No newline at end of file
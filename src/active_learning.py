@@ -0,0 +1,245 @@
+"""
+Active-learning ranker for wick testing
+Scores every untested vessel x wax x fragrance combination with the trained
+model and surfaces the ones whose test would teach it the most
+"""
+
+import heapq
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .supabase_tables import fetch_all
+
+# Where each model feature comes from: (catalog, column, label encoder)
+FEATURE_SOURCES = {
+    'volume_ml': ('vessels', 'volume_ml', None),
+    'diameter_mm': ('vessels', 'diameter_mm', None),
+    'height_mm': ('vessels', 'height_mm', None),
+    'double_wick': ('vessels', 'double_wick', None),
+    'heat_dissipation_factor': ('vessels', 'heat_dissipation_factor', None),
+    'vessel_shape_encoded': ('vessels', 'shape', 'vessel_shape'),
+    'vessel_material_encoded': ('vessels', 'material', 'vessel_material'),
+    'melt_point_celsius': ('wax_types', 'melt_point_celsius', None),
+    'viscosity_index': ('wax_types', 'viscosity_index', None),
+    'wax_base_type_encoded': ('wax_types', 'base_type', 'wax_base_type'),
+    'flash_point_celsius': ('fragrance_oils', 'flash_point_celsius', None),
+    'heat_index': ('fragrance_oils', 'heat_index', None),
+    'fragrance_category_encoded': ('fragrance_oils', 'fragrance_category', 'fragrance_category'),
+}
+
+CATALOGS = ('vessels', 'wax_types', 'fragrance_oils')
+
+# Fragrance load assumed for combinations nobody has made yet (same as quick-check)
+DEFAULT_FRAGRANCE_LOAD = 8.5
+
+
+def encoded_labels(encoder) -> Tuple[Dict, int]:
+    """Label -> code for a fitted LabelEncoder, and the code used for unseen labels"""
+    classes = {label: i for i, label in enumerate(encoder.classes_)} if encoder is not None else {}
+    return classes, classes.get('unknown', 0)
+
+
+@dataclass
+class CandidatePriority:
+    """An untested combination ranked by expected value of testing it"""
+    vessel_id: str
+    wax_type_id: str
+    fragrance_oil_id: str
+    name: str
+    predicted_wick_id: str
+    predicted_wick_name: Optional[str]
+    entropy: float
+    margin: float
+    uncertainty_score: float
+    demand: int
+    score: float
+
+
+class ActiveLearningRanker:
+    """Ranks untested vessel/wax/fragrance combinations for the next lab tests.
+
+    Each candidate is scored from the model's full ``predict_proba`` row:
+    normalized predictive entropy and the gap between the two likeliest
+    wicks, averaged into an uncertainty in [0, 1] and weighted by
+    ``log(1 + n)`` where n is how many assemblies share the vessel/wax pair.
+    Candidates are generated and scored in fixed-size NumPy batches, and the
+    best ``k`` are kept in a heap, so memory stays flat however large the
+    catalog grows.
+    """
+
+    CATALOG_TTL = 300
+
+    def __init__(self, predictor, batch_size: int = 50000,
+                 fragrance_load: float = DEFAULT_FRAGRANCE_LOAD):
+        self.predictor = predictor
+        self.batch_size = batch_size
+        self.fragrance_load = fragrance_load
+        self._lock = threading.Lock()
+        self._catalog = None
+        self._catalog_loaded_at = None
+        # (model version, k it was computed for, results)
+        self._ranked: Tuple[Optional[str], int, List[CandidatePriority]] = (None, 0, [])
+
+    @property
+    def available(self) -> bool:
+        return self.predictor.model is not None and self.predictor.scaler is not None
+
+    def top_k(self, k: int = 20) -> List[CandidatePriority]:
+        """The ``k`` most informative untested combinations, best first"""
+        with self._lock:
+            catalog = self._load_catalog()
+            version, computed_k, ranked = self._ranked
+            if version != self.predictor.model_version or computed_k < k:
+                ranked = self._rank(catalog, k)
+                self._ranked = (self.predictor.model_version, k, ranked)
+            return ranked[:k]
+
+    def _load_catalog(self) -> Dict:
+        now = time.monotonic()
+        if self._catalog is not None and now - self._catalog_loaded_at <= self.CATALOG_TTL:
+            return self._catalog
+
+        supabase = self.predictor.supabase
+        catalog = {
+            'vessels': fetch_all(supabase, 'vessels', 'id, name, volume_ml, diameter_mm, height_mm, '
+                                 'double_wick, heat_dissipation_factor, shape, material'),
+            'wax_types': fetch_all(supabase, 'wax_types', 'id, name, melt_point_celsius, '
+                                   'viscosity_index, base_type'),
+            'fragrance_oils': fetch_all(supabase, 'fragrance_oils', 'id, name, flash_point_celsius, '
+                                        'heat_index, fragrance_category'),
+            'wick_names': {row['id']: row['name'] for row in fetch_all(supabase, 'wicks', 'id, name')},
+        }
+
+        # A combination counts as tested once an assembly is approved or has a test result
+        assemblies = fetch_all(supabase, 'assemblies',
+                               'id, vessel_id, wax_type_id, fragrance_oil_id, approved_date')
+        tested_assemblies = {row['assembly_id'] for row in fetch_all(supabase, 'test_results', 'assembly_id')}
+        catalog['tested'] = {
+            (row['vessel_id'], row['wax_type_id'], row['fragrance_oil_id'])
+            for row in assemblies
+            if row['approved_date'] or row['id'] in tested_assemblies
+        }
+
+        self._catalog = catalog
+        self._catalog_loaded_at = now
+        self._ranked = (None, 0, [])
+        return catalog
+
+    def _feature_block(self, rows: List[Dict], columns: List[Tuple[int, str, Optional[str]]]) -> np.ndarray:
+        """One catalog's feature columns as a float matrix, built like /predict builds them"""
+        block = np.empty((len(rows), len(columns)), dtype=float)
+        feature_names = self.predictor.feature_names
+        for j, (i, column, _) in enumerate(columns):
+            block[:, j] = self.predictor.feature_values(feature_names[i], [row.get(column) for row in rows])
+        return block
+
+    def _rank(self, catalog: Dict, k: int) -> List[CandidatePriority]:
+        predictor = self.predictor
+        feature_names = predictor.feature_names
+        vessels, waxes, fragrances = (catalog[name] for name in CATALOGS)
+        n_vessels, n_waxes, n_fragrances = len(vessels), len(waxes), len(fragrances)
+        total = n_vessels * n_waxes * n_fragrances
+        if k <= 0 or total == 0:
+            return []
+
+        # Per-catalog feature matrices, gathered into full rows batch by batch
+        sources = {name: [] for name in CATALOGS}
+        load_column = None
+        for i, feature in enumerate(feature_names):
+            if feature == 'fragrance_load_percentage':
+                load_column = i
+            else:
+                catalog_name, column, encoder_name = FEATURE_SOURCES[feature]
+                sources[catalog_name].append((i, column, encoder_name))
+        blocks = {name: self._feature_block(catalog[name], sources[name]) for name in CATALOGS}
+        positions = {name: [i for i, _, _ in sources[name]] for name in CATALOGS}
+
+        vessel_index = {row['id']: i for i, row in enumerate(vessels)}
+        wax_index = {row['id']: i for i, row in enumerate(waxes)}
+        fragrance_index = {row['id']: i for i, row in enumerate(fragrances)}
+
+        tested = np.array(sorted(
+            (vessel_index[v] * n_waxes + wax_index[w]) * n_fragrances + fragrance_index[f]
+            for v, w, f in catalog['tested']
+            if v in vessel_index and w in wax_index and f in fragrance_index
+        ), dtype=np.int64)
+
+        counts = predictor.get_assembly_counts()
+        demand_counts = np.array([[counts.get((vessel['id'], wax['id'])) or 0 for wax in waxes]
+                                  for vessel in vessels], dtype=np.int64)
+        # Same weighting as the prediction-based priorities: log(n + 1), n at least 1
+        demand_weights = np.log(np.maximum(demand_counts, 1) + 1)
+
+        mean = predictor.scaler.mean_
+        scale = predictor.scaler.scale_
+        classes = predictor.label_encoders['target'].inverse_transform(
+            np.asarray(predictor.model.classes_, dtype=int))
+
+        heap: List[Tuple[float, int, float, float, int]] = []
+        for start in range(0, total, self.batch_size):
+            flat = np.arange(start, min(start + self.batch_size, total), dtype=np.int64)
+            if tested.size:
+                flat = flat[~np.isin(flat, tested, assume_unique=True)]
+            if not flat.size:
+                continue
+
+            vi = flat // (n_waxes * n_fragrances)
+            wi = (flat // n_fragrances) % n_waxes
+            fi = flat % n_fragrances
+
+            X = np.empty((flat.size, len(feature_names)), dtype=float)
+            X[:, positions['vessels']] = blocks['vessels'][vi]
+            X[:, positions['wax_types']] = blocks['wax_types'][wi]
+            X[:, positions['fragrance_oils']] = blocks['fragrance_oils'][fi]
+            if load_column is not None:
+                X[:, load_column] = self.fragrance_load
+            X = (X - mean) / scale
+
+            probabilities = predictor.model.predict_proba(X)
+            n_classes = probabilities.shape[1]
+            if n_classes > 1:
+                entropy = -(probabilities * np.log(np.clip(probabilities, 1e-12, 1.0))).sum(axis=1)
+                entropy /= np.log(n_classes)
+                top_two = np.partition(probabilities, n_classes - 2, axis=1)[:, -2:]
+                margin = top_two[:, 1] - top_two[:, 0]
+            else:
+                entropy = np.zeros(flat.size)
+                margin = np.ones(flat.size)
+
+            scores = (0.5 * entropy + 0.5 * (1 - margin)) * demand_weights[vi, wi]
+
+            # Only this batch's best k can possibly make the overall top k
+            keep = min(k, flat.size)
+            best = np.argpartition(-scores, keep - 1)[:keep]
+            predicted = probabilities[best].argmax(axis=1)
+            for j, cls in zip(best, predicted):
+                item = (float(scores[j]), int(flat[j]), float(entropy[j]), float(margin[j]), int(cls))
+                if len(heap) < k:
+                    heapq.heappush(heap, item)
+                elif item > heap[0]:
+                    heapq.heapreplace(heap, item)
+
+        results = []
+        for score, flat_index, entropy, margin, cls in sorted(heap, reverse=True):
+            vi, rest = divmod(flat_index, n_waxes * n_fragrances)
+            wi, fi = divmod(rest, n_fragrances)
+            vessel, wax, fragrance = vessels[vi], waxes[wi], fragrances[fi]
+            wick_id = str(classes[cls])
+            results.append(CandidatePriority(
+                vessel_id=vessel['id'],
+                wax_type_id=wax['id'],
+                fragrance_oil_id=fragrance['id'],
+                name=f"{vessel['name']} / {wax['name']} / {fragrance['name']}",
+                predicted_wick_id=wick_id,
+                predicted_wick_name=catalog['wick_names'].get(wick_id),
+                entropy=entropy,
+                margin=margin,
+                uncertainty_score=0.5 * entropy + 0.5 * (1 - margin),
+                demand=int(demand_counts[vi, wi]),
+                score=score
+            ))
+        return results
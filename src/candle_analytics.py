@@ -0,0 +1,191 @@
+import math
+import threading
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import func, select
+
+from .evaluations import PASS_CRITERIA
+from .models import db, CandleTest, CandleTrial, CandleEvaluation, EVALUATION_HOURS
+
+GROUP_DIMENSIONS = ('wick', 'vessel', 'wax')
+DISTRIBUTION_QUANTILES = (0.25, 0.5, 0.75, 0.9)
+
+EVALUATION_COLUMNS = (
+    ('test_id', CandleTest.id),
+    ('vessel', CandleTest.vessel),
+    ('wax', CandleTest.wax),
+    ('trial_id', CandleTrial.id),
+    ('wick', CandleTrial.wick),
+    ('evaluation_type', CandleEvaluation.evaluation_type),
+    ('full_melt_pool', CandleEvaluation.full_melt_pool),
+    ('melt_pool_depth', CandleEvaluation.melt_pool_depth),
+    ('external_temp', CandleEvaluation.external_temp),
+    ('flame_height', CandleEvaluation.flame_height),
+    ('after_glow', CandleEvaluation.after_glow),
+    ('after_smoke', CandleEvaluation.after_smoke),
+)
+
+
+def load_evaluations() -> pd.DataFrame:
+    """Every evaluation with its trial and test attributes, from a single query."""
+    stmt = select(*[column.label(name) for name, column in EVALUATION_COLUMNS]) \
+        .select_from(CandleEvaluation) \
+        .join(CandleTrial, CandleTrial.id == CandleEvaluation.trial_id) \
+        .join(CandleTest, CandleTest.id == CandleTrial.test_id)
+    rows = db.session.execute(stmt).all()
+
+    frame = pd.DataFrame(rows, columns=[name for name, _ in EVALUATION_COLUMNS])
+    for name in ('melt_pool_depth', 'external_temp', 'flame_height', 'after_glow', 'after_smoke'):
+        frame[name] = pd.to_numeric(frame[name], errors='coerce').astype('float64')
+    frame['full_melt_pool'] = frame['full_melt_pool'].astype('boolean')
+    return frame
+
+
+def trial_outcomes(evaluations: pd.DataFrame) -> pd.DataFrame:
+    """Collapse evaluations to one row per trial with its pass/fail outcome."""
+    trials = evaluations.groupby('trial_id').agg(
+        test_id=('test_id', 'first'),
+        vessel=('vessel', 'first'),
+        wax=('wax', 'first'),
+        wick=('wick', 'first'),
+        max_external_temp=('external_temp', 'max'),
+        max_flame_height=('flame_height', 'max'),
+        max_after_glow=('after_glow', 'max'),
+        max_after_smoke=('after_smoke', 'max'),
+    )
+
+    four_hour = evaluations[evaluations['evaluation_type'] == EVALUATION_HOURS[-1]] \
+        .drop_duplicates('trial_id').set_index('trial_id')
+    trials['finished'] = trials.index.isin(four_hour.index)
+    trials['full_melt_pool'] = four_hour['full_melt_pool'].reindex(trials.index).fillna(False).astype(bool)
+
+    passed = trials['full_melt_pool'].to_numpy(copy=True)
+    for column, limit in PASS_CRITERIA.items():
+        values = trials[column].to_numpy()
+        passed &= np.isnan(values) | (values <= limit)
+    trials['passed'] = passed & trials['finished'].to_numpy()
+    return trials
+
+
+def _clean(value: Any) -> Any:
+    """NaN/NumPy scalars to JSON-safe Python values."""
+    if value is None or value is pd.NA:
+        return None
+    if isinstance(value, np.integer):
+        return int(value)
+    if isinstance(value, (float, np.floating)):
+        return None if math.isnan(value) else round(float(value), 3)
+    return value
+
+
+def _distribution(evaluations: pd.DataFrame, dimension: str, column: str) -> pd.DataFrame:
+    grouped = evaluations.groupby(dimension)[column]
+    stats = grouped.agg(['count', 'mean', 'std', 'min', 'max'])
+    quantiles = grouped.quantile(list(DISTRIBUTION_QUANTILES)).unstack()
+    quantiles.columns = [f"p{int(q * 100)}" for q in quantiles.columns]
+    return stats.join(quantiles)
+
+
+def _distribution_dict(table: pd.DataFrame, key: Any) -> Optional[Dict[str, Any]]:
+    if key not in table.index:
+        return None
+    stats = {stat: _clean(value) for stat, value in table.loc[key].items()}
+    stats['count'] = int(stats['count'] or 0)
+    return stats
+
+
+def group_statistics(evaluations: pd.DataFrame, trials: pd.DataFrame, dimension: str) -> List[Dict[str, Any]]:
+    """Pass rates, melt-pool curves and temperature/flame distributions per group."""
+    finished = trials[trials['finished']]
+    outcome = trials.groupby(dimension).agg(tests=('test_id', 'nunique'), trials=('wick', 'size')) \
+        .join(finished.groupby(dimension).agg(finished_trials=('passed', 'size'), passed=('passed', 'sum')))
+    outcome[['finished_trials', 'passed']] = outcome[['finished_trials', 'passed']].fillna(0)
+    outcome['pass_rate'] = outcome['passed'] / outcome['finished_trials'].replace(0, np.nan)
+
+    hourly = evaluations[evaluations['evaluation_type'].isin(EVALUATION_HOURS)]
+    curves = hourly.groupby([dimension, 'evaluation_type'])['melt_pool_depth'].mean() \
+        .unstack().reindex(columns=list(EVALUATION_HOURS))
+    full_melt = hourly.groupby([dimension, 'evaluation_type'])['full_melt_pool'].mean() \
+        .unstack().reindex(columns=list(EVALUATION_HOURS))
+
+    distributions = {column: _distribution(hourly, dimension, column)
+                     for column in ('external_temp', 'flame_height')}
+    after_burn = evaluations.groupby(dimension)[['after_glow', 'after_smoke']].mean()
+
+    results = []
+    for key, row in outcome.sort_values('trials', ascending=False).iterrows():
+        curve = curves.loc[key] if key in curves.index else None
+        melt = full_melt.loc[key] if key in full_melt.index else None
+        results.append({
+            dimension: key,
+            'tests': int(row['tests']),
+            'trials': int(row['trials']),
+            'finished_trials': int(row['finished_trials']),
+            'pass_rate': _clean(row['pass_rate']),
+            'melt_pool_curve': {hour: _clean(curve[hour]) if curve is not None else None
+                                for hour in EVALUATION_HOURS},
+            'melt_pool_growth': _clean(curve[EVALUATION_HOURS[-1]] - curve[EVALUATION_HOURS[0]])
+                                if curve is not None else None,
+            'full_melt_rate': {hour: _clean(melt[hour]) if melt is not None else None
+                               for hour in EVALUATION_HOURS},
+            **{column: _distribution_dict(table, key) for column, table in distributions.items()},
+            'after_glow_mean': _clean(after_burn.loc[key, 'after_glow']) if key in after_burn.index else None,
+            'after_smoke_mean': _clean(after_burn.loc[key, 'after_smoke']) if key in after_burn.index else None,
+        })
+    return results
+
+
+def build_report() -> Dict[str, Any]:
+    evaluations = load_evaluations()
+    report = {
+        'generated_at': datetime.utcnow().isoformat(),
+        'criteria': PASS_CRITERIA,
+        'totals': {'tests': 0, 'trials': 0, 'evaluations': 0, 'finished_trials': 0, 'pass_rate': None},
+    }
+    for dimension in GROUP_DIMENSIONS:
+        report[f"by_{dimension}"] = []
+    if evaluations.empty:
+        return report
+
+    trials = trial_outcomes(evaluations)
+    finished = int(trials['finished'].sum())
+    report['totals'] = {
+        'tests': int(trials['test_id'].nunique()),
+        'trials': len(trials),
+        'evaluations': len(evaluations),
+        'finished_trials': finished,
+        'pass_rate': _clean(trials['passed'].sum() / finished) if finished else None,
+    }
+    for dimension in GROUP_DIMENSIONS:
+        report[f"by_{dimension}"] = group_statistics(evaluations, trials, dimension)
+    return report
+
+
+def data_version() -> Tuple:
+    """Changes whenever an evaluation is saved or a trial is added."""
+    return tuple(db.session.execute(select(
+        select(func.count()).select_from(CandleEvaluation).scalar_subquery(),
+        select(func.count()).select_from(CandleTrial).scalar_subquery(),
+        select(func.max(CandleTrial.last_evaluated_at)).scalar_subquery(),
+    )).one())
+
+
+class CandleAnalytics:
+    """Cross-test burn statistics, rebuilt only when the evaluation data changes"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version: Optional[Tuple] = None
+        self._report: Optional[Dict[str, Any]] = None
+
+    def report(self) -> Dict[str, Any]:
+        version = data_version()
+        with self._lock:
+            if self._report is None or version != self._version:
+                self._report = build_report()
+                self._report['data_version'] = [str(part) for part in version]
+                self._version = version
+            return self._report
@@ -0,0 +1,160 @@
+import csv
+import io
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from sqlalchemy import Integer, case, cast, func, select
+
+from .evaluations import HOURLY_FIELDS, POST_EXTINGUISH, POST_EXTINGUISH_FIELDS
+from .models import db, CandleTest, CandleTrial, CandleEvaluation, EVALUATION_HOURS
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+
+# Columns filtered by exact match; dates filter on the test's created_at
+EXPORT_FILTERS = {
+    'vessel': CandleTest.vessel,
+    'wax': CandleTest.wax,
+    'fragrance': CandleTest.fragrance,
+    'created_by': CandleTest.created_by,
+    'wick': CandleTrial.wick,
+}
+
+BOOLEAN_FIELDS = ('full_melt_pool',)
+
+TEST_COLUMNS = (
+    ('test_id', CandleTest.id),
+    ('vessel', CandleTest.vessel),
+    ('wax', CandleTest.wax),
+    ('fragrance', CandleTest.fragrance),
+    ('blend_percentage', CandleTest.blend_percentage),
+    ('created_by', CandleTest.created_by),
+    ('test_created_at', CandleTest.created_at),
+    ('trial_id', CandleTrial.id),
+    ('trial_number', CandleTrial.trial_number),
+    ('wick', CandleTrial.wick),
+)
+
+# One column per (hour, measurement), e.g. '2hr_melt_pool_depth'
+PIVOT_COLUMNS = tuple(
+    [(f"{hour}_{field}", hour, field) for hour in EVALUATION_HOURS for field in HOURLY_FIELDS] +
+    [(field, POST_EXTINGUISH, field) for field in POST_EXTINGUISH_FIELDS]
+)
+
+EXPORT_COLUMNS = tuple(name for name, _ in TEST_COLUMNS) + tuple(name for name, _, _ in PIVOT_COLUMNS)
+
+
+def parse_date_range(start: Optional[str], end: Optional[str]) -> Tuple[Optional[datetime], Optional[datetime]]:
+    """ISO dates/datetimes to a half-open [start, end) range; a bare end date is inclusive."""
+    start_at = datetime.fromisoformat(start) if start else None
+    end_at = None
+    if end:
+        end_at = datetime.fromisoformat(end)
+        if len(end) == 10:
+            end_at += timedelta(days=1)
+    return start_at, end_at
+
+
+def export_query(filters: Optional[Dict[str, str]] = None,
+                 start: Optional[datetime] = None, end: Optional[datetime] = None):
+    """One row per trial with each evaluation pivoted into its own columns."""
+    pivots = []
+    for name, hour, field in PIVOT_COLUMNS:
+        value = getattr(CandleEvaluation, field)
+        if field in BOOLEAN_FIELDS:
+            # MAX() over booleans isn't portable, so aggregate them as 0/1
+            value = cast(value, Integer)
+        pivots.append(func.max(case((CandleEvaluation.evaluation_type == hour, value))).label(name))
+
+    stmt = select(*[column.label(name) for name, column in TEST_COLUMNS], *pivots) \
+        .select_from(CandleTrial) \
+        .join(CandleTest, CandleTest.id == CandleTrial.test_id) \
+        .outerjoin(CandleEvaluation, CandleEvaluation.trial_id == CandleTrial.id)
+
+    for name, value in (filters or {}).items():
+        if name in EXPORT_FILTERS and value:
+            stmt = stmt.where(EXPORT_FILTERS[name] == value)
+    if start is not None:
+        stmt = stmt.where(CandleTest.created_at >= start)
+    if end is not None:
+        stmt = stmt.where(CandleTest.created_at < end)
+
+    return stmt.group_by(*[column for _, column in TEST_COLUMNS]) \
+        .order_by(CandleTest.created_at, CandleTest.id, CandleTrial.trial_number)
+
+
+def iter_export_chunks(filters: Optional[Dict[str, str]] = None,
+                       start: Optional[datetime] = None, end: Optional[datetime] = None,
+                       chunk_size: int = 1000) -> Iterator[List[Sequence[Any]]]:
+    """Stream the export in lists of at most ``chunk_size`` rows using a server-side cursor."""
+    boolean_positions = [i for i, name in enumerate(EXPORT_COLUMNS) if name.endswith(BOOLEAN_FIELDS)]
+
+    stmt = export_query(filters, start, end).execution_options(stream_results=True, yield_per=chunk_size)
+    result = db.session.execute(stmt)
+    try:
+        for partition in result.partitions():
+            rows = [list(row) for row in partition]
+            for row in rows:
+                for i in boolean_positions:
+                    if row[i] is not None:
+                        row[i] = bool(row[i])
+            yield rows
+    finally:
+        result.close()
+
+
+def iter_csv(chunks: Iterator[List[Sequence[Any]]]) -> Iterator[str]:
+    """CSV text, one piece per chunk, suitable for a streaming response."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    for rows in chunks:
+        writer.writerows(rows)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()
+
+
+def _parquet_schema():
+    types = {
+        'blend_percentage': pa.float64(),
+        'test_created_at': pa.timestamp('us'),
+        'trial_number': pa.int64(),
+        'after_glow': pa.int64(),
+        'after_smoke': pa.int64(),
+    }
+    fields = []
+    for name in EXPORT_COLUMNS:
+        if name in types:
+            fields.append(pa.field(name, types[name]))
+        elif name.endswith(BOOLEAN_FIELDS):
+            fields.append(pa.field(name, pa.bool_()))
+        elif name.endswith(HOURLY_FIELDS):
+            fields.append(pa.field(name, pa.float64()))
+        else:
+            fields.append(pa.field(name, pa.string()))
+    return pa.schema(fields)
+
+
+def write_parquet(chunks: Iterator[List[Sequence[Any]]], path: str) -> int:
+    """Write the export to a Parquet file one row group per chunk; returns the row count."""
+    if pa is None:
+        raise RuntimeError('Parquet export requires pyarrow (pip install pyarrow)')
+
+    schema = _parquet_schema()
+    count = 0
+    with pq.ParquetWriter(path, schema) as writer:
+        for rows in chunks:
+            columns = list(zip(*rows))
+            writer.write_table(pa.Table.from_arrays(
+                [pa.array(values, type=field.type) for values, field in zip(columns, schema)],
+                schema=schema
+            ))
+            count += len(rows)
+    return count
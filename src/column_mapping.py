@@ -0,0 +1,89 @@
+from operator import itemgetter
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+
+def _typed(convert: Callable[[str], Any], default: Any) -> Callable[[Any], Any]:
+    """Wrap a converter so blank cells fall back to the field default."""
+    def converter(value):
+        if value is None:
+            return default
+        if isinstance(value, str):
+            value = value.strip()
+            if not value:
+                return default
+        return convert(value)
+    return converter
+
+
+def _raw(default: Any) -> Callable[[Any], Any]:
+    def converter(value):
+        return default if value is None else value
+    return converter
+
+
+# (field, header keywords, converter, default) - first header containing any keyword wins
+FIELD_RULES: Tuple[Tuple[str, Tuple[str, ...], Callable[[Any], Any], Any], ...] = (
+    ('sku', ('sku', 'name', 'product', 'item'), _raw(''), ''),
+    ('price', ('price', 'cost', 'amount'), _typed(float, 0), 0),
+    ('quantity', ('qty', 'quantity', 'qnty'), _typed(int, 1), 1),
+    ('description', ('description',), _raw(''), ''),
+    ('case_qty', ('case qty', 'case_qty', 'case quantity'), _typed(int, 1), 1),
+)
+
+
+class ColumnMappingPlan:
+    """Column mapping for label uploads, worked out once from the CSV header.
+
+    The header is matched against ``FIELD_RULES`` a single time; the result is
+    compiled into one ``itemgetter`` plus per-field converters that every row
+    goes through. With ``by_index=True`` the plan projects plain list rows
+    (``csv.reader``) instead of dicts (``csv.DictReader``).
+    """
+
+    def __init__(self, columns: Sequence[str], by_index: bool = False):
+        self.columns = list(columns)
+        self.mapping: Dict[str, Optional[str]] = {}
+
+        keys = []
+        self._converters: List[Tuple[str, Callable[[Any], Any]]] = []
+        self._defaults: Dict[str, Any] = {}
+
+        for field, keywords, converter, default in FIELD_RULES:
+            index = self._find_column(keywords)
+            if index is None:
+                self.mapping[field] = None
+                self._defaults[field] = default
+                continue
+            self.mapping[field] = self.columns[index]
+            keys.append(index if by_index else self.columns[index])
+            self._converters.append((field, converter))
+
+        if not keys:
+            self._getter = None
+        elif len(keys) == 1:
+            # itemgetter with a single key returns a bare value, not a tuple
+            single = itemgetter(keys[0])
+            self._getter = lambda row: (single(row),)
+        else:
+            self._getter = itemgetter(*keys)
+
+    def _find_column(self, keywords: Tuple[str, ...]) -> Optional[int]:
+        for index, column in enumerate(self.columns):
+            lowered = column.lower()
+            if any(keyword in lowered for keyword in keywords):
+                return index
+        return None
+
+    def project(self, row) -> Dict[str, Any]:
+        """Map one CSV row onto the label item fields."""
+        item = dict(self._defaults)
+        if self._getter is not None:
+            values = self._getter(row)
+            for (field, converter), value in zip(self._converters, values):
+                item[field] = converter(value)
+        return item
+
+    def project_all(self, rows: Iterable) -> Iterator[Dict[str, Any]]:
+        project = self.project
+        for row in rows:
+            yield project(row)
@@ -1,28 +1,114 @@
+import codecs
 import csv
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterator, Optional, Union
+
+# Bytes read from the start of the file to detect encoding and dialect
+SAMPLE_SIZE = 64 * 1024
 
 
 class CSVParser:
-    def __init__(self, file_path: str):
+    def __init__(self, file_path: str, encoding: Optional[str] = None):
         self.file_path = file_path
         self.data = []
         self.columns = []
-    
+        self.encoding = encoding
+        self.dialect = None
+
     def parse(self) -> List[Dict[str, Any]]:
+        """Load the whole file. Prefer iter_rows/iter_chunks for large files."""
+        self.data = list(self.iter_rows())
+        return self.data
+
+    def iter_rows(self, as_dict: bool = True) -> Iterator[Union[Dict[str, Any], List[str]]]:
+        """Stream rows one at a time without holding the file in memory.
+
+        Rows are dicts keyed by header (like csv.DictReader) or, with
+        ``as_dict=False``, plain lists padded to the header width.
+        """
+        self._sniff()
         try:
-            with open(self.file_path, 'r', encoding='utf-8') as file:
-                reader = csv.DictReader(file)
-                self.columns = reader.fieldnames or []
-                self.data = list(reader)
-            return self.data
+            with open(self.file_path, 'r', encoding=self.encoding, newline='') as file:
+                reader = csv.reader(file, self.dialect)
+                self.columns = next(reader, None) or []
+                width = len(self.columns)
+
+                for row in reader:
+                    if not row:
+                        continue
+                    if as_dict:
+                        yield dict(zip(self.columns, row + [None] * (width - len(row))))
+                    else:
+                        if len(row) < width:
+                            row += [''] * (width - len(row))
+                        yield row
         except Exception as e:
             raise Exception(f"Error parsing CSV file: {str(e)}")
-    
+
+    def iter_chunks(self, chunk_size: int = 1000, as_dict: bool = True) -> Iterator[List[Any]]:
+        """Stream rows in lists of at most ``chunk_size``."""
+        chunk = []
+        for row in self.iter_rows(as_dict=as_dict):
+            chunk.append(row)
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
     def get_columns(self) -> List[str]:
         if not self.columns:
-            self.parse()
+            # Only the header row is read
+            self._sniff()
+            try:
+                with open(self.file_path, 'r', encoding=self.encoding, newline='') as file:
+                    self.columns = next(csv.reader(file, self.dialect), None) or []
+            except Exception as e:
+                raise Exception(f"Error parsing CSV file: {str(e)}")
         return self.columns
-    
+
     def validate_required_columns(self, required_columns: List[str]) -> bool:
         columns = self.get_columns()
-        return all(col in columns for col in required_columns)
\ No newline at end of file
+        return all(col in columns for col in required_columns)
+
+    def _sniff(self):
+        """Detect encoding and dialect from a leading sample, once."""
+        if self.dialect is not None:
+            return
+
+        with open(self.file_path, 'rb') as file:
+            sample = file.read(SAMPLE_SIZE)
+
+        if self.encoding is None:
+            self.encoding = self._detect_encoding(sample)
+
+        text = sample.decode(self.encoding, errors='replace')
+        if len(sample) == SAMPLE_SIZE:
+            # Drop the trailing partial line so the sniffer sees whole records
+            text = text[:text.rfind('\n') + 1] or text
+
+        try:
+            self.dialect = csv.Sniffer().sniff(text, delimiters=',;\t|')
+        except csv.Error:
+            self.dialect = csv.excel
+
+    @staticmethod
+    def _detect_encoding(sample: bytes) -> str:
+        if sample.startswith(codecs.BOM_UTF8):
+            return 'utf-8-sig'
+        if sample.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+            return 'utf-16'
+
+        try:
+            sample.decode('utf-8')
+            return 'utf-8'
+        except UnicodeDecodeError as e:
+            # A multi-byte character cut off by the sample boundary is still UTF-8
+            if e.reason == 'unexpected end of data' and e.start >= len(sample) - 3:
+                return 'utf-8'
+
+        # Excel on Windows exports CP1252; latin-1 accepts the few bytes CP1252 leaves undefined
+        try:
+            sample.decode('cp1252')
+            return 'cp1252'
+        except UnicodeDecodeError:
+            return 'latin-1'
@@ -0,0 +1,105 @@
+import functools
+import os
+import random
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+from sqlalchemy import event
+from sqlalchemy.exc import OperationalError
+
+
+# Applied to every new SQLite connection. WAL lets readers run alongside the
+# single writer, and NORMAL sync is durable across app crashes under WAL.
+SQLITE_PRAGMAS: Dict[str, Any] = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 5000)),
+    'mmap_size': int(os.environ.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024)),
+    'cache_size': -int(os.environ.get('SQLITE_CACHE_KB', 64 * 1024)),  # negative = KiB
+    'temp_store': 'MEMORY',
+}
+
+LOCK_ERRORS = ('database is locked', 'database table is locked', 'database is busy')
+
+
+def apply_sqlite_pragmas(dbapi_connection, pragmas: Optional[Dict[str, Any]] = None):
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in (pragmas or SQLITE_PRAGMAS).items():
+            cursor.execute(f"PRAGMA {name}={value}")
+    finally:
+        cursor.close()
+
+
+def configure_sqlite_engine(engine, pragmas: Optional[Dict[str, Any]] = None) -> bool:
+    """Run the tuning PRAGMAs on each connection the engine opens.
+
+    Does nothing for non-SQLite engines. Connections that are already pooled
+    are discarded so that every connection gets the settings.
+    """
+    if engine.dialect.name != 'sqlite':
+        return False
+
+    @event.listens_for(engine, 'connect')
+    def _on_connect(dbapi_connection, connection_record):
+        apply_sqlite_pragmas(dbapi_connection, pragmas)
+
+    engine.dispose()
+    return True
+
+
+def is_lock_error(error: Exception) -> bool:
+    message = str(getattr(error, 'orig', error)).lower()
+    return any(text in message for text in LOCK_ERRORS)
+
+
+def retry_on_lock(session=None, attempts: int = 5, base_delay: float = 0.05, max_delay: float = 1.0):
+    """Retry a write when SQLite reports lock contention.
+
+    busy_timeout covers most waits. A deferred transaction that read before it
+    tried to write can still fail at once with "database is locked", so the
+    whole unit of work is rolled back and run again with jittered exponential
+    backoff. The wrapped function must do its own commit.
+    """
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            for attempt in range(attempts):
+                try:
+                    return func(*args, **kwargs)
+                except OperationalError as e:
+                    if not is_lock_error(e) or attempt == attempts - 1:
+                        raise
+                    if session is not None:
+                        session.rollback()
+                    delay = min(max_delay, base_delay * (2 ** attempt))
+                    time.sleep(delay * random.uniform(0.5, 1.5))
+        return wrapper
+    return decorator
+
+
+@contextmanager
+def schema_lock(engine):
+    """Hold an exclusive lock across processes that share one SQLite file.
+
+    gunicorn imports the app in every worker at once, so schema upgrades and
+    seeding run under this lock. Without fcntl or a file-backed database it
+    does nothing.
+    """
+    path = engine.url.database if engine.dialect.name == 'sqlite' else None
+    if fcntl is None or not path or path == ':memory:':
+        yield
+        return
+
+    with open(f"{path}.schema-lock", 'w') as handle:
+        fcntl.flock(handle, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(handle, fcntl.LOCK_UN)
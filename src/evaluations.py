@@ -0,0 +1,309 @@
+import json
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+from flask import current_app
+from sqlalchemy import case, func, update
+
+from .db_tuning import retry_on_lock
+from .models import db, CandleTest, CandleTrial, CandleEvaluation, EvaluationOutbox, EVALUATION_HOURS, evaluations_dict
+
+
+POST_EXTINGUISH = 'post_extinguish'
+EVALUATION_TYPES = EVALUATION_HOURS + (POST_EXTINGUISH,)
+
+# CandleTrial.completed_hours has one bit per evaluation type, in this order
+HOUR_BITS = {hour: 1 << i for i, hour in enumerate(EVALUATION_TYPES)}
+COMPLETE_MASK = sum(HOUR_BITS[hour] for hour in EVALUATION_HOURS)
+
+# Columns each kind of evaluation writes; the rest are left untouched on update
+HOURLY_FIELDS = ('full_melt_pool', 'melt_pool_depth', 'external_temp', 'flame_height')
+POST_EXTINGUISH_FIELDS = ('after_glow', 'after_smoke')
+
+# A finished trial (one with a 4hr reading) passes when it reached a full melt
+# pool by 4hr and no reading exceeded these limits. Missing readings don't fail.
+# These are working limits for the analytics report, not a lab standard:
+# results shipped to Supabase only carry a verdict when the limits are set
+# explicitly through the CANDLE_PASS_CRITERIA config (see parse_pass_criteria).
+PASS_CRITERIA = {
+    'max_external_temp': 140.0,  # °F
+    'max_flame_height': 2.0,     # inches
+    'max_after_glow': 30,        # seconds
+    'max_after_smoke': 30,       # seconds
+}
+
+MM_PER_INCH = 25.4
+
+
+class UnknownTrialsError(LookupError):
+    """Raised when a batch references trials that don't exist"""
+
+    def __init__(self, trial_ids: List[str]):
+        super().__init__(f"Trial not found: {', '.join(trial_ids)}")
+        self.trial_ids = trial_ids
+
+
+def parse_pass_criteria(text: str) -> Dict[str, float]:
+    """CANDLE_PASS_CRITERIA from its JSON form, e.g. '{"max_flame_height": 2.0}'"""
+    try:
+        criteria = json.loads(text)
+    except ValueError as e:
+        raise ValueError(f"CANDLE_PASS_CRITERIA is not valid JSON: {e}")
+    if not isinstance(criteria, dict) or not criteria:
+        raise ValueError('CANDLE_PASS_CRITERIA must be a non-empty JSON object')
+
+    unknown = sorted(set(criteria) - set(PASS_CRITERIA))
+    if unknown:
+        raise ValueError(f"Unknown CANDLE_PASS_CRITERIA keys: {', '.join(unknown)} "
+                         f"(expected {', '.join(PASS_CRITERIA)})")
+    if not all(isinstance(limit, (int, float)) and not isinstance(limit, bool) for limit in criteria.values()):
+        raise ValueError('CANDLE_PASS_CRITERIA limits must be numbers')
+    return {criterion: float(limit) for criterion, limit in criteria.items()}
+
+
+def normalize_evaluation(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Turn one request record into a candle_evaluations row."""
+    try:
+        trial_id = data['trial_id']
+        hour = data['hour']
+    except (KeyError, TypeError):
+        raise ValueError('Each evaluation needs trial_id and hour')
+
+    if hour not in EVALUATION_TYPES:
+        raise ValueError(f"Unknown evaluation hour: {hour}")
+
+    fields = POST_EXTINGUISH_FIELDS if hour == POST_EXTINGUISH else HOURLY_FIELDS
+    row = {'trial_id': trial_id, 'evaluation_type': hour}
+    row.update({field: data.get(field) for field in fields})
+    return row
+
+
+def _insert(table):
+    if db.engine.dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(table)
+
+
+def _upsert_statement(fields):
+    stmt = _insert(CandleEvaluation.__table__)
+    return stmt.on_conflict_do_update(
+        index_elements=['trial_id', 'evaluation_type'],
+        set_={field: stmt.excluded[field] for field in fields}
+    )
+
+
+@retry_on_lock(db.session)
+def save_evaluations(records: Iterable[Dict[str, Any]]) -> int:
+    """Insert or update many evaluations in one transaction.
+
+    All trial ids are checked with a single query, and the rows are written
+    with ``INSERT ... ON CONFLICT (trial_id, evaluation_type) DO UPDATE``. If
+    any record is invalid or names an unknown trial, nothing is written.
+    Returns the number of rows written.
+    """
+    # Later records for the same trial/hour win, as they would with sequential saves
+    rows = {}
+    for data in records:
+        row = normalize_evaluation(data)
+        rows[(row['trial_id'], row['evaluation_type'])] = row
+    if not rows:
+        return 0
+
+    trial_ids = {trial_id for trial_id, _ in rows}
+    trial_tests = dict(db.session.query(CandleTrial.id, CandleTrial.test_id)
+                       .filter(CandleTrial.id.in_(trial_ids)))
+    missing = sorted(trial_ids - trial_tests.keys())
+    if missing:
+        raise UnknownTrialsError(missing)
+
+    hourly = [row for row in rows.values() if row['evaluation_type'] != POST_EXTINGUISH]
+    post_extinguish = [row for row in rows.values() if row['evaluation_type'] == POST_EXTINGUISH]
+
+    try:
+        if hourly:
+            db.session.execute(_upsert_statement(HOURLY_FIELDS), hourly)
+        if post_extinguish:
+            db.session.execute(_upsert_statement(POST_EXTINGUISH_FIELDS), post_extinguish)
+        by_trial = refresh_summaries(trial_tests, evaluated_at=datetime.utcnow())
+        enqueue_test_results(by_trial)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    return len(rows)
+
+
+def summarize_trial(evaluations: List[CandleEvaluation]) -> Dict[str, Any]:
+    """Summary column values for one trial's evaluations."""
+    completed_hours = 0
+    depths = []
+    for evaluation in evaluations:
+        completed_hours |= HOUR_BITS.get(evaluation.evaluation_type, 0)
+        if evaluation.melt_pool_depth is not None:
+            depths.append(evaluation.melt_pool_depth)
+
+    if completed_hours & COMPLETE_MASK == COMPLETE_MASK:
+        status = 'complete'
+    elif evaluations:
+        status = 'in_progress'
+    else:
+        status = 'pending'
+
+    return {
+        'completed_hours': completed_hours,
+        'last_evaluated_at': max((e.created_at for e in evaluations), default=None),
+        'best_melt_pool': max(depths, default=None),
+        'status': status,
+        'evaluations_json': json.dumps(evaluations_dict(evaluations)) if evaluations else None
+    }
+
+
+def refresh_summaries(trial_tests: Dict[str, str], evaluated_at: Optional[datetime] = None):
+    """Recompute summary columns for the given trials and their tests.
+
+    ``trial_tests`` maps trial id to test id. Runs inside the caller's
+    transaction and does not commit. ``evaluated_at`` overrides the trials'
+    last_evaluated_at (a save time); otherwise the newest evaluation is used.
+    Returns the loaded evaluations grouped by trial id.
+    """
+    if not trial_tests:
+        return {}
+
+    by_trial = defaultdict(list)
+    # populate_existing: rows were just written with Core statements behind the ORM's back
+    evaluations = CandleEvaluation.query.filter(CandleEvaluation.trial_id.in_(trial_tests.keys())) \
+        .execution_options(populate_existing=True)
+    for evaluation in evaluations:
+        by_trial[evaluation.trial_id].append(evaluation)
+
+    trial_updates = []
+    for trial_id in trial_tests:
+        summary = summarize_trial(by_trial.get(trial_id, []))
+        if evaluated_at is not None:
+            summary['last_evaluated_at'] = evaluated_at
+        trial_updates.append(dict(summary, id=trial_id))
+    db.session.execute(update(CandleTrial), trial_updates)
+
+    totals = db.session.query(
+        CandleTrial.test_id,
+        func.count(CandleTrial.id),
+        func.sum(case((CandleTrial.status == 'complete', 1), else_=0)),
+        func.max(CandleTrial.last_evaluated_at)
+    ).filter(CandleTrial.test_id.in_(set(trial_tests.values()))) \
+     .group_by(CandleTrial.test_id)
+
+    test_updates = [{
+        'id': test_id,
+        'total_trials': total,
+        'completed_trials': completed,
+        'status': 'completed' if completed == total else 'active',
+        'last_evaluated_at': last_evaluated_at
+    } for test_id, total, completed, last_evaluated_at in totals]
+    if test_updates:
+        db.session.execute(update(CandleTest), test_updates)
+
+    return by_trial
+
+
+def failure_reason(evaluations: List[CandleEvaluation], criteria: Dict[str, float]) -> Optional[str]:
+    """Which check of ``criteria`` a finished trial failed, or None if it passed."""
+    by_hour = {evaluation.evaluation_type: evaluation for evaluation in evaluations}
+    if not by_hour[EVALUATION_HOURS[-1]].full_melt_pool:
+        return 'no_full_melt_pool'
+
+    for criterion, limit in criteria.items():
+        field = criterion[len('max_'):]
+        readings = [getattr(e, field) for e in evaluations if getattr(e, field) is not None]
+        if readings and max(readings) > limit:
+            return criterion
+    return None
+
+
+def test_result_payload(trial: CandleTrial, test: CandleTest, evaluations: List[CandleEvaluation],
+                        criteria: Optional[Dict[str, float]] = None) -> Dict[str, Any]:
+    """A Supabase test_results row for one finished trial.
+
+    ``components`` holds the lab's vessel, wax, fragrance and wick names; the
+    outbox shipper replaces it with assembly_id, wax_type_id_tested and
+    wick_id_tested. pass and failure_reason stay None unless ``criteria``
+    is given.
+    """
+    by_hour = {evaluation.evaluation_type: evaluation for evaluation in evaluations}
+
+    def mm(value):
+        return round(value * MM_PER_INCH, 1) if value is not None else None
+
+    flames = [e.flame_height for e in evaluations if e.flame_height is not None]
+    temps = [e.external_temp for e in evaluations if e.external_temp is not None]
+    reason = failure_reason(evaluations, criteria) if criteria else None
+
+    payload = {
+        'idempotency_key': f"candle-trial:{trial.id}",
+        'components': {
+            'vessel': test.vessel,
+            'wax': test.wax,
+            'fragrance': test.fragrance,
+            'fragrance_load': test.blend_percentage,
+            'wick': trial.wick,
+        },
+        'test_date': by_hour[EVALUATION_HOURS[-1]].created_at.date().isoformat(),
+        'test_type': 'initial',
+        'flame_height_mm': mm(max(flames, default=None)),
+        'container_temp_celsius': round((max(temps) - 32) * 5 / 9, 1) if temps else None,
+        'pass': reason is None if criteria else None,
+        'failure_reason': reason,
+        'notes': f"Lab test {test.id} trial {trial.trial_number}: {test.vessel} / {test.wax} / "
+                 f"{test.fragrance} @ {test.blend_percentage}%",
+        'tested_by': test.created_by
+    }
+    for hour in EVALUATION_HOURS:
+        evaluation = by_hour.get(hour)
+        payload[f"melt_pool_mm_at_{hour[:-2]}h"] = mm(evaluation.melt_pool_depth) if evaluation else None
+    return payload
+
+
+def enqueue_test_results(by_trial: Dict[str, List[CandleEvaluation]]):
+    """Add outbox rows for trials that have their 4hr reading, in the caller's transaction."""
+    finished = [trial_id for trial_id, evaluations in by_trial.items()
+                if any(e.evaluation_type == EVALUATION_HOURS[-1] for e in evaluations)]
+    if not finished:
+        return
+
+    rows = db.session.query(CandleTrial, CandleTest) \
+        .join(CandleTest, CandleTest.id == CandleTrial.test_id) \
+        .filter(CandleTrial.id.in_(finished))
+    criteria = current_app.config.get('CANDLE_PASS_CRITERIA')
+
+    db.session.execute(EvaluationOutbox.__table__.insert(), [{
+        'idempotency_key': f"candle-trial:{trial.id}",
+        'trial_id': trial.id,
+        'payload': json.dumps(test_result_payload(trial, test, by_trial[trial.id], criteria))
+    } for trial, test in rows])
+
+
+def backfill_summaries(batch_size: int = 500) -> int:
+    """Rebuild every trial and test summary from the evaluation rows."""
+    updated = 0
+    last_id = ''
+    while True:
+        batch = dict(db.session.query(CandleTrial.id, CandleTrial.test_id)
+                     .filter(CandleTrial.id > last_id)
+                     .order_by(CandleTrial.id)
+                     .limit(batch_size))
+        if not batch:
+            break
+        refresh_summaries(batch)
+        db.session.commit()
+        updated += len(batch)
+        last_id = max(batch)
+
+    # Tests without trials have nothing to aggregate
+    CandleTest.query.filter(~CandleTest.trials.any()).update(
+        {'total_trials': 0, 'completed_trials': 0, 'status': 'completed'}, synchronize_session=False
+    )
+    db.session.commit()
+    return updated
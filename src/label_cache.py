@@ -0,0 +1,134 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+from dataclasses import asdict
+from typing import Any, Dict, Optional
+
+from .label_formats import LabelFormat
+
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024  # 256MB of cached PDFs
+
+
+class LabelCache:
+    """Content-addressed, disk-backed cache of rendered label PDFs.
+
+    Entries are keyed by a SHA-256 over the normalized items, the label format,
+    the generator version and (for QR labels) the base URL, so identical print
+    requests map to the same file. Files live in ``cache_dir`` as
+    ``cached_<key>.pdf``; hits refresh the file's mtime, and the least recently
+    used entries are evicted once the directory exceeds ``max_bytes``.
+    """
+
+    PREFIX = 'cached_'
+    SUFFIX = '.pdf'
+
+    def __init__(self, cache_dir: str, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(generator_version: str, items: Any, label_format: LabelFormat,
+                 base_url: Optional[str] = None) -> str:
+        """Build a stable hash for a render request."""
+        payload = {
+            'generator': generator_version,
+            'format': asdict(label_format),
+            'items': items,
+            'base_url': base_url,
+        }
+        encoded = json.dumps(payload, sort_keys=True, separators=(',', ':'), default=str)
+        return hashlib.sha256(encoded.encode('utf-8')).hexdigest()
+
+    def filename_for(self, key: str) -> str:
+        return f"{self.PREFIX}{key[:32]}{self.SUFFIX}"
+
+    def path_for(self, key: str) -> str:
+        return os.path.join(self.cache_dir, self.filename_for(key))
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached PDF path for ``key`` or None on a miss."""
+        path = self.path_for(key)
+        try:
+            os.utime(path)  # Touch for LRU ordering
+        except OSError:
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return path
+
+    def put(self, key: str, rendered_path: str) -> str:
+        """Move a freshly rendered PDF into the cache and return its cached path."""
+        path = self.path_for(key)
+        if os.path.abspath(rendered_path) != os.path.abspath(path):
+            try:
+                os.replace(rendered_path, path)
+            except OSError:
+                # Different filesystem - fall back to copy + remove
+                shutil.copyfile(rendered_path, path + '.tmp')
+                os.replace(path + '.tmp', path)
+                os.remove(rendered_path)
+        self._evict()
+        return path
+
+    def _evict(self):
+        """Drop least recently used entries until the cache fits the budget."""
+        entries = []
+        total = 0
+        for name in os.listdir(self.cache_dir):
+            if not (name.startswith(self.PREFIX) and name.endswith(self.SUFFIX)):
+                continue
+            try:
+                st = os.stat(os.path.join(self.cache_dir, name))
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, name))
+            total += st.st_size
+
+        if total <= self.max_bytes:
+            return
+
+        entries.sort()
+        # Never evict the newest entry, even if it alone exceeds the budget
+        for mtime, size, name in entries[:-1]:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.cache_dir, name))
+            except OSError:
+                continue
+            total -= size
+            with self._lock:
+                self.evictions += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters for this process plus current disk usage."""
+        entries = 0
+        size = 0
+        for name in os.listdir(self.cache_dir):
+            if name.startswith(self.PREFIX) and name.endswith(self.SUFFIX):
+                try:
+                    size += os.path.getsize(os.path.join(self.cache_dir, name))
+                    entries += 1
+                except OSError:
+                    pass
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'entries': entries,
+                'bytes': size,
+                'max_bytes': self.max_bytes,
+            }
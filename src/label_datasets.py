@@ -0,0 +1,231 @@
+import gzip
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+from .column_mapping import FIELD_RULES
+
+
+FIELDS = tuple(rule[0] for rule in FIELD_RULES)
+FIELD_DEFAULTS = {field: default for field, _, _, default in FIELD_RULES}
+
+# Coercions for values that arrive from the browser as edits
+FIELD_TYPES = {
+    'sku': str,
+    'price': float,
+    'quantity': int,
+    'description': str,
+    'case_qty': int
+}
+
+_HANDLE_PATTERN = re.compile(r'^[0-9a-f]{32}$')
+
+# Per-handle edit locks are striped over this many locks to keep memory bounded
+EDIT_LOCK_STRIPES = 64
+
+
+class LabelDataset:
+    """Parsed label upload stored column-wise (one list per field)"""
+
+    def __init__(self, handle: str, columns: Dict[str, List[Any]], column_mapping: Dict[str, Optional[str]]):
+        self.handle = handle
+        self.columns = columns
+        self.column_mapping = column_mapping
+
+    def __len__(self) -> int:
+        return len(self.columns['sku'])
+
+    @property
+    def label_count(self) -> int:
+        return sum(int(q) for q in self.columns['quantity'])
+
+    def rows(self, offset: int = 0, limit: int = 50) -> List[Dict[str, Any]]:
+        """One page of rows, each tagged with its position for later edits."""
+        end = min(len(self), offset + limit)
+        return [dict(self._row(i), index=i) for i in range(max(0, offset), end)]
+
+    def items(self) -> Iterator[Dict[str, Any]]:
+        for i in range(len(self)):
+            yield self._row(i)
+
+    def _row(self, i: int) -> Dict[str, Any]:
+        return {field: self.columns[field][i] for field in FIELDS}
+
+    def apply_edits(self, edits: Dict[str, Any]):
+        """Apply a diff from the client.
+
+        ``updates`` is a list of ``{"index": i, <field>: value}`` entries,
+        ``deletes`` a list of indexes and ``appends`` a list of new items.
+        Indexes always refer to positions before this diff is applied.
+        """
+        for update in edits.get('updates', []):
+            index = int(update['index'])
+            if not 0 <= index < len(self):
+                raise ValueError(f'Row index out of range: {index}')
+            for field, value in update.items():
+                if field in FIELD_TYPES:
+                    self.columns[field][index] = FIELD_TYPES[field](value)
+
+        for index in sorted({int(i) for i in edits.get('deletes', [])}, reverse=True):
+            if not 0 <= index < len(self):
+                raise ValueError(f'Row index out of range: {index}')
+            for field in FIELDS:
+                del self.columns[field][index]
+
+        for item in edits.get('appends', []):
+            for field in FIELDS:
+                self.columns[field].append(FIELD_TYPES[field](item.get(field, FIELD_DEFAULTS[field])))
+
+    def copy(self) -> 'LabelDataset':
+        return LabelDataset(self.handle, {field: list(values) for field, values in self.columns.items()},
+                            dict(self.column_mapping))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'handle': self.handle,
+            'columns': self.columns,
+            'column_mapping': self.column_mapping
+        }
+
+
+class LabelDatasetStore:
+    """Keeps uploaded label datasets server-side so clients only pass a handle.
+
+    Datasets are written as gzipped column JSON to ``directory`` (so every web
+    worker can load them) and the most recently used few are kept in memory.
+    A loaded dataset is never changed in place: edit() applies a diff to a
+    copy and swaps it in, so renders and page reads that already hold a
+    dataset keep a consistent one. Datasets untouched for ``max_age``
+    seconds are deleted.
+    """
+
+    def __init__(self, directory: str, max_cached: int = 8, max_age: float = 24 * 3600):
+        self.directory = directory
+        self.max_cached = max_cached
+        self.max_age = max_age
+        self._cache: 'OrderedDict[str, Tuple[float, LabelDataset]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._edit_locks = [threading.Lock() for _ in range(EDIT_LOCK_STRIPES)]
+        os.makedirs(directory, exist_ok=True)
+
+    def create(self, items: Iterable[Dict[str, Any]], column_mapping: Dict[str, Optional[str]]) -> LabelDataset:
+        columns = {field: [] for field in FIELDS}
+        appenders = [(field, columns[field].append) for field in FIELDS]
+        for item in items:
+            for field, append in appenders:
+                append(item[field])
+
+        dataset = LabelDataset(uuid.uuid4().hex, columns, column_mapping)
+        self.save(dataset)
+        self.cleanup()
+        return dataset
+
+    def get(self, handle: str) -> Optional[LabelDataset]:
+        if not _HANDLE_PATTERN.match(handle or ''):
+            return None
+
+        path = self._path(handle)
+        try:
+            mtime = os.path.getmtime(path)
+        except OSError:
+            return None
+
+        # The file's mtime tells us whether another worker has saved edits since
+        with self._lock:
+            cached = self._cache.get(handle)
+            if cached is not None and cached[0] == mtime:
+                self._cache.move_to_end(handle)
+                return cached[1]
+
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            data = json.load(f)
+        dataset = LabelDataset(data['handle'], data['columns'], data['column_mapping'])
+        self._remember(dataset, mtime)
+        return dataset
+
+    def edit(self, handle: str, edits: Dict[str, Any]) -> Optional[LabelDataset]:
+        """Apply a client diff (see LabelDataset.apply_edits) and save the result.
+
+        Edits to one handle run one at a time, across processes where fcntl
+        is available. Returns the edited dataset, or None if there is no such
+        handle. A bad diff raises and leaves the stored dataset unchanged.
+        """
+        if not _HANDLE_PATTERN.match(handle or ''):
+            return None
+        with self._edit_lock(handle):
+            dataset = self.get(handle)
+            if dataset is None:
+                return None
+            edited = dataset.copy()
+            edited.apply_edits(edits)
+            self.save(edited)
+            return edited
+
+    def save(self, dataset: LabelDataset):
+        path = self._path(dataset.handle)
+        # A private temp file per writer, renamed into place, so readers never see half a file
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix=f"dataset_{dataset.handle}.", suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as raw, gzip.open(raw, 'wt', encoding='utf-8') as f:
+                json.dump(dataset.to_dict(), f, separators=(',', ':'))
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+        self._remember(dataset, os.path.getmtime(path))
+
+    def cleanup(self) -> int:
+        """Delete dataset files untouched for max_age; returns how many datasets went"""
+        cutoff = time.time() - self.max_age
+        removed = 0
+        for name in os.listdir(self.directory):
+            if not name.startswith('dataset_'):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                if os.path.getmtime(path) >= cutoff:
+                    continue
+                os.remove(path)
+            except OSError:
+                # Another worker removed it first
+                continue
+            if name.endswith('.json.gz'):
+                removed += 1
+                with self._lock:
+                    self._cache.pop(name[len('dataset_'):-len('.json.gz')], None)
+        return removed
+
+    @contextmanager
+    def _edit_lock(self, handle: str):
+        with self._edit_locks[int(handle, 16) % EDIT_LOCK_STRIPES]:
+            if fcntl is None:
+                yield
+                return
+            with open(os.path.join(self.directory, f"dataset_{handle}.lock"), 'a') as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _remember(self, dataset: LabelDataset, mtime: float):
+        with self._lock:
+            self._cache[dataset.handle] = (mtime, dataset)
+            self._cache.move_to_end(dataset.handle)
+            while len(self._cache) > self.max_cached:
+                self._cache.popitem(last=False)
+
+    def _path(self, handle: str) -> str:
+        return os.path.join(self.directory, f"dataset_{handle}.json.gz")
@@ -1,5 +1,11 @@
 from dataclasses import dataclass
-from typing import Tuple
+from functools import cached_property
+from typing import Dict, Tuple
+import warnings
+
+
+POINTS_PER_INCH = 72.0
+PAGE_SIZE = (8.5, 11.0)  # US Letter, in inches
 
 
 @dataclass
@@ -15,6 +21,61 @@ class LabelFormat:
     margin_bottom: float
     horizontal_spacing: float
     vertical_spacing: float
+    
+    def __post_init__(self):
+        if self.columns < 1 or self.rows < 1 or self.width <= 0 or self.height <= 0:
+            raise ValueError(f"Label format '{self.name}' needs at least one positive-size label")
+    
+    @property
+    def labels_per_page(self) -> int:
+        return self.columns * self.rows
+    
+    @cached_property
+    def width_pt(self) -> float:
+        return self.width * POINTS_PER_INCH
+    
+    @cached_property
+    def height_pt(self) -> float:
+        return self.height * POINTS_PER_INCH
+    
+    @cached_property
+    def slots(self) -> Tuple[Tuple[float, float], ...]:
+        """Bottom-left (x, y) of every label on a Letter page in points, row by row.
+        
+        Computed once per format; renderers zip a page of labels against it.
+        """
+        inch = POINTS_PER_INCH
+        page_height = PAGE_SIZE[1] * inch
+        return tuple(
+            (self.margin_left * inch + col * (self.width * inch + self.horizontal_spacing * inch),
+             page_height - self.margin_top * inch - (row + 1) * self.height * inch -
+             row * self.vertical_spacing * inch)
+            for row in range(self.rows)
+            for col in range(self.columns)
+        )
+    
+    def overflow(self) -> Tuple[float, float]:
+        """How far (inches) the grid runs past the right and bottom page edges."""
+        grid_width = self.columns * self.width + (self.columns - 1) * self.horizontal_spacing
+        grid_height = self.rows * self.height + (self.rows - 1) * self.vertical_spacing
+        return (round(self.margin_left + grid_width - PAGE_SIZE[0], 4),
+                round(self.margin_top + grid_height - PAGE_SIZE[1], 4))
+    
+    def fits_page(self) -> bool:
+        return all(excess <= 0 for excess in self.overflow())
+
+
+def validate_formats(formats: Dict[str, LabelFormat]):
+    """Warn about any format whose grid doesn't fit on a Letter page."""
+    for key, label_format in formats.items():
+        right, bottom = label_format.overflow()
+        edges = [f'{excess:g}" past the {edge} edge'
+                 for edge, excess in (('right', right), ('bottom', bottom)) if excess > 0]
+        if edges:
+            warnings.warn(
+                f"Label format '{key}' grid runs {' and '.join(edges)} of a Letter page",
+                stacklevel=2
+            )
 
 
 # Common label formats for 8.5x11 sheets
@@ -110,4 +171,7 @@ LABEL_FORMATS = {
         horizontal_spacing=0.125,
         vertical_spacing=0.0625
     )
-}
\ No newline at end of file
+}
+
+# Checked once at import so misconfigured sheets show up in the logs
+validate_formats(LABEL_FORMATS)
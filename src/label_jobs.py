@@ -0,0 +1,148 @@
+import dataclasses
+import json
+import os
+import re
+import tempfile
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Optional
+
+_JOB_ID_PATTERN = re.compile(r'^[0-9a-f]{12}$')
+
+
+@dataclass
+class LabelJob:
+    """State of one background label render"""
+    id: str
+    total_labels: int
+    status: str = 'queued'  # 'queued', 'running', 'done', 'failed'
+    rendered_labels: int = 0
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    output_path: Optional[str] = None
+    error: Optional[str] = None
+
+    def update_progress(self, rendered: int, total: int):
+        self.rendered_labels = rendered
+        self.total_labels = total
+
+    @property
+    def percent_complete(self) -> float:
+        if self.status == 'done':
+            return 100.0
+        if not self.total_labels:
+            return 0.0
+        return round(100.0 * self.rendered_labels / self.total_labels, 1)
+
+    @property
+    def eta_seconds(self) -> Optional[float]:
+        """Remaining time extrapolated from the render rate so far"""
+        if self.status == 'done':
+            return 0.0
+        if self.status != 'running' or not self.rendered_labels:
+            return None
+        elapsed = time.time() - self.started_at
+        remaining = self.total_labels - self.rendered_labels
+        return round(elapsed / self.rendered_labels * remaining, 1)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert to dictionary for JSON serialization"""
+        return {
+            'job_id': self.id,
+            'status': self.status,
+            'total_labels': self.total_labels,
+            'rendered_labels': self.rendered_labels,
+            'percent_complete': self.percent_complete,
+            'eta_seconds': self.eta_seconds,
+            'error': self.error
+        }
+
+
+class LabelJobQueue:
+    """Runs label renders off the request thread in a bounded worker pool.
+
+    Each job's state is written to ``directory`` as it changes (progress at
+    most every PROGRESS_INTERVAL seconds), so any web worker sharing the
+    directory can report on a job, not only the one that accepted it.
+    ``max_parallel`` caps jobs; the processes that render big jobs' shards
+    come from the one shared pool in pdf_generator_barcode, however many
+    jobs are running. Job files untouched for ``max_age`` seconds are deleted.
+    """
+
+    PROGRESS_INTERVAL = 0.5
+
+    def __init__(self, directory: str, max_parallel: int = 2, max_age: float = 24 * 3600):
+        self.directory = directory
+        self.max_age = max_age
+        self._executor = ThreadPoolExecutor(max_workers=max_parallel, thread_name_prefix='label-job')
+        os.makedirs(directory, exist_ok=True)
+
+    def submit(self, render: Callable[[Callable[[int, int], None]], str], total_labels: int) -> LabelJob:
+        """Queue ``render(progress)``, which must return the output PDF path."""
+        job = LabelJob(id=uuid.uuid4().hex[:12], total_labels=total_labels)
+        self._prune()
+        self._save(job)
+        self._executor.submit(self._run, job, render)
+        return job
+
+    def get(self, job_id: str) -> Optional[LabelJob]:
+        if not _JOB_ID_PATTERN.match(job_id or ''):
+            return None
+        try:
+            with open(self._path(job_id), encoding='utf-8') as f:
+                return LabelJob(**json.load(f))
+        except FileNotFoundError:
+            return None
+
+    def _run(self, job: LabelJob, render: Callable[[Callable[[int, int], None]], str]):
+        job.status = 'running'
+        job.started_at = time.time()
+        self._save(job)
+        saved_at = time.monotonic()
+
+        def progress(rendered: int, total: int):
+            nonlocal saved_at
+            job.update_progress(rendered, total)
+            if time.monotonic() - saved_at >= self.PROGRESS_INTERVAL:
+                self._save(job)
+                saved_at = time.monotonic()
+
+        try:
+            job.output_path = render(progress)
+            job.rendered_labels = job.total_labels
+            job.status = 'done'
+        except Exception as e:
+            job.error = str(e)
+            job.status = 'failed'
+        finally:
+            job.finished_at = time.time()
+            self._save(job)
+
+    def _save(self, job: LabelJob):
+        # Written aside and renamed into place so readers never see half a file
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(dataclasses.asdict(job), f)
+            os.replace(tmp_path, self._path(job.id))
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+
+    def _prune(self):
+        """Delete job files untouched for max_age; a live job rewrites its file as it runs"""
+        cutoff = time.time() - self.max_age
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+            except OSError:
+                # Another worker pruned it first
+                continue
+
+    def _path(self, job_id: str) -> str:
+        return os.path.join(self.directory, f"job_{job_id}.json")
@@ -0,0 +1,196 @@
+"""
+In-process majority-vote wick baseline
+Keeps per-(vessel, wax) wick counts over approved assemblies in memory and
+applies assembly changes incrementally instead of re-aggregating the table
+"""
+
+import logging
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from .supabase_tables import fetch_all
+
+logger = logging.getLogger(__name__)
+
+ASSEMBLY_COLUMNS = 'id, vessel_id, wax_type_id, wick_id_1, approved_date, updated_at'
+
+
+def _newest_stamp(rows: List[Dict], current: Optional[str] = None) -> Optional[str]:
+    stamps = [row['updated_at'] for row in rows if row.get('updated_at')]
+    return max([current or ''] + stamps) if stamps else current
+
+
+def _apply(assemblies: Dict[str, Tuple[str, str, Optional[str]]], counts: Dict[Tuple[str, str], Counter],
+           row: Dict) -> bool:
+    """Move one assembly's vote to its current (vessel, wax, wick); True if counts changed"""
+    new = (row['vessel_id'], row['wax_type_id'], row.get('wick_id_1')) \
+        if row.get('approved_date') else None
+    old = assemblies.pop(row['id'], None)
+    if new is not None:
+        assemblies[row['id']] = new
+    if old == new:
+        return False
+
+    if old is not None:
+        counter = counts[old[:2]]
+        counter[old[2]] -= 1
+        if counter[old[2]] <= 0:
+            del counter[old[2]]
+        if not counter:
+            del counts[old[:2]]
+    if new is not None:
+        counts.setdefault(new[:2], Counter())[new[2]] += 1
+    return True
+
+
+class MajorityBaseline:
+    """Most common approved wick for each vessel/wax pair, served from memory.
+
+    Mirrors the wick_majority_baseline materialized view: approved assemblies
+    only, at least ``MIN_SAMPLES`` per pair, ties going to the smallest wick id.
+    A background thread polls assemblies changed since the last poll (by
+    updated_at) every ``poll_interval`` seconds and re-reads the whole table
+    every ``resync_interval`` seconds to pick up deletions. The materialized
+    view itself is refreshed only when a poll actually changed the baseline.
+    """
+
+    MIN_SAMPLES = 3
+
+    def __init__(self, supabase, poll_interval: float = 60.0, resync_interval: float = 3600.0,
+                 refresh_view: bool = True):
+        self.supabase = supabase
+        self.poll_interval = poll_interval
+        self.resync_interval = resync_interval
+        self.refresh_view = refresh_view
+        self.synced_at: Optional[datetime] = None
+
+        self._lock = threading.RLock()
+        # Serializes syncs; readers only ever wait on _lock for in-memory swaps
+        self._sync_lock = threading.Lock()
+        self._assemblies: Dict[str, Tuple[str, str, Optional[str]]] = {}
+        self._counts: Dict[Tuple[str, str], Counter] = {}
+        self._names: Dict[str, Dict[str, str]] = {}
+        self._watermark: Optional[str] = None
+        self._resynced_at: Optional[float] = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='majority-baseline', daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _run(self):
+        while not self._stop.wait(self.poll_interval):
+            try:
+                full = self._resynced_at is None or \
+                    time.monotonic() - self._resynced_at >= self.resync_interval
+                if self.sync(full=full) and self.refresh_view:
+                    self.supabase.rpc('refresh_materialized_view', {
+                        'view_name': 'wick_majority_baseline'
+                    }).execute()
+            except Exception as e:
+                logger.error(f"Majority baseline sync failed: {e}")
+
+    def sync(self, full: bool = False) -> bool:
+        """Pull assembly changes into the counters; returns True if any counts changed.
+
+        Network reads run without holding the lock readers take, so lookups
+        keep answering from the previous state while a sync is in flight.
+        """
+        with self._sync_lock:
+            if full or self._resynced_at is None:
+                return self._resync()
+
+            with self._lock:
+                watermark = self._watermark
+            # gte, not gt: rows sharing the watermark timestamp are re-applied, which is harmless
+            rows = fetch_all(self.supabase, 'assemblies', ASSEMBLY_COLUMNS,
+                             where=(lambda q: q.gte('updated_at', watermark)) if watermark else None)
+            changed = False
+            with self._lock:
+                for row in rows:
+                    changed |= self.apply(row)
+                self._watermark = _newest_stamp(rows, self._watermark)
+            names = self._fetch_names() if changed else None
+            with self._lock:
+                if names is not None:
+                    self._names = names
+                self.synced_at = datetime.utcnow()
+            return changed
+
+    def _resync(self) -> bool:
+        # Built aside and swapped in, so a failed read leaves the current baseline serving
+        rows = fetch_all(self.supabase, 'assemblies', ASSEMBLY_COLUMNS)
+        assemblies: Dict[str, Tuple[str, str, Optional[str]]] = {}
+        counts: Dict[Tuple[str, str], Counter] = {}
+        for row in rows:
+            _apply(assemblies, counts, row)
+        names = self._fetch_names()
+
+        with self._lock:
+            changed = counts != self._counts
+            self._assemblies = assemblies
+            self._counts = counts
+            self._names = names
+            self._watermark = _newest_stamp(rows)
+            self._resynced_at = time.monotonic()
+            self.synced_at = datetime.utcnow()
+        return changed
+
+    def _fetch_names(self) -> Dict[str, Dict[str, str]]:
+        return {table: {row['id']: row['name'] for row in fetch_all(self.supabase, table, 'id, name')}
+                for table in ('vessels', 'wax_types', 'wicks')}
+
+    def apply(self, row: Dict) -> bool:
+        """Apply one assembly's current state; returns True if the counts changed"""
+        with self._lock:
+            return _apply(self._assemblies, self._counts, row)
+
+    def _ensure_loaded(self):
+        if self._resynced_at is None:
+            # Not full=True: if another thread finished the first load meanwhile, just poll
+            self.sync()
+
+    def _entry(self, key: Tuple[str, str], counter: Counter) -> Optional[Dict]:
+        sample_size = sum(counter.values())
+        wicks = {wick: count for wick, count in counter.items() if wick is not None}
+        if sample_size < self.MIN_SAMPLES or not wicks:
+            return None
+
+        top = max(wicks.values())
+        wick_id = min(wick for wick, count in wicks.items() if count == top)
+        return {
+            'vessel_id': key[0],
+            'wax_type_id': key[1],
+            'recommended_wick': wick_id,
+            'sample_size': sample_size,
+            'wick_variety': len(wicks),
+            'vessel_name': self._names.get('vessels', {}).get(key[0]),
+            'wax_name': self._names.get('wax_types', {}).get(key[1]),
+            'wick_name': self._names.get('wicks', {}).get(wick_id),
+        }
+
+    def recommendation(self, vessel_id: str, wax_type_id: str) -> Optional[Dict]:
+        """Baseline row for one vessel/wax pair, or None below MIN_SAMPLES"""
+        self._ensure_loaded()
+        with self._lock:
+            counter = self._counts.get((vessel_id, wax_type_id))
+            return self._entry((vessel_id, wax_type_id), counter) if counter else None
+
+    def all(self) -> List[Dict]:
+        """Every baseline row, most sampled first"""
+        self._ensure_loaded()
+        with self._lock:
+            entries = [self._entry(key, counter) for key, counter in self._counts.items()]
+        entries = [entry for entry in entries if entry]
+        entries.sort(key=lambda e: (-e['sample_size'], e['vessel_id'], e['wax_type_id']))
+        return entries
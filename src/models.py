@@ -1,9 +1,14 @@
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import inspect, text
+from sqlalchemy.exc import DBAPIError
 from datetime import datetime
 import json
 
 db = SQLAlchemy()
 
+# A trial counts as complete once all of these evaluations are saved
+EVALUATION_HOURS = ('1hr', '2hr', '4hr')
+
 
 class CandleTest(db.Model):
     """Main candle test record"""
@@ -17,21 +22,74 @@ class CandleTest(db.Model):
     created_by = db.Column(db.String(100), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
     
+    # Summary of the trials, maintained by src.evaluations on every save
+    completed_trials = db.Column(db.Integer, default=0, server_default='0', nullable=False)
+    total_trials = db.Column(db.Integer, default=0, server_default='0', nullable=False)
+    status = db.Column(db.String(20), default='completed', server_default='completed', nullable=False)  # 'active', 'completed'
+    last_evaluated_at = db.Column(db.DateTime, nullable=True)
+    
     # Relationships
     trials = db.relationship('CandleTrial', backref='test', lazy=True, cascade='all, delete-orphan')
     
-    def to_dict(self):
+    # The listing pages newest-first on (created_at, id), optionally filtered by one attribute
+    __table_args__ = (
+        db.Index('ix_candle_tests_created', 'created_at', 'id'),
+        db.Index('ix_candle_tests_vessel_created', 'vessel', 'created_at', 'id'),
+        db.Index('ix_candle_tests_wax_created', 'wax', 'created_at', 'id'),
+        db.Index('ix_candle_tests_fragrance_created', 'fragrance', 'created_at', 'id'),
+        db.Index('ix_candle_tests_created_by_created', 'created_by', 'created_at', 'id'),
+        db.Index('ix_candle_tests_status_created', 'status', 'created_at', 'id'),
+    )
+    
+    # Exact-match filters accepted by list_page()
+    LIST_FILTERS = ('vessel', 'wax', 'fragrance', 'created_by')
+    
+    def to_dict(self, include_trials=True):
         """Convert to dictionary for JSON serialization"""
-        return {
+        data = {
             'id': self.id,
             'vessel': self.vessel,
             'wax': self.wax,
             'fragrance': self.fragrance,
             'blend_percentage': self.blend_percentage,
             'created_by': self.created_by,
-            'created_at': self.created_at.isoformat(),
-            'trials': [trial.to_dict() for trial in self.trials]
+            'created_at': self.created_at.isoformat()
         }
+        if include_trials:
+            data['trials'] = [trial.to_dict() for trial in self.trials]
+        return data
+
+    @staticmethod
+    def list_page(filters=None, status=None, after=None, limit=50):
+        """One page of tests, newest first, using keyset pagination.
+
+        ``after`` is the ``(created_at, id)`` of the last test on the previous
+        page. ``status`` is 'completed' or 'active' with the same meaning as
+        the dashboard badge. Returns ``(tests, next_after)``; ``next_after`` is
+        None on the last page.
+        """
+        query = CandleTest.query
+        for name, value in (filters or {}).items():
+            if name in CandleTest.LIST_FILTERS and value:
+                query = query.filter(getattr(CandleTest, name) == value)
+
+        if status in ('completed', 'active'):
+            query = query.filter(CandleTest.status == status)
+
+        if after is not None:
+            created_at, test_id = after
+            query = query.filter(db.or_(
+                CandleTest.created_at < created_at,
+                db.and_(CandleTest.created_at == created_at, CandleTest.id < test_id)
+            ))
+
+        tests = query.order_by(CandleTest.created_at.desc(), CandleTest.id.desc()) \
+            .limit(limit + 1).all()
+
+        if len(tests) > limit:
+            tests = tests[:limit]
+            return tests, (tests[-1].created_at, tests[-1].id)
+        return tests, None
 
 
 class CandleTrial(db.Model):
@@ -39,10 +97,17 @@ class CandleTrial(db.Model):
     __tablename__ = 'candle_trials'
     
     id = db.Column(db.String(50), primary_key=True)
-    test_id = db.Column(db.String(50), db.ForeignKey('candle_tests.id'), nullable=False)
+    test_id = db.Column(db.String(50), db.ForeignKey('candle_tests.id'), nullable=False, index=True)
     trial_number = db.Column(db.Integer, nullable=False)
     wick = db.Column(db.String(200), nullable=False)
     
+    # Summary of the evaluations, maintained by src.evaluations on every save
+    completed_hours = db.Column(db.Integer, default=0, server_default='0', nullable=False)  # bit per EVALUATION_TYPES entry
+    last_evaluated_at = db.Column(db.DateTime, nullable=True)
+    best_melt_pool = db.Column(db.Float, nullable=True)  # deepest melt pool recorded, in inches
+    status = db.Column(db.String(20), default='pending', server_default='pending', nullable=False)  # 'pending', 'in_progress', 'complete'
+    evaluations_json = db.Column(db.Text, nullable=True)  # get_evaluations_dict() as saved
+    
     # Relationships
     evaluations = db.relationship('CandleEvaluation', backref='trial', lazy=True, cascade='all, delete-orphan')
     
@@ -54,25 +119,36 @@ class CandleTrial(db.Model):
             'wick': self.wick
         }
     
+    def evaluation_summary(self):
+        """Evaluations by hour from the stored summary, without loading the rows"""
+        if self.evaluations_json is None:
+            return self.get_evaluations_dict()
+        return json.loads(self.evaluations_json)
+    
     def get_evaluations_dict(self):
         """Get evaluations as a dictionary organized by hour"""
-        eval_dict = {}
-        for eval in self.evaluations:
-            if eval.evaluation_type == 'post_extinguish':
-                eval_dict['post_extinguish'] = {
-                    'after_glow': eval.after_glow,
-                    'after_smoke': eval.after_smoke,
-                    'timestamp': eval.created_at.isoformat()
-                }
-            else:
-                eval_dict[eval.evaluation_type] = {
-                    'full_melt_pool': eval.full_melt_pool,
-                    'melt_pool_depth': eval.melt_pool_depth,
-                    'external_temp': eval.external_temp,
-                    'flame_height': eval.flame_height,
-                    'timestamp': eval.created_at.isoformat()
-                }
-        return eval_dict
+        return evaluations_dict(self.evaluations)
+
+
+def evaluations_dict(evaluations):
+    """Organize CandleEvaluation rows into a dictionary keyed by hour"""
+    eval_dict = {}
+    for eval in evaluations:
+        if eval.evaluation_type == 'post_extinguish':
+            eval_dict['post_extinguish'] = {
+                'after_glow': eval.after_glow,
+                'after_smoke': eval.after_smoke,
+                'timestamp': eval.created_at.isoformat()
+            }
+        else:
+            eval_dict[eval.evaluation_type] = {
+                'full_melt_pool': eval.full_melt_pool,
+                'melt_pool_depth': eval.melt_pool_depth,
+                'external_temp': eval.external_temp,
+                'flame_height': eval.flame_height,
+                'timestamp': eval.created_at.isoformat()
+            }
+    return eval_dict
 
 
 class CandleEvaluation(db.Model):
@@ -99,6 +175,25 @@ class CandleEvaluation(db.Model):
     __table_args__ = (db.UniqueConstraint('trial_id', 'evaluation_type'),)
 
 
+class EvaluationOutbox(db.Model):
+    """Finished trial results waiting to be copied into Supabase test_results"""
+    __tablename__ = 'evaluation_outbox'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    idempotency_key = db.Column(db.String(100), nullable=False)  # test_results.idempotency_key
+    trial_id = db.Column(db.String(50), nullable=False)
+    payload = db.Column(db.Text, nullable=False)  # JSON test_results row
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    
+    # Delivery state, owned by src.outbox_shipper
+    attempts = db.Column(db.Integer, default=0, nullable=False)
+    next_attempt_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    shipped_at = db.Column(db.DateTime, nullable=True)
+    last_error = db.Column(db.Text, nullable=True)
+    
+    __table_args__ = (db.Index('ix_evaluation_outbox_pending', 'shipped_at', 'next_attempt_at'),)
+
+
 class Product(db.Model):
     """Cache for NetSuite product data"""
     __tablename__ = 'products'
@@ -114,4 +209,51 @@ class Product(db.Model):
         return {
             'id': self.product_id,
             'name': self.name
-        }
\ No newline at end of file
+        }
+
+
+def _already_exists(error: Exception) -> bool:
+    message = str(getattr(error, 'orig', error)).lower()
+    return 'duplicate column' in message or 'already exists' in message
+
+
+def upgrade_schema():
+    """Add columns and indexes introduced after a table was first created.
+
+    create_all() only creates missing tables, so existing databases are
+    brought up to date here. A column or index another process added first
+    counts as done. Returns the columns this call added as 'table.column'.
+    """
+    inspector = inspect(db.engine)
+    added = []
+    for table in db.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {column['name'] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            ddl = f"ALTER TABLE {table.name} ADD COLUMN {column.name} " \
+                  f"{column.type.compile(dialect=db.engine.dialect)}"
+            if column.server_default is not None:
+                ddl += f" DEFAULT '{column.server_default.arg}'"
+            if not column.nullable:
+                ddl += " NOT NULL"
+            try:
+                with db.engine.begin() as connection:
+                    connection.execute(text(ddl))
+            except DBAPIError as e:
+                if not _already_exists(e):
+                    raise
+                continue
+            added.append(f"{table.name}.{column.name}")
+
+    for table in db.metadata.tables.values():
+        for index in table.indexes:
+            try:
+                index.create(db.engine, checkfirst=True)
+            except DBAPIError as e:
+                if not _already_exists(e):
+                    raise
+
+    return added
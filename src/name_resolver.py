@@ -0,0 +1,172 @@
+"""
+Name-to-id resolver for the wick-onomics dimension tables
+Resolves user-typed vessel, wax, fragrance and wick names in memory with
+exact and normalized matching, and suggests close names (whole-word
+containment, trigram similarity) when neither matches
+"""
+
+import re
+import threading
+import time
+import unicodedata
+from collections import Counter
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+
+from .supabase_tables import fetch_all
+
+DIMENSION_TABLES = ('vessels', 'wax_types', 'fragrance_oils', 'wicks')
+
+# Below this trigram similarity a fuzzy candidate is not suggested
+DEFAULT_MIN_SIMILARITY = 0.3
+
+# Match methods that resolve a name; the others are only suggestions
+RESOLVED_METHODS = ('exact', 'normalized')
+
+
+@dataclass
+class NameMatch:
+    """A resolved name with how it was matched"""
+    id: str
+    name: str
+    score: float
+    method: str  # 'exact', 'normalized', 'contains' or 'fuzzy'
+
+
+def normalize_name(name: str) -> str:
+    """Lowercase, strip accents and punctuation, split letters from numbers ('8oz' -> '8 oz')"""
+    text = unicodedata.normalize('NFKD', name or '').encode('ascii', 'ignore').decode().lower()
+    return ' '.join(re.findall(r'[a-z]+|\d+(?:\.\d+)?', text))
+
+
+def numbers(tokens: Sequence[str]) -> Tuple[str, ...]:
+    """The numeric tokens of a normalized name, sorted ('8 oz tumbler' -> ('8',))"""
+    return tuple(sorted(token for token in tokens if token[0].isdigit()))
+
+
+def contains_words(tokens: Sequence[str], query: Sequence[str]) -> bool:
+    """True if ``query`` appears in ``tokens`` as a run of whole words"""
+    n = len(query)
+    return any(tuple(tokens[i:i + n]) == tuple(query) for i in range(len(tokens) - n + 1))
+
+
+def trigrams(normalized: str) -> Set[str]:
+    """pg_trgm-style trigrams: each word padded with two spaces in front and one behind"""
+    grams = set()
+    for word in normalized.split():
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+class _TableIndex:
+    def __init__(self, rows: List[Dict]):
+        self.rows = [(row['id'], row['name']) for row in rows if row.get('name')]
+        self.keys: List[str] = []
+        self.tokens: List[Tuple[str, ...]] = []
+        self.numbers: List[Tuple[str, ...]] = []
+        self.exact: Dict[str, int] = {}
+        self.normalized: Dict[str, int] = {}
+        self.grams: List[Set[str]] = []
+        self.postings: Dict[str, List[int]] = {}
+        for i, (_, name) in enumerate(self.rows):
+            key = normalize_name(name)
+            self.keys.append(key)
+            self.tokens.append(tuple(key.split()))
+            self.numbers.append(numbers(self.tokens[-1]))
+            self.exact.setdefault(name, i)
+            self.normalized.setdefault(key, i)
+            grams = trigrams(key)
+            self.grams.append(grams)
+            for gram in grams:
+                self.postings.setdefault(gram, []).append(i)
+
+
+class NameResolver:
+    """Resolves names to ids for the dimension tables without touching the database.
+
+    A name resolves to an exact or normalized match (case, accents,
+    punctuation and '8oz'/'8 oz' spacing ignored), or, when the caller
+    allows it, to the single name containing the query as whole words.
+    Anything looser is a suggestion, never an automatic pick: names
+    containing the query as whole words, then trigram-similar names from an
+    inverted index. Suggestions
+    must carry exactly the query's numbers, so '6 oz tumbler' never suggests
+    '16oz Tumbler' and 'CD 14' never suggests 'CD 10'. Tables are re-read
+    every ``ttl`` seconds.
+    """
+
+    def __init__(self, supabase, tables=DIMENSION_TABLES, ttl: float = 300.0,
+                 min_similarity: float = DEFAULT_MIN_SIMILARITY):
+        self.supabase = supabase
+        self.tables = tables
+        self.ttl = ttl
+        self.min_similarity = min_similarity
+        self._lock = threading.Lock()
+        self._indexes: Dict[str, _TableIndex] = {}
+        self._loaded_at: Optional[float] = None
+
+    def refresh(self, force: bool = False):
+        with self._lock:
+            now = time.monotonic()
+            if not force and self._loaded_at is not None and now - self._loaded_at <= self.ttl:
+                return
+            self._indexes = {table: _TableIndex(fetch_all(self.supabase, table, 'id, name'))
+                             for table in self.tables}
+            self._loaded_at = now
+
+    def matches(self, table: str, name: str, limit: int = 5) -> List[NameMatch]:
+        """The exact/normalized match for ``name`` in ``table``, or suggestions best first"""
+        if not name or not name.strip():
+            return []
+        self.refresh()
+        index = self._indexes[table]
+
+        i = index.exact.get(name.strip())
+        if i is not None:
+            return [NameMatch(*index.rows[i], score=1.0, method='exact')]
+
+        key = normalize_name(name)
+        i = index.normalized.get(key)
+        if i is not None:
+            return [NameMatch(*index.rows[i], score=1.0, method='normalized')]
+
+        query = trigrams(key)
+        if not query:
+            return []
+        query_tokens = key.split()
+        query_numbers = numbers(query_tokens)
+        shared = Counter(j for gram in query for j in index.postings.get(gram, ()))
+
+        scored = []
+        for j, common in shared.items():
+            # A different size or wick number is a different item, however similar the text
+            if query_numbers and index.numbers[j] != query_numbers:
+                continue
+            similarity = common / (len(query) + len(index.grams[j]) - common)
+            contains = contains_words(index.tokens[j], query_tokens)
+            if contains or similarity >= self.min_similarity:
+                # Names containing the query outrank looser fuzzy matches
+                scored.append((contains, similarity, j))
+
+        scored.sort(key=lambda s: (s[0], s[1]), reverse=True)
+        return [NameMatch(*index.rows[j], score=round(similarity, 3),
+                          method='contains' if contains else 'fuzzy')
+                for contains, similarity, j in scored[:limit]]
+
+    def resolve(self, table: str, name: str, allow_contains: bool = False) -> Optional[NameMatch]:
+        """The exact or normalized match for ``name`` in ``table``, or None.
+
+        With ``allow_contains`` the one name containing ``name`` as whole
+        words also resolves ('Amber Jar' -> 'Amber Jar 12 oz'), as long as
+        no other name does.
+        """
+        found = self.matches(table, name, limit=2)
+        if found and found[0].method in RESOLVED_METHODS:
+            return found[0]
+        contained = [match for match in found if match.method == 'contains']
+        return contained[0] if allow_contains and len(contained) == 1 else None
+
+    def resolve_id(self, table: str, name: str, allow_contains: bool = False) -> Optional[str]:
+        match = self.resolve(table, name, allow_contains)
+        return match.id if match else None
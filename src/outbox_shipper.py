@@ -0,0 +1,223 @@
+import json
+import logging
+import random
+import re
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from .db_tuning import retry_on_lock
+from .models import db, EvaluationOutbox
+from .name_resolver import NameResolver
+from .supabase_tables import fetch_all
+
+logger = logging.getLogger(__name__)
+
+# Lab wick names carry the catalog code, e.g. 'Wick.CD6 - Cotton Core 6' -> CD 6
+WICK_CODE = re.compile(r'^\s*(?:wick\s*\.\s*)?([a-z]+)[\s-]*(\d+)\b', re.IGNORECASE)
+
+
+class UnresolvedComponents(LookupError):
+    """A lab result whose components don't map to exactly one Supabase row each"""
+
+
+class OutboxShipper:
+    """Copies queued lab results from evaluation_outbox into Supabase test_results.
+
+    Runs on a daemon thread and upserts each batch in one request, keyed on
+    test_results.idempotency_key. A row that is shipped twice, for example
+    by two gunicorn workers or after a timeout that actually succeeded, just
+    overwrites itself. Failed batches are retried with exponential backoff.
+
+    Before shipping, the lab's vessel, wax, fragrance and wick names are
+    resolved to Supabase ids, and the vessel/wax/fragrance ids to their
+    assembly. A result that doesn't resolve to exactly one of each stays in
+    the outbox with last_error saying why, and is retried on the same
+    backoff, so it ships once the catalog catches up.
+    """
+
+    CATALOG_TTL = 300
+
+    def __init__(self, app, supabase, resolver: Optional[NameResolver] = None, batch_size: int = 100,
+                 interval: float = 10.0, base_backoff: float = 5.0, max_backoff: float = 600.0):
+        self.app = app
+        self.supabase = supabase
+        self.resolver = resolver or NameResolver(supabase)
+        self.batch_size = batch_size
+        self.interval = interval
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self._wick_codes: Dict[Tuple[str, int], List[str]] = {}
+        self._wick_codes_loaded_at: Optional[float] = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='outbox-shipper', daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                # Keep draining while full batches are coming back
+                while self.ship_once() == self.batch_size:
+                    pass
+            except Exception as e:
+                logger.error(f"Outbox shipping failed: {e}")
+
+    def ship_once(self) -> int:
+        """Ship one batch of due rows; returns how many outbox rows it covered."""
+        with self.app.app_context():
+            now = datetime.utcnow()
+            rows = EvaluationOutbox.query \
+                .filter(EvaluationOutbox.shipped_at.is_(None), EvaluationOutbox.next_attempt_at <= now) \
+                .order_by(EvaluationOutbox.id) \
+                .limit(self.batch_size) \
+                .all()
+            if not rows:
+                return 0
+
+            # Several saves of one trial collapse into its newest payload
+            latest = {}
+            by_key = defaultdict(list)
+            for row in rows:
+                latest[row.idempotency_key] = json.loads(row.payload)
+                by_key[row.idempotency_key].append(row)
+
+            try:
+                records, unresolved = self._resolve(latest)
+            except Exception as e:
+                self._mark_failed([(row, str(e)) for row in rows])
+                logger.warning(f"Could not resolve outbox batch of {len(rows)}, will retry: {e}")
+                return len(rows)
+
+            if unresolved:
+                self._mark_failed([(row, error) for key, error in unresolved.items() for row in by_key[key]])
+                logger.warning(f"{len(unresolved)} outbox results don't match the Supabase catalog yet")
+            if not records:
+                return len(rows)
+
+            resolved = [row for key in records for row in by_key[key]]
+            try:
+                self._ship(list(records.values()))
+            except Exception as e:
+                self._mark_failed([(row, str(e)) for row in resolved])
+                logger.warning(f"Outbox batch of {len(resolved)} failed, will retry: {e}")
+                return len(rows)
+
+            self._mark_shipped(resolved)
+            return len(rows)
+
+    def _resolve(self, payloads: Dict[str, Dict]) -> Tuple[Dict[str, Dict], Dict[str, str]]:
+        """test_results records for the payloads that resolve, and errors for the rest, by key"""
+        components = {}
+        unresolved = {}
+        for key, payload in payloads.items():
+            try:
+                components[key] = self._component_ids(payload)
+            except UnresolvedComponents as e:
+                unresolved[key] = str(e)
+
+        assemblies = self._assemblies({ids[:3] for ids in components.values()})
+        records = {}
+        for key, (vessel_id, wax_id, fragrance_id, wick_id) in components.items():
+            names = payloads[key]['components']
+            candidates = assemblies.get((vessel_id, wax_id, fragrance_id), [])
+            if len(candidates) > 1:
+                candidates = [a for a in candidates
+                              if a['fragrance_load_percentage'] == names.get('fragrance_load')]
+            if len(candidates) != 1:
+                unresolved[key] = (f"{'No' if not candidates else 'More than one'} assembly for "
+                                   f"{names['vessel']} / {names['wax']} / {names['fragrance']} "
+                                   f"@ {names.get('fragrance_load')}%")
+                continue
+
+            record = {k: v for k, v in payloads[key].items() if k not in ('components', 'wick_name')}
+            record.update(assembly_id=candidates[0]['id'], wax_type_id_tested=wax_id, wick_id_tested=wick_id)
+            records[key] = record
+        return records, unresolved
+
+    def _component_ids(self, payload: Dict) -> Tuple[str, str, str, str]:
+        names = payload.get('components')
+        if not names:
+            raise UnresolvedComponents('Queued before component names were recorded; save the trial again')
+
+        ids = []
+        for table, field in (('vessels', 'vessel'), ('wax_types', 'wax'), ('fragrance_oils', 'fragrance')):
+            match = self.resolver.resolve(table, names[field])
+            if match is None:
+                raise UnresolvedComponents(f"No {table} row named {names[field]!r}")
+            ids.append(match.id)
+        ids.append(self._wick_id(names['wick']))
+        return tuple(ids)
+
+    def _wick_id(self, name: str) -> str:
+        match = self.resolver.resolve('wicks', name)
+        if match is not None:
+            return match.id
+
+        code = WICK_CODE.match(name or '')
+        if code is None:
+            raise UnresolvedComponents(f"No wicks row named {name!r}")
+        series, size = code.group(1).upper(), int(code.group(2))
+        wick_ids = self._load_wick_codes().get((series, size), [])
+        if len(wick_ids) != 1:
+            raise UnresolvedComponents(f"{'No' if not wick_ids else 'More than one'} {series} "
+                                       f"size {size} wick for {name!r}")
+        return wick_ids[0]
+
+    def _load_wick_codes(self) -> Dict[Tuple[str, int], List[str]]:
+        now = time.monotonic()
+        if self._wick_codes_loaded_at is None or now - self._wick_codes_loaded_at > self.CATALOG_TTL:
+            codes = defaultdict(list)
+            for wick in fetch_all(self.supabase, 'wicks', 'id, series, size_number'):
+                codes[(wick['series'].upper(), wick['size_number'])].append(wick['id'])
+            self._wick_codes = dict(codes)
+            self._wick_codes_loaded_at = now
+        return self._wick_codes
+
+    def _assemblies(self, triples) -> Dict[Tuple[str, str, str], List[Dict]]:
+        """Assemblies for (vessel_id, wax_type_id, fragrance_oil_id) triples, from one query"""
+        if not triples:
+            return {}
+        vessel_ids, wax_ids, fragrance_ids = (sorted({triple[i] for triple in triples}) for i in range(3))
+        rows = fetch_all(self.supabase, 'assemblies',
+                         'id, vessel_id, wax_type_id, fragrance_oil_id, fragrance_load_percentage',
+                         where=lambda q: q.in_('vessel_id', vessel_ids)
+                                          .in_('wax_type_id', wax_ids)
+                                          .in_('fragrance_oil_id', fragrance_ids))
+        found = defaultdict(list)
+        for row in rows:
+            found[(row['vessel_id'], row['wax_type_id'], row['fragrance_oil_id'])].append(row)
+        return found
+
+    def _ship(self, records: List[Dict]):
+        self.supabase.table('test_results') \
+            .upsert(records, on_conflict='idempotency_key') \
+            .execute()
+
+    @retry_on_lock(db.session)
+    def _mark_shipped(self, rows: List[EvaluationOutbox]):
+        shipped_at = datetime.utcnow()
+        for row in rows:
+            row.shipped_at = shipped_at
+            row.last_error = None
+        db.session.commit()
+
+    @retry_on_lock(db.session)
+    def _mark_failed(self, failures: List[Tuple[EvaluationOutbox, str]]):
+        now = datetime.utcnow()
+        for row, error in failures:
+            row.attempts += 1
+            delay = min(self.max_backoff, self.base_backoff * (2 ** (row.attempts - 1)))
+            row.next_attempt_at = now + timedelta(seconds=delay * random.uniform(0.8, 1.2))
+            row.last_error = error[:1000]
+        db.session.commit()
@@ -5,7 +5,8 @@ from reportlab.lib import colors
 from reportlab.platypus import Paragraph
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.enums import TA_CENTER
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterable
+from itertools import islice
 import os
 from .label_formats import LabelFormat
 
@@ -16,40 +17,25 @@ class PDFGenerator:
         if not os.path.exists(output_dir):
             os.makedirs(output_dir)
     
-    def generate_labels(self, data: List[Dict[str, Any]], label_format: LabelFormat, 
+    def generate_labels(self, data: Iterable[Dict[str, Any]], label_format: LabelFormat, 
                        output_filename: str, fields_config: Dict[str, str]) -> str:
+        """Render labels from any iterable of rows; rows are consumed as they are drawn."""
         output_path = os.path.join(self.output_dir, output_filename)
         c = canvas.Canvas(output_path, pagesize=letter)
         
-        # Page dimensions
-        page_width, page_height = letter
+        slots = label_format.slots
+        rows = iter(data)
+        page = list(islice(rows, len(slots)))
         
-        # Calculate label positions
-        label_index = 0
-        total_labels = len(data)
-        
-        while label_index < total_labels:
-            # Draw labels for current page
-            for row in range(label_format.rows):
-                for col in range(label_format.columns):
-                    if label_index >= total_labels:
-                        break
-                    
-                    # Calculate position
-                    x = label_format.margin_left * inch + \
-                        col * (label_format.width * inch + label_format.horizontal_spacing * inch)
-                    y = page_height - label_format.margin_top * inch - \
-                        (row + 1) * label_format.height * inch - \
-                        row * label_format.vertical_spacing * inch
-                    
-                    # Draw label
-                    self._draw_label(c, x, y, label_format.width * inch, 
-                                   label_format.height * inch, data[label_index], fields_config)
-                    
-                    label_index += 1
+        while page:
+            # Draw labels for current page at the format's precomputed slots
+            for (x, y), item in zip(slots, page):
+                self._draw_label(c, x, y, label_format.width_pt, 
+                               label_format.height_pt, item, fields_config)
             
             # Start new page if more labels remain
-            if label_index < total_labels:
+            page = list(islice(rows, len(slots)))
+            if page:
                 c.showPage()
         
         c.save()
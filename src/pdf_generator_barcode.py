@@ -5,64 +5,213 @@ from reportlab.lib import colors
 from reportlab.graphics.barcode import code128
 from reportlab.graphics import renderPDF
 from reportlab.graphics.shapes import Drawing
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Callable
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+import multiprocessing
 import os
 import io
+import shutil
+import tempfile
+import threading
 from .label_formats import LabelFormat
+from .label_cache import LabelCache
+
+
+# Optional: pypdf lets large jobs render in parallel shards that are stitched
+# together afterwards. Without it every job renders on a single canvas.
+try:
+    from pypdf import PdfWriter
+except ImportError:
+    PdfWriter = None
+
+# Jobs with at least this many labels are split into shards and rendered in a process pool
+LARGE_JOB_THRESHOLD = 2000
+
+# One shard pool per process, shared by every render. Its workers are spawned
+# rather than forked: the web process runs background threads (outbox shipper,
+# baseline poller, write-behind logger) whose locks a fork could copy mid-use.
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def render_workers() -> int:
+    """Size of the shard pool: LABEL_RENDER_WORKERS, default one less than cpu_count
+
+    Every render in the process shares the pool, so this bounds the shard
+    processes however many label jobs run at once, and leaves a core for
+    the web workers.
+    """
+    return int(os.environ.get('LABEL_RENDER_WORKERS', max(1, (os.cpu_count() or 1) - 1)))
+
+
+def render_pool() -> ProcessPoolExecutor:
+    """The shared shard pool, started on first use"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=render_workers(),
+                                        mp_context=multiprocessing.get_context('spawn'))
+        return _pool
+
+
+def shutdown_render_pool(pool: Optional[ProcessPoolExecutor] = None):
+    """Stop the shard pool (or only ``pool``, if it is still the current one); the next render starts a new one"""
+    global _pool
+    with _pool_lock:
+        if _pool is None or (pool is not None and pool is not _pool):
+            return
+        stopping, _pool = _pool, None
+    stopping.shutdown(wait=True)
+
+
+def _render_shard(args) -> str:
+    """Process-pool entry point: render one page-aligned shard to its own PDF."""
+    labels, label_format, shard_path = args
+    generator = PDFGeneratorBarcode(os.path.dirname(shard_path))
+    generator._render(labels, label_format, shard_path)
+    return shard_path
 
 
 class PDFGeneratorBarcode:
-    def __init__(self, output_dir: str = "output"):
+    # Bump whenever the rendered output changes so cached PDFs are invalidated
+    VERSION = 'barcode-1'
+
+    def __init__(self, output_dir: str = "output", cache: Optional[LabelCache] = None,
+                 workers: Optional[int] = None):
         self.output_dir = output_dir
+        self.cache = cache
+        # How many ways to split a large job; the shared pool bounds how many run at once
+        self.workers = workers or render_workers()
         if not os.path.exists(output_dir):
             os.makedirs(output_dir)
     
     def generate_labels(self, data: List[Dict[str, Any]], label_format: LabelFormat, 
-                       output_filename: str) -> str:
-        """Generate labels with barcode, SKU text, price, and case quantity. Repeat based on quantity."""
+                       output_filename: str,
+                       progress: Optional[Callable[[int, int], None]] = None) -> str:
+        """Generate labels with barcode, SKU text, price, and case quantity. Repeat based on quantity.
+        
+        ``progress`` is called as ``progress(labels_rendered, total_labels)`` as pages complete.
+        """
+        cache_key = None
+        if self.cache:
+            cache_key = self.cache.make_key(self.VERSION, self._cache_items(data), label_format)
+            cached_path = self.cache.get(cache_key)
+            if cached_path:
+                if progress:
+                    total_labels = sum(int(item.get('quantity', 1)) for item in data)
+                    progress(total_labels, total_labels)
+                return cached_path
+        
         output_path = os.path.join(self.output_dir, output_filename)
-        c = canvas.Canvas(output_path, pagesize=letter)
+        expanded_data = self._expand_data(data)
         
-        # Page dimensions
-        page_width, page_height = letter
+        if self._use_sharding(len(expanded_data)):
+            self._render_sharded(expanded_data, label_format, output_path, progress)
+        else:
+            self._render(expanded_data, label_format, output_path, progress)
         
-        # Expand data based on quantity
+        if self.cache:
+            return self.cache.put(cache_key, output_path)
+        return output_path
+    
+    def _expand_data(self, data: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Repeat each item once per label based on its quantity."""
         expanded_data = []
         for item in data:
             quantity = int(item.get('quantity', 1))
-            for _ in range(quantity):
-                expanded_data.append(item)
-        
-        # Generate labels
-        label_index = 0
-        total_labels = len(expanded_data)
-        
-        while label_index < total_labels:
-            # Draw labels for current page
-            for row in range(label_format.rows):
-                for col in range(label_format.columns):
-                    if label_index >= total_labels:
-                        break
-                    
-                    # Calculate position
-                    x = label_format.margin_left * inch + \
-                        col * (label_format.width * inch + label_format.horizontal_spacing * inch)
-                    y = page_height - label_format.margin_top * inch - \
-                        (row + 1) * label_format.height * inch - \
-                        row * label_format.vertical_spacing * inch
-                    
-                    # Draw label
-                    self._draw_barcode_label(c, x, y, label_format.width * inch, 
-                                           label_format.height * inch, expanded_data[label_index])
-                    
-                    label_index += 1
-            
+            expanded_data.extend([item] * quantity)
+        return expanded_data
+    
+    def _use_sharding(self, total_labels: int) -> bool:
+        return PdfWriter is not None and self.workers > 1 and total_labels >= LARGE_JOB_THRESHOLD
+    
+    def _render(self, labels: List[Dict[str, Any]], label_format: LabelFormat, output_path: str,
+                progress: Optional[Callable[[int, int], None]] = None):
+        """Render already-expanded labels onto consecutive sheets of a single canvas."""
+        c = canvas.Canvas(output_path, pagesize=letter)
+        
+        slots = label_format.slots
+        labels_per_page = len(slots)
+        total_labels = len(labels)
+        
+        for page_start in range(0, total_labels, labels_per_page):
             # Start new page if more labels remain
-            if label_index < total_labels:
+            if page_start:
                 c.showPage()
+            
+            # Draw labels for current page at the format's precomputed slots
+            page_labels = labels[page_start:page_start + labels_per_page]
+            for (x, y), label in zip(slots, page_labels):
+                self._draw_barcode_label(c, x, y, label_format.width_pt, 
+                                       label_format.height_pt, label)
+            
+            if progress:
+                progress(page_start + len(page_labels), total_labels)
         
         c.save()
-        return output_path
+    
+    def _render_sharded(self, labels: List[Dict[str, Any]], label_format: LabelFormat, output_path: str,
+                        progress: Optional[Callable[[int, int], None]] = None):
+        """Render a large job as whole-page shards in parallel, then concatenate the pages.
+        
+        Shards always hold a multiple of one sheet's labels, so every shard starts
+        at the first slot of a fresh page and the sheet layout is unchanged.
+        """
+        labels_per_page = label_format.labels_per_page
+        total_pages = -(-len(labels) // labels_per_page)
+        # Two shards per worker keeps the pool busy when shards finish unevenly
+        pages_per_shard = max(1, -(-total_pages // (self.workers * 2)))
+        shard_size = pages_per_shard * labels_per_page
+        
+        shard_dir = tempfile.mkdtemp(prefix='shards_', dir=self.output_dir)
+        try:
+            jobs = [
+                (labels[start:start + shard_size], label_format,
+                 os.path.join(shard_dir, f"shard_{index:05d}.pdf"))
+                for index, start in enumerate(range(0, len(labels), shard_size))
+            ]
+            rendered = 0
+            pool = render_pool()
+            futures = {pool.submit(_render_shard, job): len(job[0]) for job in jobs}
+            try:
+                for future in as_completed(futures):
+                    future.result()
+                    rendered += futures[future]
+                    if progress:
+                        progress(rendered, len(labels))
+            except BrokenProcessPool:
+                # A worker died; later renders get a fresh pool
+                shutdown_render_pool(pool)
+                raise
+            finally:
+                for future in futures:
+                    future.cancel()
+            shard_paths = [job[2] for job in jobs]
+            
+            # Copy the finished page streams across without re-rendering
+            writer = PdfWriter()
+            for shard_path in shard_paths:
+                writer.append(shard_path)
+            with open(output_path, 'wb') as output_file:
+                writer.write(output_file)
+        finally:
+            shutil.rmtree(shard_dir, ignore_errors=True)
+    
+    def _cache_items(self, data: List[Dict[str, Any]]) -> List[List[Any]]:
+        """Reduce items to exactly what ends up on the label, for cache keys."""
+        return [
+            [str(item.get('sku', '')).upper(),
+             self._format_price(item.get('price', 0)),
+             str(item.get('case_qty', 1)),
+             int(item.get('quantity', 1))]
+            for item in data
+        ]
+    
+    def _format_price(self, price: Any) -> str:
+        if isinstance(price, (int, float)):
+            return f"${price:.2f}"
+        return str(price).upper()
     
     def _get_optimal_font_size(self, canvas_obj, text, max_width, max_height, font_name="Helvetica-Bold"):
         """Calculate the optimal font size to fit text within given dimensions."""
@@ -86,10 +235,7 @@ class PDFGeneratorBarcode:
         case_qty = item_data.get('case_qty', 1)
         
         # Format price
-        if isinstance(price, (int, float)):
-            price_text = f"${price:.2f}"
-        else:
-            price_text = str(price).upper()
+        price_text = self._format_price(price)
         
         # Format case quantity
         case_text = f"Case: {case_qty}"
@@ -5,22 +5,35 @@ from reportlab.lib import colors
 from reportlab.graphics import renderPDF
 from reportlab.graphics.shapes import Drawing
 from reportlab.platypus import Image
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 import os
 import io
 import qrcode
 from .label_formats import LabelFormat
+from .label_cache import LabelCache
 
 
 class PDFGeneratorCandle:
-    def __init__(self, output_dir: str = "output"):
+    # Bump whenever the rendered output changes so cached PDFs are invalidated
+    VERSION = 'candle-1'
+
+    def __init__(self, output_dir: str = "output", cache: Optional[LabelCache] = None):
         self.output_dir = output_dir
+        self.cache = cache
         if not os.path.exists(output_dir):
             os.makedirs(output_dir)
     
     def generate_test_labels(self, test_data: Dict[str, Any], trials: List[Dict[str, Any]], 
                             label_format: LabelFormat, output_filename: str, base_url: str) -> str:
         """Generate candle test labels with QR codes - one label per page for thermal printer."""
+        cache_key = None
+        if self.cache:
+            cache_key = self.cache.make_key(self.VERSION, self._cache_items(test_data, trials),
+                                            label_format, base_url)
+            cached_path = self.cache.get(cache_key)
+            if cached_path:
+                return cached_path
+        
         output_path = os.path.join(self.output_dir, output_filename)
         
         # For thermal printer: use custom page size matching label size
@@ -42,8 +55,19 @@ class PDFGeneratorCandle:
                 c.showPage()
         
         c.save()
+        
+        if self.cache:
+            return self.cache.put(cache_key, output_path)
         return output_path
     
+    def _cache_items(self, test_data: Dict[str, Any], trials: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Reduce the test and trials to the fields printed on the label, for cache keys."""
+        return {
+            'test': {key: test_data.get(key) for key in
+                     ('id', 'vessel', 'wax', 'fragrance', 'blend_percentage')},
+            'trials': [[trial['id'], trial['trial_number'], trial['wick']] for trial in trials]
+        }
+    
     def _generate_qr_code(self, url: str) -> io.BytesIO:
         """Generate QR code image."""
         qr = qrcode.QRCode(
@@ -0,0 +1,21 @@
+from typing import Callable, Dict, List, Optional
+
+
+def fetch_all(supabase, table: str, columns: str, where: Optional[Callable] = None,
+              order: str = 'id', page_size: int = 1000) -> List[Dict]:
+    """Read every matching row of a table, paging past PostgREST's row limit.
+
+    ``where`` receives the select builder and returns it with filters added.
+    Pages are ordered by ``order`` so they don't overlap or skip rows.
+    """
+    rows = []
+    while True:
+        query = supabase.table(table).select(columns)
+        if where is not None:
+            query = where(query)
+        page = query.order(order) \
+            .range(len(rows), len(rows) + page_size - 1) \
+            .execute().data or []
+        rows.extend(page)
+        if len(page) < page_size:
+            return rows
@@ -0,0 +1,120 @@
+"""
+In-memory wax conversion matrix
+Holds every learned wax_conversion_deltas row and the wick catalog so wax
+conversion recommendations need no database round-trips
+"""
+
+import bisect
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from .supabase_tables import fetch_all
+
+
+class WaxConversionMatrix:
+    """Wick size deltas keyed by (vessel_id, old_wax_type_id, new_wax_type_id).
+
+    The tables are re-read only when they change. At most every
+    ``check_interval`` seconds a lookup first reads the row count and newest
+    updated_at of wax_conversion_deltas and wicks; inserts and deletes move
+    the count, and touch_updated_at triggers on both tables move updated_at
+    on every edit. The wick catalog is indexed by series and size_index so
+    the closest replacement wick is a bisect.
+    """
+
+    def __init__(self, supabase, check_interval: float = 30.0):
+        self.supabase = supabase
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._version = None
+        self._checked_at: Optional[float] = None
+        self._deltas: Dict[Tuple[str, str, str], Dict] = {}
+        self._wicks: Dict[str, Dict] = {}
+        self._series: Dict[str, Tuple[List[int], List[Dict]]] = {}
+
+    def _table_version(self, table: str) -> Tuple:
+        newest = self.supabase.table(table) \
+            .select('updated_at', count='exact') \
+            .order('updated_at', desc=True) \
+            .limit(1) \
+            .execute()
+        return newest.count, newest.data[0]['updated_at'] if newest.data else None
+
+    def refresh(self, force: bool = False):
+        """Reload the matrix if the underlying tables changed since the last check"""
+        with self._lock:
+            now = time.monotonic()
+            if not force and self._checked_at is not None and now - self._checked_at < self.check_interval:
+                return
+            version = (self._table_version('wax_conversion_deltas'), self._table_version('wicks'))
+            self._checked_at = now
+            if not force and version == self._version:
+                return
+
+            deltas = fetch_all(self.supabase, 'wax_conversion_deltas',
+                               'vessel_id, old_wax_type_id, new_wax_type_id, wick_size_delta, '
+                               'confidence_score, sample_count')
+            wicks = fetch_all(self.supabase, 'wicks', 'id, name, series, size_index')
+
+            self._deltas = {
+                (row['vessel_id'], row['old_wax_type_id'], row['new_wax_type_id']): row
+                for row in deltas
+            }
+            self._wicks = {wick['id']: wick for wick in wicks}
+            series = {}
+            for wick in sorted(wicks, key=lambda w: w['size_index']):
+                sizes, members = series.setdefault(wick['series'], ([], []))
+                sizes.append(wick['size_index'])
+                members.append(wick)
+            self._series = series
+            self._version = version
+
+    def delta(self, vessel_id: str, old_wax_id: str, new_wax_id: str) -> Optional[Dict]:
+        """The learned deltas row for a conversion, or None"""
+        self.refresh()
+        return self._deltas.get((vessel_id, old_wax_id, new_wax_id))
+
+    def closest_wick(self, series: str, size_index: int) -> Optional[Dict]:
+        """Wick in ``series`` nearest ``size_index``; ties go to the smaller wick"""
+        sizes, members = self._series.get(series, ([], []))
+        if not members:
+            return None
+        i = bisect.bisect_left(sizes, size_index)
+        if i == len(sizes) or (i > 0 and size_index - sizes[i - 1] <= sizes[i] - size_index):
+            # the first wick of that size, as a min() over the ordered series would pick
+            return members[bisect.bisect_left(sizes, sizes[i - 1])]
+        return members[i]
+
+    def convert(self, vessel_id: str, old_wax_id: str, new_wax_id: str,
+                current_wick_id: str) -> Optional[Dict]:
+        """Replacement wick for moving one vessel/wick from ``old_wax_id`` to ``new_wax_id``.
+
+        Returns None when there is no learned, non-zero delta or the current
+        wick is unknown.
+        """
+        self.refresh()
+        with self._lock:
+            row = self._deltas.get((vessel_id, old_wax_id, new_wax_id))
+            current = self._wicks.get(current_wick_id)
+            if not row or not row['wick_size_delta'] or not current:
+                return None
+
+            delta = row['wick_size_delta']
+            wick = self.closest_wick(current['series'], current['size_index'] + delta)
+            return {
+                'vessel_id': vessel_id,
+                'current_wick_id': current_wick_id,
+                'current_wick_name': current['name'],
+                'wick_id': wick['id'],
+                'wick_name': wick['name'],
+                'wick_size_delta': delta,
+                'confidence': row['confidence_score'],
+                'sample_count': row['sample_count'],
+            }
+
+    def convert_many(self, old_wax_id: str, new_wax_id: str, items: List[Dict]) -> List[Optional[Dict]]:
+        """convert() for many ``{'vessel_id', 'current_wick_id'}`` items, in order"""
+        self.refresh()
+        return [self.convert(item['vessel_id'], old_wax_id, new_wax_id, item['current_wick_id'])
+                for item in items]
@@ -6,20 +6,52 @@ Provides REST API for wick predictions, test management, and analytics
 from flask import Blueprint, request, jsonify
 from datetime import datetime
 import os
-from supabase import create_client, Client
 from .wick_predictor import WickPredictor
 from .wick_ml_trainer import WickMLTrainer
+from .active_learning import ActiveLearningRanker
+from .supabase_tables import fetch_all
+from .name_resolver import NameResolver
+from .write_behind import WriteBehindLogger
 
 # Create blueprint
 wick_api = Blueprint('wick_api', __name__, url_prefix='/api/wick')
 
-# Initialize Supabase client
-supabase_url = os.getenv('SUPABASE_URL')
-supabase_key = os.getenv('SUPABASE_ANON_KEY')
-supabase: Client = create_client(supabase_url, supabase_key) if supabase_url else None
+# Set by init_wick_api() from the host app's Supabase client
+supabase = None
+predictor = None
+ranker = None
+resolver = None
+prediction_log = None
 
-# Initialize predictor
-predictor = WickPredictor(supabase) if supabase else None
+
+def init_wick_api(client):
+    """Build the blueprint's services from the app's Supabase client.
+
+    Returns ``(predictor, resolver)`` so the app's own routes share them
+    instead of loading the model and syncing the baseline a second time.
+    Calling it again with the same client returns the existing services.
+    """
+    global supabase, predictor, ranker, resolver, prediction_log
+    if client is supabase and predictor is not None:
+        return predictor, resolver
+
+    supabase = client
+    predictor = WickPredictor(client)
+    ranker = ActiveLearningRanker(predictor)
+    resolver = NameResolver(client)
+
+    # Keep the in-memory majority baseline in step with assembly changes
+    predictor.majority_baseline.start()
+
+    # Prediction tracking rows are written in batches off the request path
+    prediction_log = WriteBehindLogger(
+        client,
+        'wick_predictions',
+        spill_path=os.getenv('PREDICTION_SPILL_PATH', 'wick_predictions_spill.jsonl'),
+        max_batch=int(os.getenv('PREDICTION_LOG_BATCH_SIZE', '50')),
+        flush_interval=float(os.getenv('PREDICTION_LOG_INTERVAL', '2.0'))
+    )
+    return predictor, resolver
 
 @wick_api.route('/predict', methods=['POST'])
 def predict_wick():
@@ -61,15 +93,15 @@ def predict_wick():
         # Store prediction for tracking
         if recommendations:
             top_rec = recommendations[0]
-            supabase.table('wick_predictions').insert({
+            prediction_log.log({
                 'vessel_id': data['vessel_id'],
                 'wax_type_id': data['wax_type_id'],
-                'fragrance_id': data['fragrance_id'],
+                'fragrance_oil_id': data['fragrance_id'],
                 'fragrance_load_percentage': data['fragrance_load'],
                 'predicted_wick_id': top_rec.wick_id,
                 'confidence_score': top_rec.confidence,
                 'model_version': predictor.model_version or 'heuristic_v1'
-            }).execute()
+            })
         
         # Format response
         return jsonify({
@@ -92,16 +124,54 @@ def predict_wick():
 
 @wick_api.route('/test-priorities', methods=['GET'])
 def get_test_priorities():
-    """Get prioritized list of assemblies that need testing"""
+    """
+    Get prioritized list of assemblies that need testing
+    
+    With a trained model loaded, every untested vessel/wax/fragrance
+    combination is ranked by model uncertainty and demand. Pass
+    ?source=predictions (or run without a model) to rank the logged
+    low-confidence predictions instead.
+    """
     try:
         if not predictor:
             return jsonify({'error': 'Prediction service not available'}), 503
         
         limit = request.args.get('limit', 20, type=int)
+        source = request.args.get('source', 'model')
+        
+        if source == 'model' and ranker.available:
+            candidates = ranker.top_k(limit)
+            return jsonify({
+                'success': True,
+                'source': 'model',
+                'model_version': predictor.model_version,
+                'count': len(candidates),
+                'priorities': [
+                    {
+                        'assembly_id': None,
+                        'assembly_name': c.name,
+                        'vessel_id': c.vessel_id,
+                        'wax_type_id': c.wax_type_id,
+                        'fragrance_oil_id': c.fragrance_oil_id,
+                        'predicted_wick_id': c.predicted_wick_id,
+                        'predicted_wick': c.predicted_wick_name,
+                        'uncertainty_score': round(c.uncertainty_score, 3),
+                        'entropy': round(c.entropy, 3),
+                        'margin': round(c.margin, 3),
+                        'demand': c.demand,
+                        'information_gain': round(c.score, 3),
+                        'reason': f"Untested; model is unsure (entropy {c.entropy:.2f}, "
+                                  f"margin {c.margin:.2f}) and {c.demand} assemblies use this vessel/wax"
+                    }
+                    for c in candidates
+                ]
+            })
+        
         priorities = predictor.get_test_priorities(limit)
         
         return jsonify({
             'success': True,
+            'source': 'predictions',
             'count': len(priorities),
             'priorities': [
                 {
@@ -118,6 +188,28 @@ def get_test_priorities():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def _test_result_record(data: dict) -> dict:
+    """Turn one /log-test request body into a record_test_results() row"""
+    if not isinstance(data, dict):
+        raise ValueError('Each test result must be an object')
+    
+    required = ['assembly_id', 'wick_tested', 'pass']
+    for field in required:
+        if field not in data:
+            raise ValueError(f'Missing required field: {field}')
+    
+    return {
+        'assembly_id': data['assembly_id'],
+        'wick_name': data['wick_tested'],
+        'test_date': data.get('test_date', datetime.now().date().isoformat()),
+        'test_type': data.get('test_type', 'quality_check'),
+        'flame_height_mm': data.get('flame_height_mm'),
+        'melt_pool_mm_at_2h': data.get('melt_pool_mm_2h'),
+        'pass': data['pass'],
+        'notes': data.get('notes'),
+        'tested_by': data.get('tested_by')
+    }
+
 @wick_api.route('/log-test', methods=['POST'])
 def log_test_result():
     """
@@ -138,47 +230,58 @@ def log_test_result():
         if not predictor:
             return jsonify({'error': 'Prediction service not available'}), 503
         
-        data = request.get_json()
+        ids = predictor.record_test_results([_test_result_record(request.get_json())])
         
-        # Validate required fields
-        required = ['assembly_id', 'wick_tested', 'pass']
-        for field in required:
-            if field not in data:
-                return jsonify({'error': f'Missing required field: {field}'}), 400
+        return jsonify({
+            'success': True,
+            'test_result_id': ids[0] if ids else None,
+            'message': 'Test result recorded successfully'
+        })
         
-        # Get wick ID from name
-        wick_result = supabase.table('wicks') \
-            .select('id') \
-            .eq('name', data['wick_tested']) \
-            .single() \
-            .execute()
+    except (ValueError, LookupError) as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@wick_api.route('/log-tests', methods=['POST'])
+def log_test_results():
+    """
+    Log a lab session's test results in one transaction
+    
+    Request body:
+    {
+        "results": [ {same fields as /log-test}, ... ]
+    }
+    
+    Either every result is recorded or none are.
+    """
+    try:
+        if not predictor:
+            return jsonify({'error': 'Prediction service not available'}), 503
         
-        if not wick_result.data:
-            return jsonify({'error': f'Unknown wick: {data["wick_tested"]}'}), 400
-        
-        wick_id = wick_result.data['id']
-        
-        # Record test result
-        test_data = {
-            'flame_height_mm': data.get('flame_height_mm'),
-            'melt_pool_mm_at_2h': data.get('melt_pool_mm_2h'),
-            'notes': data.get('notes'),
-            'tested_by': data.get('tested_by'),
-            'test_type': data.get('test_type', 'quality_check')
-        }
-        
-        predictor.record_test_result(
-            assembly_id=data['assembly_id'],
-            wick_id_tested=wick_id,
-            test_data=test_data,
-            passed=data['pass']
-        )
+        data = request.get_json()
+        results = data.get('results') if isinstance(data, dict) else data
+        if not isinstance(results, list) or not results:
+            return jsonify({'error': 'Expected a non-empty list of results'}), 400
+        
+        records = []
+        for i, result in enumerate(results):
+            try:
+                records.append(_test_result_record(result))
+            except ValueError as e:
+                return jsonify({'error': f'Result {i}: {e}'}), 400
+        
+        ids = predictor.record_test_results(records)
         
         return jsonify({
             'success': True,
-            'message': 'Test result recorded successfully'
+            'recorded': len(ids),
+            'test_result_ids': ids,
+            'message': f'{len(ids)} test results recorded'
         })
         
+    except LookupError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -257,6 +360,61 @@ def get_wax_conversion_analytics():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@wick_api.route('/wax-conversion/convert', methods=['POST'])
+def convert_product_line():
+    """
+    Convert many vessel/wick pairs from one wax to another in one call
+    
+    Request body:
+    {
+        "old_wax_id": "111",
+        "new_wax_id": "456",
+        "items": [{"vessel_id": "123", "current_wick_id": "222"}, ...] (optional)
+    }
+    
+    Without "items", every assembly currently made with old_wax_id is converted.
+    """
+    try:
+        if not predictor:
+            return jsonify({'error': 'Prediction service not available'}), 503
+        
+        data = request.get_json() or {}
+        for field in ('old_wax_id', 'new_wax_id'):
+            if field not in data:
+                return jsonify({'error': f'Missing required field: {field}'}), 400
+        old_wax_id, new_wax_id = data['old_wax_id'], data['new_wax_id']
+        
+        items = data.get('items')
+        if items is None:
+            items = [
+                {'assembly_id': a['id'], 'name': a['name'], 'vessel_id': a['vessel_id'],
+                 'current_wick_id': a['wick_id_1']}
+                for a in fetch_all(supabase, 'assemblies', 'id, name, vessel_id, wick_id_1',
+                                   where=lambda q: q.eq('wax_type_id', old_wax_id))
+                if a['wick_id_1']
+            ]
+        elif not isinstance(items, list) or \
+                not all(isinstance(i, dict) and 'vessel_id' in i and 'current_wick_id' in i for i in items):
+            return jsonify({'error': 'Each item needs vessel_id and current_wick_id'}), 400
+        
+        conversions = predictor.wax_conversions.convert_many(old_wax_id, new_wax_id, items)
+        
+        results = []
+        for item, conversion in zip(items, conversions):
+            result = dict(item)
+            result.update(conversion or {'wick_id': None, 'reason': 'No learned conversion for this vessel and wick'})
+            results.append(result)
+        
+        return jsonify({
+            'success': True,
+            'count': len(results),
+            'converted': sum(1 for c in conversions if c),
+            'results': results
+        })
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @wick_api.route('/retrain', methods=['POST'])
 def trigger_retrain():
     """Trigger ML model retraining"""
@@ -289,31 +447,25 @@ def trigger_retrain():
 def get_majority_baseline():
     """Get majority vote baseline for all vessel/wax combinations"""
     try:
-        if not supabase:
+        if not predictor:
             return jsonify({'error': 'Database not available'}), 503
         
-        # Refresh materialized view
-        supabase.rpc('refresh_materialized_view', {
-            'view_name': 'wick_majority_baseline'
-        }).execute()
-        
-        # Get baseline data
-        baseline = supabase.table('wick_majority_baseline') \
-            .select('*, vessels(*), wax_types(*), wicks:recommended_wick(*)') \
-            .execute()
+        # Served from memory; the baseline syncs itself from assembly changes
+        baseline = predictor.majority_baseline.all()
         
         return jsonify({
             'success': True,
-            'count': len(baseline.data),
+            'count': len(baseline),
+            'as_of': predictor.majority_baseline.synced_at.isoformat(),
             'baseline': [
                 {
-                    'vessel': b['vessels']['name'],
-                    'wax': b['wax_types']['name'],
-                    'recommended_wick': b['wicks']['name'],
+                    'vessel': b['vessel_name'],
+                    'wax': b['wax_name'],
+                    'recommended_wick': b['wick_name'],
                     'sample_size': b['sample_size'],
                     'wick_variety': b['wick_variety']
                 }
-                for b in baseline.data
+                for b in baseline
             ]
         })
         
@@ -339,25 +491,33 @@ def quick_wick_check():
         
         data = request.get_json()
         
-        # Look up components by name
-        vessel = supabase.table('vessels').select('id').eq('name', data['vessel']).single().execute()
-        wax = supabase.table('wax_types').select('id').eq('name', data['wax']).single().execute()
-        fragrance = supabase.table('fragrance_oils').select('id').eq('name', data['fragrance']).single().execute()
-        wick = supabase.table('wicks').select('id').eq('name', data['wick']).single().execute()
-        
-        if not all([vessel.data, wax.data, fragrance.data, wick.data]):
-            return jsonify({'error': 'One or more components not found'}), 404
+        # Look up components by name (in memory; tolerates case, spacing and punctuation)
+        fields = {'vessel': 'vessels', 'wax': 'wax_types', 'fragrance': 'fragrance_oils', 'wick': 'wicks'}
+        resolved = {field: resolver.resolve(table, data.get(field)) for field, table in fields.items()}
+        
+        missing = [field for field, match in resolved.items() if match is None]
+        if missing:
+            # Close names are offered for the caller to pick from, never picked for them
+            return jsonify({
+                'error': 'One or more components not found',
+                'missing': missing,
+                'candidates': {
+                    field: [{'id': m.id, 'name': m.name, 'match': m.method, 'score': m.score}
+                            for m in resolver.matches(fields[field], data.get(field))]
+                    for field in missing
+                }
+            }), 404
         
         # Get recommendations
         recommendations = predictor.get_comprehensive_recommendations(
-            vessel_id=vessel.data['id'],
-            wax_type_id=wax.data['id'],
-            fragrance_id=fragrance.data['id'],
+            vessel_id=resolved['vessel'].id,
+            wax_type_id=resolved['wax'].id,
+            fragrance_id=resolved['fragrance'].id,
             fragrance_load=8.5  # Default assumption
         )
         
         # Check if proposed wick is in recommendations
-        proposed_wick_id = wick.data['id']
+        proposed_wick_id = resolved['wick'].id
         match = next((r for r in recommendations if r.wick_id == proposed_wick_id), None)
         
         if match and match.rank <= 3:
@@ -378,7 +538,11 @@ def quick_wick_check():
             'top_recommendations': [
                 {'wick': r.wick_name, 'confidence': round(r.confidence, 2)}
                 for r in recommendations[:3]
-            ]
+            ],
+            'resolved': {
+                field: {'id': match.id, 'name': match.name, 'match': match.method, 'score': match.score}
+                for field, match in resolved.items()
+            }
         })
         
     except Exception as e:
@@ -0,0 +1,218 @@
+"""
+Rule-based wick recommender
+The fallback used when no Supabase/ML or assembly data is available: picks
+base wicks by vessel size, then nudges sizes and scores for wax and fragrance.
+All rules live in the tables below; scoring runs over many inputs at once.
+"""
+
+import math
+import re
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+# (largest oz_fill in the band, category, diameter estimate in inches, base wicks best first)
+SIZE_BANDS = (
+    (2.5, 'xs', (1.5, 2.0), ('CD-2', 'CD-3', 'CD-4', 'ECO-1', 'ECO-2')),
+    (4.0, 'small', (2.0, 2.5), ('CD-4', 'CD-5', 'CD-6', 'ECO-2', 'ECO-4')),
+    (8.0, 'medium', (2.5, 3.0), ('CD-6', 'CD-8', 'CD-10', 'ECO-4', 'ECO-6', 'LX-10')),
+    (12.0, 'large', (3.0, 3.5), ('CD-10', 'CD-12', 'CD-14', 'ECO-8', 'ECO-10', 'LX-12', 'HTP-73')),
+    (math.inf, 'xl', (3.5, 4.0), ('CD-14', 'CD-16', 'CD-18', 'ECO-12', 'ECO-14', 'LX-14', 'HTP-93')),
+)
+
+# Wick size adjustment; the first rule whose keyword appears in the input wins
+WAX_ADJUSTMENTS = (
+    (('soy',), 0),        # Soy tends to be baseline
+    (('paraffin',), -1),  # Paraffin burns hotter, may need smaller wick
+    (('coconut',), 1),    # Coconut wax may need larger wick
+    (('beeswax',), 1),    # Beeswax is dense, needs larger wick
+)
+FRAGRANCE_ADJUSTMENTS = (
+    (('vanilla', 'bakery', 'cinnamon', 'spice'), 1),  # Heavy fragrances need larger wicks
+    (('citrus', 'fresh', 'clean', 'light'), 0),       # Light fragrances burn easier
+)
+
+# Probability bonus when a series suits the wax (keyword in the wax name)
+SERIES_AFFINITIES = {
+    'CD': (('soy',), 5),              # CD wicks work well with soy
+    'ECO': (('soy', 'coconut'), 7),   # ECO great for natural waxes
+    'LX': (('paraffin',), 5),         # LX good for paraffin
+    'HTP': (('blend',), 5),           # HTP good for blends
+}
+
+# Scoring constants: base wick i starts at PRIMARY_START - i * PRIMARY_STEP
+PRIMARY_START = 85
+PRIMARY_STEP = 5
+PRIMARY_CAP = 95
+SIZE_STEP = 2
+MAX_RECOMMENDATIONS = 8
+
+# (probability offset from the base, floor, reason) for each size variant
+SMALLER_HOT = (-15, 40, 'Smaller variant for hot-burning wax')
+LARGER_DENSE = (-10, 50, 'Larger variant for dense wax/fragrance')
+SMALLER_ALT = (-20, 40, 'Alternative smaller size')
+LARGER_ALT = (-20, 40, 'Alternative larger size')
+PRIMARY_REASON = 'Primary size match'
+
+DEFAULT_OZ_FILL = 8.0
+# A bare number in the vessel name is taken as ounces only in this range
+BARE_NUMBER_RANGE = (4, 20)
+
+BAND_LIMITS = np.array([band[0] for band in SIZE_BANDS])
+SERIES = tuple(SERIES_AFFINITIES)
+REASONS = (PRIMARY_REASON, SMALLER_HOT[2], LARGER_DENSE[2], SMALLER_ALT[2], LARGER_ALT[2])
+
+
+def _split_wick(name: str):
+    series, size = name.split('-')
+    return series, int(size)
+
+
+# Per band: series index, size and base probability of each base wick
+_BAND_WICKS = []
+for _, _, _, _wicks in SIZE_BANDS:
+    _parts = [_split_wick(wick) for wick in _wicks]
+    _BAND_WICKS.append((
+        np.array([SERIES.index(series) for series, _ in _parts]),
+        np.array([size for _, size in _parts]),
+        PRIMARY_START - PRIMARY_STEP * np.arange(len(_parts)),
+        _parts,
+    ))
+
+
+def parse_oz_fill(vessel: str) -> float:
+    """Ounces from a vessel name ('8oz Tumbler', '12 ounce jar'), or DEFAULT_OZ_FILL"""
+    vessel_lower = (vessel or '').lower()
+    match = re.search(r'(\d+(?:\.\d+)?)\s*oz', vessel_lower) or \
+        re.search(r'(\d+(?:\.\d+)?)\s*(?:ounce|ounces)', vessel_lower)
+    if match:
+        return float(match.group(1))
+
+    number = re.search(r'(\d+(?:\.\d+)?)', vessel_lower)
+    if number and BARE_NUMBER_RANGE[0] <= float(number.group(1)) <= BARE_NUMBER_RANGE[1]:
+        return float(number.group(1))
+    return DEFAULT_OZ_FILL
+
+
+def oz_fill_value(value) -> Optional[float]:
+    """``oz_fill`` as a float, None when absent; ValueError unless a positive finite number"""
+    if value is None or (isinstance(value, str) and not value.strip()):
+        return None
+    try:
+        oz = float(value)
+    except (TypeError, ValueError):
+        oz = math.nan
+    if not math.isfinite(oz) or oz <= 0:
+        raise ValueError(f"oz_fill must be a positive number, got {value!r}")
+    return oz
+
+
+def _first_rule(text: str, rules) -> int:
+    for keywords, value in rules:
+        if any(keyword in text for keyword in keywords):
+            return value
+    return 0
+
+
+def recommend_batch(items: Sequence[Dict]) -> List[Dict]:
+    """Recommendations for many ``{'vessel', 'wax', 'fragrance', 'oz_fill'}`` inputs.
+
+    ``oz_fill`` is optional and parsed from the vessel name when missing.
+    Returns, per input, the vessel size, up to MAX_RECOMMENDATIONS wicks
+    (``wick``, ``probability``, ``reason``) best first, and the factors used.
+    Raises ValueError naming every item whose ``oz_fill`` is not a positive
+    finite number.
+    """
+    n = len(items)
+    if n == 0:
+        return []
+
+    waxes = [(item.get('wax') or '').lower() for item in items]
+    fragrances = [(item.get('fragrance') or '').lower() for item in items]
+    oz = np.empty(n)
+    invalid = []
+    for i, item in enumerate(items):
+        try:
+            value = oz_fill_value(item.get('oz_fill'))
+        except ValueError:
+            invalid.append(f"item {i + 1} ({item.get('oz_fill')!r})")
+            continue
+        oz[i] = value if value is not None else parse_oz_fill(item.get('vessel'))
+    if invalid:
+        raise ValueError(f"oz_fill must be a positive number: {', '.join(invalid)}")
+    bands = np.searchsorted(BAND_LIMITS, oz, side='left')
+    adjustments = np.array([_first_rule(wax, WAX_ADJUSTMENTS) + _first_rule(fragrance, FRAGRANCE_ADJUSTMENTS)
+                            for wax, fragrance in zip(waxes, fragrances)])
+    affinities = np.array([[bonus if any(keyword in wax for keyword in keywords) else 0
+                            for keywords, bonus in SERIES_AFFINITIES.values()] for wax in waxes])
+
+    results: List[Optional[Dict]] = [None] * n
+    for band_index, (_, category, diameter, _) in enumerate(SIZE_BANDS):
+        rows = np.nonzero(bands == band_index)[0]
+        if not rows.size:
+            continue
+        series, sizes, base, parts = _BAND_WICKS[band_index]
+
+        adjustment = adjustments[rows][:, None]
+        hot = (adjustment < 0) & (sizes > SIZE_STEP)
+        dense = np.broadcast_to(adjustment > 0, hot.shape)
+        neutral = ~hot & ~dense
+
+        primary = np.minimum(PRIMARY_CAP, base + affinities[rows][:, series])
+        smaller = np.where(hot, np.maximum(SMALLER_HOT[1], base + SMALLER_HOT[0]),
+                           np.maximum(SMALLER_ALT[1], base + SMALLER_ALT[0]))
+        larger = np.where(dense, np.maximum(LARGER_DENSE[1], base + LARGER_DENSE[0]),
+                          np.maximum(LARGER_ALT[1], base + LARGER_ALT[0]))
+        smaller_ok = hot | (neutral & (sizes > SIZE_STEP))
+        larger_ok = dense | neutral
+
+        # Candidates per base wick in the order they were always listed: primary, smaller, larger
+        probabilities = np.stack([
+            primary,
+            np.where(smaller_ok, smaller, -1),
+            np.where(larger_ok, larger, -1),
+        ], axis=2).reshape(rows.size, -1)
+        reasons = np.stack([
+            np.zeros_like(primary),
+            np.where(hot, 1, 3),
+            np.where(dense, 2, 4),
+        ], axis=2).reshape(rows.size, -1)
+        names = [f"{s}-{size + offset}" for s, size in parts for offset in (0, -SIZE_STEP, SIZE_STEP)]
+
+        # Stable, so equal probabilities keep listing order
+        order = np.argsort(-probabilities, axis=1, kind='stable')
+        for r, item_index in enumerate(rows):
+            seen = set()
+            recommendations = []
+            for c in order[r]:
+                probability = int(probabilities[r, c])
+                if probability < 0 or len(recommendations) == MAX_RECOMMENDATIONS:
+                    break
+                if names[c] in seen:
+                    continue
+                seen.add(names[c])
+                recommendations.append({
+                    'wick': names[c],
+                    'probability': probability,
+                    'reason': REASONS[reasons[r, c]]
+                })
+
+            results[item_index] = {
+                'vessel_size': {
+                    'oz_fill': float(oz[item_index]),
+                    'category': category,
+                    'diameter_estimate': f"{diameter[0]}-{diameter[1]} inches"
+                },
+                'recommendations': recommendations,
+                'factors': {
+                    'wax_type': waxes[item_index] or 'unknown',
+                    'fragrance_type': fragrances[item_index] or 'unknown',
+                    'adjustment': int(adjustments[item_index])
+                }
+            }
+    return results
+
+
+def recommend(vessel: str, wax: str = '', fragrance: str = '', oz_fill: Optional[float] = None) -> Dict:
+    """recommend_batch() for a single input"""
+    return recommend_batch([{'vessel': vessel, 'wax': wax, 'fragrance': fragrance, 'oz_fill': oz_fill}])[0]
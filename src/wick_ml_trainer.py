@@ -29,6 +29,9 @@ class WickMLTrainer:
             'wax_base_type_encoded', 'fragrance_category_encoded'
         ]
         self.label_encoders = {}
+        # What _handle_missing_values filled each column's gaps with; saved with
+        # the model so predictions fill gaps the same way
+        self.fill_values = {}
         self.scaler = StandardScaler()
         
     def prepare_training_data(self) -> Tuple[pd.DataFrame, pd.Series]:
@@ -111,17 +114,20 @@ class WickMLTrainer:
         
         for col in numeric_cols:
             if col in df.columns:
-                df[col] = df[col].fillna(df[col].median())
+                self.fill_values[col] = float(df[col].median())
+                df[col] = df[col].fillna(self.fill_values[col])
         
         # Categorical columns: fill with mode or 'unknown'
         categorical_cols = ['vessel_shape', 'vessel_material', 'wax_base_type', 'fragrance_category']
         for col in categorical_cols:
             if col in df.columns:
                 mode_val = df[col].mode()[0] if not df[col].mode().empty else 'unknown'
+                self.fill_values[col] = mode_val
                 df[col] = df[col].fillna(mode_val)
         
         # Boolean columns
         if 'double_wick' in df.columns:
+            self.fill_values['double_wick'] = False
             df['double_wick'] = df['double_wick'].fillna(False)
         
         return df
@@ -207,6 +213,7 @@ class WickMLTrainer:
             'model': self.model,
             'scaler': self.scaler,
             'label_encoders': self.label_encoders,
+            'fill_values': self.fill_values,
             'feature_names': self.feature_names,
             'metrics': metrics,
             'version': version
@@ -218,6 +225,7 @@ class WickMLTrainer:
             'model': self.model,
             'scaler': self.scaler,
             'label_encoders': self.label_encoders,
+            'fill_values': self.fill_values,
             'feature_names': self.feature_names,
             'metrics': metrics,
             'version': version
@@ -5,11 +5,21 @@ Implements majority vote, wax conversion heuristics, and ML-based predictions
 
 import numpy as np
 import pandas as pd
-from typing import Dict, List, Tuple, Optional
+from typing import Dict, List, Optional, Sequence, Tuple
 from dataclasses import dataclass
 from datetime import datetime
 import joblib
+import logging
 import os
+import threading
+import time
+
+from .active_learning import FEATURE_SOURCES, encoded_labels
+from .majority_baseline import MajorityBaseline
+from .supabase_tables import fetch_all
+from .wax_conversion import WaxConversionMatrix
+
+logger = logging.getLogger(__name__)
 
 @dataclass
 class WickRecommendation:
@@ -32,10 +42,22 @@ class TestPriority:
 class WickPredictor:
     """Main class for wick prediction and recommendation"""
     
+    # Seconds the vessel/wax assembly counts are reused before re-reading them
+    ASSEMBLY_COUNTS_TTL = 300
+    
     def __init__(self, supabase_client):
         self.supabase = supabase_client
         self.model = None
         self.model_version = None
+        self.scaler = None
+        self.label_encoders = {}
+        self.fill_values = {}
+        self.feature_names = []
+        self._assembly_counts: Dict[Tuple[str, str], int] = {}
+        self._assembly_counts_loaded_at = None
+        self._assembly_counts_lock = threading.Lock()
+        self.majority_baseline = MajorityBaseline(supabase_client)
+        self.wax_conversions = WaxConversionMatrix(supabase_client)
         self._load_latest_model()
     
     def _load_latest_model(self):
@@ -43,8 +65,15 @@ class WickPredictor:
         model_path = os.path.join('models', 'wick_predictor_latest.pkl')
         if os.path.exists(model_path):
             try:
-                self.model = joblib.load(model_path)
-                self.model_version = datetime.fromfile(model_path).strftime('%Y%m%d_%H%M%S')
+                # WickMLTrainer.save_model stores the model with its preprocessing
+                artifact = joblib.load(model_path)
+                self.model = artifact['model']
+                self.scaler = artifact.get('scaler')
+                self.label_encoders = artifact.get('label_encoders', {})
+                self.fill_values = artifact.get('fill_values', {})
+                self.feature_names = artifact.get('feature_names', [])
+                self.model_version = artifact.get('version') or \
+                    datetime.fromtimestamp(os.path.getmtime(model_path)).strftime('%Y%m%d_%H%M%S')
             except:
                 self.model = None
                 self.model_version = None
@@ -52,30 +81,15 @@ class WickPredictor:
     def get_majority_vote_recommendation(self, vessel_id: str, wax_type_id: str) -> Optional[WickRecommendation]:
         """Get baseline recommendation using majority vote from historical data"""
         try:
-            # Query the materialized view
-            result = self.supabase.table('wick_majority_baseline') \
-                .select('*') \
-                .eq('vessel_id', vessel_id) \
-                .eq('wax_type_id', wax_type_id) \
-                .single() \
-                .execute()
+            baseline = self.majority_baseline.recommendation(vessel_id, wax_type_id)
             
-            if result.data:
-                wick_id = result.data['recommended_wick']
-                sample_size = result.data['sample_size']
-                
-                # Get wick details
-                wick = self.supabase.table('wicks') \
-                    .select('*') \
-                    .eq('id', wick_id) \
-                    .single() \
-                    .execute()
-                
+            if baseline:
+                sample_size = baseline['sample_size']
                 confidence = min(0.95, 0.5 + (sample_size * 0.05))  # Cap at 95%
                 
                 return WickRecommendation(
-                    wick_id=wick_id,
-                    wick_name=wick.data['name'],
+                    wick_id=baseline['recommended_wick'],
+                    wick_name=baseline['wick_name'],
                     confidence=confidence,
                     reasoning=f"Based on {sample_size} successful historical uses with this vessel and wax combination",
                     rank=1
@@ -87,51 +101,15 @@ class WickPredictor:
                                         new_wax_id: str, current_wick_id: str) -> Optional[WickRecommendation]:
         """Get recommendation for wax conversion using learned deltas"""
         try:
-            # Get the conversion delta
-            delta_result = self.supabase.rpc('get_wax_conversion_delta', {
-                'p_vessel_id': vessel_id,
-                'p_old_wax_id': old_wax_id,
-                'p_new_wax_id': new_wax_id
-            }).execute()
+            conversion = self.wax_conversions.convert(vessel_id, old_wax_id, new_wax_id, current_wick_id)
             
-            if delta_result.data and delta_result.data != 0:
-                delta = delta_result.data
-                
-                # Get current wick details
-                current_wick = self.supabase.table('wicks') \
-                    .select('*') \
-                    .eq('id', current_wick_id) \
-                    .single() \
-                    .execute()
-                
-                current_size_index = current_wick.data['size_index']
-                new_size_index = current_size_index + delta
-                
-                # Find wick with closest size index in same series
-                new_wick = self.supabase.table('wicks') \
-                    .select('*') \
-                    .eq('series', current_wick.data['series']) \
-                    .order('size_index') \
-                    .execute()
-                
-                # Find closest match
-                closest_wick = min(new_wick.data, 
-                                 key=lambda w: abs(w['size_index'] - new_size_index))
-                
-                # Get conversion confidence
-                conv_data = self.supabase.table('wax_conversion_deltas') \
-                    .select('confidence_score, sample_count') \
-                    .eq('vessel_id', vessel_id) \
-                    .eq('old_wax_type_id', old_wax_id) \
-                    .eq('new_wax_type_id', new_wax_id) \
-                    .single() \
-                    .execute()
-                
+            if conversion:
+                delta = conversion['wick_size_delta']
                 return WickRecommendation(
-                    wick_id=closest_wick['id'],
-                    wick_name=closest_wick['name'],
-                    confidence=conv_data.data['confidence_score'],
-                    reasoning=f"Wax conversion heuristic: {'+' if delta > 0 else ''}{delta} sizes based on {conv_data.data['sample_count']} tests",
+                    wick_id=conversion['wick_id'],
+                    wick_name=conversion['wick_name'],
+                    confidence=conversion['confidence'],
+                    reasoning=f"Wax conversion heuristic: {'+' if delta > 0 else ''}{delta} sizes based on {conversion['sample_count']} tests",
                     rank=1
                 )
         except:
@@ -350,7 +328,7 @@ class WickPredictor:
     def get_ml_predictions(self, vessel_id: str, wax_type_id: str, 
                           fragrance_id: str, fragrance_load: float) -> List[WickRecommendation]:
         """Get ML-based predictions if model is available"""
-        if not self.model:
+        if not self.model or self.scaler is None:
             return []
         
         try:
@@ -358,72 +336,84 @@ class WickPredictor:
             features = self._prepare_features(vessel_id, wax_type_id, fragrance_id, fragrance_load)
             
             # Get predictions with probabilities
-            predictions = self.model.predict_proba([features])[0]
+            predictions = self.model.predict_proba(features[np.newaxis, :])[0]
             
-            # Get top 5 predictions
-            top_indices = np.argsort(predictions)[-5:][::-1]
-            recommendations = []
+            # The model was trained on encoded wick ids
+            wick_ids = self.label_encoders['target'].inverse_transform(
+                np.asarray(self.model.classes_, dtype=int))
             
-            for i, idx in enumerate(top_indices):
-                if predictions[idx] > 0.1:  # Only include if >10% probability
-                    wick_id = self.model.classes_[idx]
-                    wick = self.supabase.table('wicks') \
-                        .select('name') \
-                        .eq('id', wick_id) \
-                        .single() \
-                        .execute()
-                    
-                    recommendations.append(WickRecommendation(
-                        wick_id=wick_id,
-                        wick_name=wick.data['name'],
-                        confidence=predictions[idx],
-                        reasoning=f"ML model prediction (v{self.model_version})",
-                        rank=i + 1
-                    ))
+            # Get top 5 predictions, only if >10% probability
+            top_indices = [idx for idx in np.argsort(predictions)[-5:][::-1] if predictions[idx] > 0.1]
+            top_ids = [str(wick_ids[idx]) for idx in top_indices]
+            if not top_ids:
+                return []
+            wicks = self.supabase.table('wicks') \
+                .select('id, name') \
+                .in_('id', top_ids) \
+                .execute()
+            names = {wick['id']: wick['name'] for wick in wicks.data or []}
             
-            return recommendations
-        except:
+            return [WickRecommendation(
+                wick_id=wick_id,
+                wick_name=names.get(wick_id),
+                confidence=float(predictions[idx]),
+                reasoning=f"ML model prediction (v{self.model_version})",
+                rank=i + 1
+            ) for i, (idx, wick_id) in enumerate(zip(top_indices, top_ids))]
+        except Exception:
+            logger.exception(f"ML prediction failed for vessel {vessel_id}, wax {wax_type_id}, "
+                             f"fragrance {fragrance_id}")
             return []
     
     def _prepare_features(self, vessel_id: str, wax_type_id: str, 
                          fragrance_id: str, fragrance_load: float) -> np.ndarray:
-        """Prepare feature vector for ML model"""
-        # Get vessel features
-        vessel = self.supabase.table('vessels') \
-            .select('*') \
-            .eq('id', vessel_id) \
-            .single() \
-            .execute().data
-        
-        # Get wax features
-        wax = self.supabase.table('wax_types') \
-            .select('*') \
-            .eq('id', wax_type_id) \
-            .single() \
-            .execute().data
-        
-        # Get fragrance features
-        fragrance = self.supabase.table('fragrance_oils') \
-            .select('*') \
-            .eq('id', fragrance_id) \
-            .single() \
-            .execute().data
-        
-        # Create feature vector
-        features = [
-            vessel.get('volume_ml', 0),
-            vessel.get('diameter_mm', 0),
-            vessel.get('height_mm', 0),
-            1 if vessel.get('double_wick', False) else 0,
-            vessel.get('heat_dissipation_factor', 1.0),
-            wax.get('melt_point_celsius', 0),
-            wax.get('viscosity_index', 0),
-            fragrance.get('flash_point_celsius', 0),
-            fragrance.get('heat_index', 0),
-            fragrance_load
-        ]
-        
-        return np.array(features)
+        """Scaled feature vector in the trained model's feature order.
+        
+        Built through feature_values(), as the active-learning ranker's rows
+        are, then the stored scaler.
+        """
+        rows = {
+            catalog: self.supabase.table(catalog)
+                .select('*')
+                .eq('id', item_id)
+                .single()
+                .execute().data
+            for catalog, item_id in (('vessels', vessel_id), ('wax_types', wax_type_id),
+                                     ('fragrance_oils', fragrance_id))
+        }
+        
+        features = np.empty(len(self.feature_names), dtype=float)
+        for i, feature in enumerate(self.feature_names):
+            if feature == 'fragrance_load_percentage':
+                value = fragrance_load
+            else:
+                catalog, column, _ = FEATURE_SOURCES[feature]
+                value = rows[catalog].get(column)
+            features[i] = self.feature_values(feature, [value])[0]
+        
+        return (features - self.scaler.mean_) / self.scaler.scale_
+    
+    def feature_values(self, feature: str, values: Sequence) -> np.ndarray:
+        """Unscaled model inputs for one feature's raw catalog values.
+        
+        Gaps are filled the way WickMLTrainer filled the training data, with
+        the fill values saved in the model artifact: the training median for
+        numbers, False for double_wick, and the training mode for categories,
+        which also stands in for categories the encoder never saw. Artifacts
+        saved before fill values were stored fall back to the training mean
+        and the encoder's 'unknown' code.
+        """
+        encoder_name = FEATURE_SOURCES[feature][2] if feature in FEATURE_SOURCES else None
+        fill = self.fill_values.get(encoder_name or feature)
+        
+        if encoder_name:
+            classes, fallback = encoded_labels(self.label_encoders.get(encoder_name))
+            fallback = classes.get(fill, fallback)
+            return np.array([classes.get(value, fallback) for value in values], dtype=float)
+        
+        if fill is None:
+            fill = self.scaler.mean_[self.feature_names.index(feature)]
+        return np.array([fill if value is None else float(value) for value in values], dtype=float)
     
     def get_comprehensive_recommendations(self, vessel_id: str, wax_type_id: str,
                                         fragrance_id: str, fragrance_load: float,
@@ -515,23 +505,23 @@ class WickPredictor:
                 .limit(limit) \
                 .execute()
             
+            predictions = uncertain.data
+            if not predictions:
+                return []
+            
+            info_gains = self._estimate_information_gains(
+                [(pred['assemblies']['vessel_id'], pred['assemblies']['wax_type_id']) for pred in predictions],
+                np.array([pred['confidence_score'] for pred in predictions], dtype=float)
+            )
+            
             priorities = []
-            for pred in uncertain.data:
+            for pred, info_gain in zip(predictions, info_gains):
                 assembly = pred['assemblies']
-                
-                # Calculate information gain estimate
-                # Higher for popular vessels/waxes with little data
-                info_gain = self._estimate_information_gain(
-                    assembly['vessel_id'],
-                    assembly['wax_type_id'],
-                    pred['confidence_score']
-                )
-                
                 priorities.append(TestPriority(
                     assembly_id=assembly['id'],
                     assembly_name=assembly['name'],
                     uncertainty_score=1 - pred['confidence_score'],
-                    information_gain=info_gain,
+                    information_gain=float(info_gain),
                     reason=f"Low confidence ({pred['confidence_score']:.1%}) prediction needs verification"
                 ))
             
@@ -542,56 +532,69 @@ class WickPredictor:
         except:
             return []
     
+    def get_assembly_counts(self) -> Dict[Tuple[str, str], int]:
+        """Number of assemblies per (vessel_id, wax_type_id), cached for ASSEMBLY_COUNTS_TTL seconds"""
+        with self._assembly_counts_lock:
+            now = time.monotonic()
+            if self._assembly_counts_loaded_at is None or \
+                    now - self._assembly_counts_loaded_at > self.ASSEMBLY_COUNTS_TTL:
+                rows = fetch_all(self.supabase, 'assembly_component_counts',
+                                 'vessel_id, wax_type_id, assembly_count')
+                self._assembly_counts = {
+                    (row['vessel_id'], row['wax_type_id']): row['assembly_count']
+                    for row in rows
+                }
+                self._assembly_counts_loaded_at = now
+            return self._assembly_counts
+    
+    def _estimate_information_gains(self, components: List[Tuple[str, str]],
+                                    confidences: np.ndarray) -> np.ndarray:
+        """Estimate information gain from testing each (vessel_id, wax_type_id) combination
+        
+        Information gain is higher for:
+        - Lower current confidence
+        - More assemblies that would benefit
+        """
+        counts = self.get_assembly_counts()
+        similar_counts = np.array([counts.get(pair) or 1 for pair in components], dtype=float)
+        return (1 - confidences) * np.log(similar_counts + 1)
+    
     def _estimate_information_gain(self, vessel_id: str, wax_type_id: str, 
                                   current_confidence: float) -> float:
         """Estimate information gain from testing this combination"""
-        # Count how many other assemblies share this vessel/wax
-        similar = self.supabase.table('assemblies') \
-            .select('id', count='exact') \
-            .eq('vessel_id', vessel_id) \
-            .eq('wax_type_id', wax_type_id) \
-            .execute()
-        
-        similar_count = similar.count if similar.count else 1
-        
-        # Information gain is higher for:
-        # - Lower current confidence
-        # - More assemblies that would benefit
-        info_gain = (1 - current_confidence) * np.log(similar_count + 1)
-        
-        return info_gain
+        return float(self._estimate_information_gains(
+            [(vessel_id, wax_type_id)], np.array([current_confidence], dtype=float)
+        )[0])
+    
+    def record_test_results(self, results: List[Dict]) -> List[int]:
+        """Record a batch of test results in one round-trip.
+
+        The record_test_results() database function inserts the rows, marks
+        matching predictions verified and closes queued tests in a single
+        transaction. Each result names its wick with wick_id_tested or
+        wick_name. Returns the new test_results ids.
+        """
+        try:
+            response = self.supabase.rpc('record_test_results', {'p_results': results}).execute()
+        except Exception as e:
+            # The function raises no_data_found / too_many_rows when a wick name
+            # matches no wick or several
+            if getattr(e, 'code', None) in ('P0002', 'P0003'):
+                raise LookupError(getattr(e, 'message', None) or str(e))
+            raise
+        return response.data or []
     
     def record_test_result(self, assembly_id: str, wick_id_tested: str,
                           test_data: Dict, passed: bool) -> None:
         """Record a new test result and update predictions"""
-        # Insert test result
-        self.supabase.table('test_results').insert({
+        self.record_test_results([{
             'assembly_id': assembly_id,
             'wick_id_tested': wick_id_tested,
-            'test_date': datetime.now().isoformat(),
+            'test_date': datetime.now().date().isoformat(),
             'test_type': test_data.get('test_type', 'quality_check'),
             'flame_height_mm': test_data.get('flame_height_mm'),
             'melt_pool_mm_at_2h': test_data.get('melt_pool_mm_at_2h'),
             'pass': passed,
             'notes': test_data.get('notes'),
             'tested_by': test_data.get('tested_by')
-        }).execute()
-        
-        # Update any predictions for this assembly
-        self.supabase.table('wick_predictions') \
-            .update({
-                'verified': True,
-                'verification_date': datetime.now().isoformat(),
-                'actual_wick_id': wick_id_tested if passed else None
-            }) \
-            .eq('assembly_id', assembly_id) \
-            .execute()
-        
-        # Remove from priority queue
-        self.supabase.table('test_priority_queue') \
-            .update({
-                'completed': True,
-                'completed_date': datetime.now().isoformat()
-            }) \
-            .eq('assembly_id', assembly_id) \
-            .execute()
\ No newline at end of file
+        }])
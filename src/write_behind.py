@@ -0,0 +1,201 @@
+import atexit
+import glob
+import json
+import logging
+import os
+import threading
+import uuid
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Postgres/PostgREST errors that reject the row itself; retrying won't help.
+# 22 data exception, 23 integrity constraint, 42 syntax/undefined column,
+# PGRST204 column missing from the schema cache.
+REJECTED_ROW_CODES = ('22', '23', '42', 'PGRST204')
+
+
+def is_rejected_row(error: Exception) -> bool:
+    code = getattr(error, 'code', None)
+    return isinstance(code, str) and code.startswith(REJECTED_ROW_CODES)
+
+
+def _process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class WriteBehindLogger:
+    """Buffers rows for a Supabase table and inserts them in bulk off the request path.
+
+    A batch goes out once ``max_batch`` rows are queued or every
+    ``flush_interval`` seconds, whichever comes first, and once more at
+    interpreter exit. A batch that can't be inserted is appended to
+    ``spill_path`` as JSON lines and replayed after the next successful flush.
+    When a batch fails its rows are retried one at a time; rows the database
+    rejects outright go to ``spill_path + '.rejected'`` instead of blocking
+    the rows behind them. Processes sharing ``spill_path`` (gunicorn workers)
+    coordinate through an fcntl lock file.
+    Rows are best-effort tracking data: a crash loses at most one interval.
+    """
+
+    def __init__(self, supabase, table: str, spill_path: str, max_batch: int = 50,
+                 flush_interval: float = 2.0, max_buffer: int = 10000):
+        self.supabase = supabase
+        self.table = table
+        self.spill_path = spill_path
+        self.quarantine_path = spill_path + '.rejected'
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self.max_buffer = max_buffer
+
+        self._buffer: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._closed = False
+
+        self._thread = threading.Thread(target=self._run, name=f"write-behind-{table}", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def log(self, record: Dict[str, Any]):
+        """Queue one row; never blocks on the network."""
+        with self._lock:
+            self._buffer.append(record)
+            pending = len(self._buffer)
+        if pending >= self.max_batch:
+            self._wake.set()
+        if pending >= self.max_buffer:
+            # Supabase has been slow for a while - don't let memory grow without bound
+            self._spill(self._take())
+
+    def flush(self):
+        """Insert everything queued now (and replay spilled rows if that worked)."""
+        with self._flush_lock:
+            while True:
+                batch = self._take(self.max_batch)
+                if not batch:
+                    break
+                unsent = self._write(batch)
+                if unsent:
+                    self._spill(unsent + self._take())
+                    return
+            self._replay_spill()
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._wake.set()
+        self._thread.join(timeout=self.flush_interval + 1)
+        self.flush()
+
+    def _run(self):
+        while not self._closed:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Write-behind flush to {self.table} failed: {e}")
+
+    def _take(self, limit: int = None) -> List[Dict[str, Any]]:
+        with self._lock:
+            if limit is None or limit >= len(self._buffer):
+                batch, self._buffer = self._buffer, []
+            else:
+                batch, self._buffer = self._buffer[:limit], self._buffer[limit:]
+        return batch
+
+    def _insert(self, batch: List[Dict[str, Any]]) -> Optional[Exception]:
+        try:
+            self.supabase.table(self.table).insert(batch).execute()
+            return None
+        except Exception as e:
+            return e
+
+    def _write(self, batch: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Insert a batch; returns the rows that should be retried later."""
+        error = self._insert(batch)
+        if error is None:
+            return []
+        logger.warning(f"Could not insert {len(batch)} rows into {self.table}: {error}")
+
+        # One bad row fails the whole batch, so find it and let the rest through
+        for i, record in enumerate(batch):
+            error = self._insert([record])
+            if error is None:
+                continue
+            if not is_rejected_row(error):
+                return batch[i:]
+            logger.error(f"{self.table} rejected a row, moved to {self.quarantine_path}: {error}")
+            self._append(self.quarantine_path, [record])
+        return []
+
+    @contextmanager
+    def _file_lock(self):
+        if fcntl is None:
+            yield
+            return
+        with open(self.spill_path + '.lock', 'a') as handle:
+            fcntl.flock(handle, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(handle, fcntl.LOCK_UN)
+
+    def _append(self, path: str, batch: List[Dict[str, Any]]):
+        with self._file_lock(), open(path, 'a', encoding='utf-8') as f:
+            for record in batch:
+                f.write(json.dumps(record, default=str) + '\n')
+
+    def _spill(self, batch: List[Dict[str, Any]]):
+        if batch:
+            self._append(self.spill_path, batch)
+
+    def _claim_spill(self) -> List[str]:
+        """Move the spill file, and replays left by dead processes, to names only we use."""
+        claimed = []
+        prefix = f"{self.spill_path}.replay."
+        with self._file_lock():
+            sources = [self.spill_path] if os.path.exists(self.spill_path) else []
+            for path in glob.glob(glob.escape(prefix) + '*'):
+                pid = path[len(prefix):].split('.', 1)[0]
+                if pid.isdigit() and not _process_alive(int(pid)):
+                    sources.append(path)
+            for source in sources:
+                # Rows spilled meanwhile land in a fresh spill file
+                target = f"{prefix}{os.getpid()}.{uuid.uuid4().hex}"
+                os.replace(source, target)
+                claimed.append(target)
+        return claimed
+
+    def _replay_spill(self):
+        unavailable = False
+        for replaying in self._claim_spill():
+            with open(replaying, encoding='utf-8') as f:
+                records = [json.loads(line) for line in f if line.strip()]
+
+            for start in range(0, len(records), self.max_batch):
+                unsent = records[start:] if unavailable else \
+                    self._write(records[start:start + self.max_batch])
+                if unsent:
+                    # Supabase went away again; keep the rest for the next replay
+                    if not unavailable:
+                        unsent += records[start + self.max_batch:]
+                    self._spill(unsent)
+                    unavailable = True
+                    break
+            os.remove(replaying)
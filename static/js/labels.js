@@ -1,5 +1,7 @@
 let rowCount = 1;
 let productsData = [];
+// Uploaded CSV kept server-side: {handle, rowCount, preview}
+let currentDataset = null;
 
 // Fallback product data in case backend is unavailable
 const FALLBACK_PRODUCTS = [
@@ -75,40 +77,106 @@ function updateRemoveButtons() {
     });
 }
 
+function readRow(row) {
+    const sku = row.querySelector('.sku-input').value.trim();
+    const price = parseFloat(row.querySelector('.price-input').value);
+    const casePack = parseInt(row.querySelector('.case-input').value) || 1;
+    const quantity = parseInt(row.querySelector('.qty-input').value);
+    
+    if (!sku || isNaN(price) || isNaN(quantity) || quantity <= 0) {
+        return null;
+    }
+    return {sku: sku, price: price, quantity: quantity, case_qty: casePack};
+}
+
+function withDescription(item) {
+    // Find the product to get description
+    const sku = item.sku.toLowerCase();
+    const product = productsData.find(p => 
+        p.sku.toLowerCase() === sku || 
+        p.description.toLowerCase().includes(sku)
+    );
+    item.description = product ? product.description : '';
+    return item;
+}
+
 function collectItems() {
     const items = [];
     const rows = document.querySelectorAll('.item-row');
     
     rows.forEach(row => {
-        const sku = row.querySelector('.sku-input').value.trim();
-        const price = parseFloat(row.querySelector('.price-input').value);
-        const casePack = parseInt(row.querySelector('.case-input').value) || 1;
-        const quantity = parseInt(row.querySelector('.qty-input').value);
-        
-        if (sku && !isNaN(price) && !isNaN(quantity) && quantity > 0) {
-            // Find the product to get description
-            const product = productsData.find(p => 
-                p.sku.toLowerCase() === sku.toLowerCase() || 
-                p.description.toLowerCase().includes(sku.toLowerCase())
-            );
-            
-            items.push({
-                sku: sku,
-                price: price,
-                quantity: quantity,
-                case_qty: casePack,
-                description: product ? product.description : ''
-            });
+        const item = readRow(row);
+        if (item) {
+            items.push(withDescription(item));
         }
     });
     
     return items;
 }
 
+function collectDatasetEdits() {
+    // Diff the grid against the preview page the server sent
+    const edits = {updates: [], deletes: [], appends: []};
+    const seen = new Set();
+    
+    document.querySelectorAll('.item-row').forEach(row => {
+        const item = readRow(row);
+        if (row.dataset.index === undefined) {
+            if (item) edits.appends.push(withDescription(item));
+            return;
+        }
+        
+        const index = Number(row.dataset.index);
+        const original = currentDataset.preview.find(r => r.index === index);
+        seen.add(index);
+        
+        if (!item) {
+            edits.deletes.push(index);
+        } else if (['sku', 'price', 'quantity', 'case_qty'].some(f => String(item[f]) !== String(original[f]))) {
+            edits.updates.push(Object.assign({index: index}, item));
+        }
+    });
+    
+    currentDataset.preview.forEach(r => {
+        if (!seen.has(r.index)) edits.deletes.push(r.index);
+    });
+    
+    return edits;
+}
+
+function saveDatasetEdits() {
+    const edits = collectDatasetEdits();
+    if (!edits.updates.length && !edits.deletes.length && !edits.appends.length) {
+        return Promise.resolve();
+    }
+    
+    return fetch(`/labels/datasets/${currentDataset.handle}`, {
+        method: 'PATCH',
+        headers: {
+            'Content-Type': 'application/json'
+        },
+        body: JSON.stringify(edits)
+    })
+    .then(response => response.json())
+    .then(data => {
+        if (!data.success) {
+            throw new Error(data.error || 'Could not save changes');
+        }
+        // The server copy is now authoritative - drop the stale preview
+        return fetch(`/labels/datasets/${currentDataset.handle}`)
+            .then(response => response.json())
+            .then(page => {
+                currentDataset.rowCount = page.row_count;
+                currentDataset.preview = page.rows;
+                populateFromCSV(page.rows);
+            });
+    });
+}
+
 function generateLabels() {
-    const items = collectItems();
+    const items = currentDataset ? null : collectItems();
     
-    if (items.length === 0) {
+    if (items && items.length === 0) {
         alert('Please add at least one item with valid SKU, price, and quantity');
         return;
     }
@@ -120,33 +188,38 @@ function generateLabels() {
     btn.innerHTML = '<div class="loading"></div> Generating...';
     btn.disabled = true;
     
-    fetch('/labels/generate', {
+    // Uploaded datasets are referenced by handle; only the edits travel over the wire
+    const request = currentDataset
+        ? saveDatasetEdits().then(() => ({dataset: currentDataset.handle, format: format}))
+        : Promise.resolve({items: items, format: format});
+    
+    request
+    .then(body => fetch('/labels/jobs', {
         method: 'POST',
         headers: {
             'Content-Type': 'application/json'
         },
-        body: JSON.stringify({
-            items: items,
-            format: format
-        })
-    })
+        body: JSON.stringify(body)
+    }))
     .then(response => response.json())
     .then(data => {
-        if (data.success) {
-            document.getElementById('resultMessage').textContent = 
-                `Generated ${data.label_count} labels`;
-            document.getElementById('downloadBtn').href = data.download_url;
-            
-            document.querySelector('.main-section').style.display = 'none';
-            document.querySelector('.csv-upload-section').style.display = 'none';
-            document.getElementById('resultSection').style.display = 'block';
-        } else {
-            alert(data.error || 'Generation failed');
+        if (!data.success) {
+            throw new Error(data.error || 'Generation failed');
         }
+        return waitForLabelJob(data.status_url, btn);
+    })
+    .then(job => {
+        document.getElementById('resultMessage').textContent = 
+            `Generated ${job.total_labels} labels`;
+        document.getElementById('downloadBtn').href = job.download_url;
+        
+        document.querySelector('.main-section').style.display = 'none';
+        document.querySelector('.csv-upload-section').style.display = 'none';
+        document.getElementById('resultSection').style.display = 'block';
     })
     .catch(error => {
         console.error('Error:', error);
-        alert('An error occurred during generation');
+        alert(error.message || 'An error occurred during generation');
     })
     .finally(() => {
         btn.innerHTML = originalText;
@@ -154,7 +227,32 @@ function generateLabels() {
     });
 }
 
+function waitForLabelJob(statusUrl, btn) {
+    // Poll the background job, showing percent complete and ETA on the button
+    return new Promise((resolve, reject) => {
+        const poll = () => {
+            fetch(statusUrl)
+                .then(response => response.json())
+                .then(job => {
+                    if (job.status === 'done') {
+                        resolve(job);
+                    } else if (job.status === 'failed' || job.error) {
+                        reject(new Error(job.error || 'Generation failed'));
+                    } else {
+                        const eta = job.eta_seconds !== null ? ` (~${Math.ceil(job.eta_seconds)}s left)` : '';
+                        btn.innerHTML = `<div class="loading"></div> Generating... ${job.percent_complete}%${eta}`;
+                        setTimeout(poll, 1000);
+                    }
+                })
+                .catch(reject);
+        };
+        poll();
+    });
+}
+
 function resetForm() {
+    currentDataset = null;
+    
     // Clear all rows except the first one
     const grid = document.getElementById('itemsGrid');
     const rows = grid.querySelectorAll('.item-row');
@@ -325,8 +423,12 @@ function uploadFile(file) {
     .then(response => response.json())
     .then(data => {
         if (data.success) {
-            populateFromCSV(data.data);
-            alert(`Loaded ${data.row_count} items from CSV`);
+            currentDataset = {handle: data.dataset, rowCount: data.row_count, preview: data.preview};
+            populateFromCSV(data.preview);
+            const shown = data.preview.length < data.row_count
+                ? ` (showing the first ${data.preview.length} for editing - all rows will be printed)`
+                : '';
+            alert(`Loaded ${data.row_count} items from CSV${shown}`);
         } else {
             alert(data.error || 'Upload failed');
         }
@@ -352,6 +454,7 @@ function populateFromCSV(data) {
     data.forEach((item, index) => {
         const newRow = document.createElement('div');
         newRow.className = 'item-row';
+        newRow.dataset.index = item.index;
         newRow.innerHTML = `
             <div class="autocomplete-container">
                 <input type="text" placeholder="SKU or Description" class="form-control sku-input" data-row="${rowCount}" value="${item.sku || ''}">
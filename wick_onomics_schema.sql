@@ -100,14 +100,23 @@ CREATE TABLE IF NOT EXISTS test_results (
     extinguish_time_hours FLOAT,
     
     -- Results
-    pass BOOLEAN NOT NULL,
+    pass BOOLEAN, -- NULL when the lab result was shipped without configured pass criteria
     failure_reason VARCHAR(100),
     notes TEXT,
     tested_by VARCHAR(100),
     
+    -- Set by clients that may retry (e.g. the lab evaluation outbox) so re-sends upsert
+    idempotency_key VARCHAR(100) UNIQUE,
+    
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP NOT NULL
 );
 
+-- Existing databases created before idempotency keys
+ALTER TABLE test_results ADD COLUMN IF NOT EXISTS idempotency_key VARCHAR(100) UNIQUE;
+
+-- Existing databases created before lab results could arrive without a verdict
+ALTER TABLE test_results ALTER COLUMN pass DROP NOT NULL;
+
 -- Wax conversion delta tracking
 CREATE TABLE IF NOT EXISTS wax_conversion_deltas (
     id SERIAL PRIMARY KEY,
@@ -173,7 +182,9 @@ CREATE INDEX IF NOT EXISTS idx_fragrances_heat ON fragrance_oils(heat_index);
 CREATE INDEX IF NOT EXISTS idx_fragrances_category ON fragrance_oils(fragrance_category);
 CREATE INDEX IF NOT EXISTS idx_wicks_series_size ON wicks(series, size_number);
 CREATE INDEX IF NOT EXISTS idx_wicks_size_index ON wicks(size_index);
+CREATE INDEX IF NOT EXISTS idx_wicks_updated ON wicks(updated_at);
 CREATE INDEX IF NOT EXISTS idx_assemblies_components ON assemblies(vessel_id, wax_type_id, fragrance_oil_id);
+CREATE INDEX IF NOT EXISTS idx_assemblies_updated ON assemblies(updated_at);
 CREATE INDEX IF NOT EXISTS idx_test_results_assembly ON test_results(assembly_id, test_date);
 CREATE INDEX IF NOT EXISTS idx_test_results_pass ON test_results(pass);
 CREATE INDEX IF NOT EXISTS idx_predictions_confidence ON wick_predictions(confidence_score);
@@ -193,6 +204,17 @@ WHERE approved_date IS NOT NULL
 GROUP BY vessel_id, wax_type_id
 HAVING COUNT(*) >= 3; -- Need at least 3 samples for reliable baseline
 
+-- Assemblies per vessel/wax pair, read when ranking tests. id is a stable
+-- key to page on past PostgREST's max-rows limit.
+CREATE OR REPLACE VIEW assembly_component_counts AS
+SELECT
+    vessel_id,
+    wax_type_id,
+    COUNT(*) AS assembly_count,
+    ROW_NUMBER() OVER (ORDER BY vessel_id, wax_type_id) AS id
+FROM assemblies
+GROUP BY vessel_id, wax_type_id;
+
 -- Create function to calculate heat index
 CREATE OR REPLACE FUNCTION calculate_fragrance_heat_index(fragrance_id VARCHAR(50))
 RETURNS FLOAT AS $$
@@ -248,6 +270,34 @@ BEGIN
 END;
 $$ LANGUAGE plpgsql;
 
+-- Keep updated_at current on every UPDATE so clients can poll assemblies for
+-- changed rows and notice edits to the wick catalog and conversion deltas
+CREATE OR REPLACE FUNCTION touch_updated_at()
+RETURNS TRIGGER AS $$
+BEGIN
+    NEW.updated_at = CURRENT_TIMESTAMP;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trigger_assemblies_updated_at ON assemblies;
+CREATE TRIGGER trigger_assemblies_updated_at
+BEFORE UPDATE ON assemblies
+FOR EACH ROW
+EXECUTE FUNCTION touch_updated_at();
+
+DROP TRIGGER IF EXISTS trigger_wicks_updated_at ON wicks;
+CREATE TRIGGER trigger_wicks_updated_at
+BEFORE UPDATE ON wicks
+FOR EACH ROW
+EXECUTE FUNCTION touch_updated_at();
+
+DROP TRIGGER IF EXISTS trigger_wax_conversion_deltas_updated_at ON wax_conversion_deltas;
+CREATE TRIGGER trigger_wax_conversion_deltas_updated_at
+BEFORE UPDATE ON wax_conversion_deltas
+FOR EACH ROW
+EXECUTE FUNCTION touch_updated_at();
+
 -- Trigger to update heat index when new test results are added
 CREATE OR REPLACE FUNCTION update_fragrance_heat_index()
 RETURNS TRIGGER AS $$
@@ -323,4 +373,111 @@ $$ LANGUAGE plpgsql;
 CREATE TRIGGER trigger_update_wax_conversion
 AFTER INSERT ON test_results
 FOR EACH ROW
-EXECUTE FUNCTION update_wax_conversion_delta();
\ No newline at end of file
+EXECUTE FUNCTION update_wax_conversion_delta();
+-- Record a batch of test results in one transaction: resolve wick names,
+-- insert the results, verify matching predictions and close queued tests.
+-- p_results is a JSON array of test_results rows; each row names its wick by
+-- wick_id_tested or wick_name. wicks.name isn't unique, so a name must match
+-- exactly one wick. If any wick is unknown or ambiguous nothing is written.
+CREATE OR REPLACE FUNCTION record_test_results(p_results JSONB)
+RETURNS INTEGER[] AS $$
+DECLARE
+    unknown_wicks TEXT;
+    ambiguous_wicks TEXT;
+    inserted_ids INTEGER[];
+BEGIN
+    SELECT
+        string_agg(DISTINCT COALESCE(r.wick_name, '(none)'), ', ') FILTER (WHERE w.matches = 0),
+        string_agg(DISTINCT r.wick_name, ', ') FILTER (WHERE w.matches > 1)
+    INTO unknown_wicks, ambiguous_wicks
+    FROM jsonb_to_recordset(p_results) AS r(wick_id_tested VARCHAR(50), wick_name VARCHAR(100))
+    CROSS JOIN LATERAL (SELECT COUNT(*) AS matches FROM wicks WHERE name = r.wick_name) w
+    WHERE r.wick_id_tested IS NULL;
+
+    IF unknown_wicks IS NOT NULL THEN
+        RAISE EXCEPTION 'Unknown wick: %', unknown_wicks USING ERRCODE = 'no_data_found';
+    END IF;
+    IF ambiguous_wicks IS NOT NULL THEN
+        RAISE EXCEPTION 'More than one wick named: %', ambiguous_wicks USING ERRCODE = 'too_many_rows';
+    END IF;
+
+    WITH results AS (
+        SELECT r.*, COALESCE(r.wick_id_tested, w.id) AS wick_id
+        -- ROWS FROM: WITH ORDINALITY cannot follow a bare column definition list
+        FROM ROWS FROM (jsonb_to_recordset(p_results) AS (
+            assembly_id VARCHAR(50),
+            wick_id_tested VARCHAR(50),
+            wick_name VARCHAR(100),
+            wax_type_id_tested VARCHAR(50),
+            test_date DATE,
+            test_type VARCHAR(50),
+            flame_height_mm FLOAT,
+            melt_pool_mm_at_1h FLOAT,
+            melt_pool_mm_at_2h FLOAT,
+            melt_pool_mm_at_4h FLOAT,
+            container_temp_celsius FLOAT,
+            mushrooming BOOLEAN,
+            tunneling BOOLEAN,
+            smoking BOOLEAN,
+            extinguish_time_hours FLOAT,
+            pass BOOLEAN,
+            failure_reason VARCHAR(100),
+            notes TEXT,
+            tested_by VARCHAR(100)
+        )) WITH ORDINALITY AS r
+        -- Only rows without an id look their wick up; the check above made the name unique
+        LEFT JOIN LATERAL (
+            SELECT id FROM wicks
+            WHERE r.wick_id_tested IS NULL AND name = r.wick_name
+            LIMIT 1
+        ) w ON TRUE
+    ),
+    inserted AS (
+        INSERT INTO test_results (
+            assembly_id, test_date, wax_type_id_tested, wick_id_tested, test_type,
+            flame_height_mm, melt_pool_mm_at_1h, melt_pool_mm_at_2h, melt_pool_mm_at_4h,
+            container_temp_celsius, mushrooming, tunneling, smoking, extinguish_time_hours,
+            pass, failure_reason, notes, tested_by
+        )
+        SELECT
+            assembly_id, COALESCE(test_date, CURRENT_DATE), wax_type_id_tested, wick_id,
+            COALESCE(test_type, 'quality_check'),
+            flame_height_mm, melt_pool_mm_at_1h, melt_pool_mm_at_2h, melt_pool_mm_at_4h,
+            container_temp_celsius, COALESCE(mushrooming, FALSE), COALESCE(tunneling, FALSE),
+            COALESCE(smoking, FALSE), extinguish_time_hours,
+            pass, failure_reason, notes, tested_by
+        FROM results
+        ORDER BY ordinality
+        RETURNING id, assembly_id, wick_id_tested, pass
+    ),
+    -- The newest result per assembly decides its predictions
+    latest AS (
+        SELECT DISTINCT ON (assembly_id) *
+        FROM inserted
+        ORDER BY assembly_id, id DESC
+    ),
+    verified AS (
+        UPDATE wick_predictions p
+        SET verified = TRUE,
+            verification_date = CURRENT_TIMESTAMP,
+            actual_wick_id = CASE WHEN l.pass THEN l.wick_id_tested END
+        FROM latest l
+        JOIN assemblies a ON a.id = l.assembly_id
+        WHERE p.vessel_id = a.vessel_id
+        AND p.wax_type_id = a.wax_type_id
+        AND p.fragrance_oil_id = a.fragrance_oil_id
+        AND p.verified = FALSE
+    ),
+    dequeued AS (
+        UPDATE test_priority_queue q
+        SET completed = TRUE,
+            completed_date = CURRENT_TIMESTAMP
+        FROM latest l
+        WHERE q.assembly_id = l.assembly_id
+        AND q.completed = FALSE
+    )
+    SELECT array_agg(id ORDER BY id) INTO inserted_ids FROM inserted;
+
+    RETURN COALESCE(inserted_ids, ARRAY[]::INTEGER[]);
+END;
+$$ LANGUAGE plpgsql;